@@ -0,0 +1,128 @@
+"""
+Document Delivery
+Sends PDFs through the Telegram file_id cache: a cached id is a single API
+call with no upload; otherwise the document is uploaded once and its id
+remembered for everyone else.
+"""
+import asyncio
+from typing import List
+from telegram import InputMediaDocument, InputMediaPhoto, Message
+from telegram.error import BadRequest
+import sys
+sys.path.append('..')
+from database.file_id_cache import file_id_cache
+
+# Telegram accepts at most 10 items per media group
+MEDIA_GROUP_SIZE = 10
+
+
+async def send_cached_document(message: Message, cache_key: str, caption: str = None, **kwargs) -> bool:
+    """
+    Reply with the cached document for cache_key.
+    Returns False on a miss or when Telegram rejects the stored id
+    (the stale id is dropped so the caller's upload replaces it).
+    """
+    file_id = await asyncio.to_thread(file_id_cache.get, cache_key)
+    if not file_id:
+        return False
+    try:
+        await message.reply_document(document=file_id, caption=caption, **kwargs)
+        return True
+    except BadRequest as e:
+        print(f"Cached file_id for {cache_key} rejected: {e}")
+        await asyncio.to_thread(file_id_cache.invalidate, cache_key)
+        return False
+
+
+async def upload_document(message: Message, cache_key: str, document, filename: str,
+                          caption: str = None, **kwargs) -> Message:
+    """Upload a document and remember the file_id Telegram assigns to it."""
+    sent = await message.reply_document(document=document, filename=filename, caption=caption, **kwargs)
+    if sent and sent.document:
+        await asyncio.to_thread(
+            file_id_cache.put, cache_key,
+            sent.document.file_id, sent.document.file_unique_id, sent.document.file_size
+        )
+    return sent
+
+
+async def send_cached_document_group(message: Message, cache_keys: List[str], file_ids: List[str],
+                                     captions: List[str], **kwargs) -> bool:
+    """
+    Send cached documents as media groups. Returns False if Telegram rejects
+    any stored id (all ids of the group are dropped so the caller re-uploads).
+    """
+    try:
+        for i in range(0, len(file_ids), MEDIA_GROUP_SIZE):
+            await message.reply_media_group(
+                media=[InputMediaDocument(media=file_id, caption=caption)
+                       for file_id, caption in zip(file_ids[i:i + MEDIA_GROUP_SIZE], captions[i:i + MEDIA_GROUP_SIZE])],
+                **kwargs
+            )
+        return True
+    except BadRequest as e:
+        print(f"Cached file_ids for {cache_keys[0]}... rejected: {e}")
+        for key in cache_keys:
+            await asyncio.to_thread(file_id_cache.invalidate, key)
+        return False
+
+
+async def upload_document_group(message: Message, cache_keys: List[str], paths: List, filenames: List[str],
+                                captions: List[str], **kwargs) -> None:
+    """Upload files as media groups and remember the file_id of each one."""
+    for i in range(0, len(paths), MEDIA_GROUP_SIZE):
+        files = [open(path, 'rb') for path in paths[i:i + MEDIA_GROUP_SIZE]]
+        try:
+            sent = await message.reply_media_group(
+                media=[InputMediaDocument(media=f, filename=filename, caption=caption)
+                       for f, filename, caption in zip(files, filenames[i:i + MEDIA_GROUP_SIZE], captions[i:i + MEDIA_GROUP_SIZE])],
+                **kwargs
+            )
+        finally:
+            for f in files:
+                f.close()
+        for key, msg in zip(cache_keys[i:i + MEDIA_GROUP_SIZE], sent):
+            if msg.document:
+                await asyncio.to_thread(
+                    file_id_cache.put, key,
+                    msg.document.file_id, msg.document.file_unique_id, msg.document.file_size
+                )
+
+
+
+def _photo_media(items: List, caption: str = None) -> List[InputMediaPhoto]:
+    return [InputMediaPhoto(media=item, caption=caption if i == 0 else None) for i, item in enumerate(items)]
+
+
+async def send_cached_photos(message: Message, cache_keys: List[str], caption: str = None) -> bool:
+    """
+    Send images (one photo, or an album of up to 10) by cached file_id.
+    Returns False unless every id is cached and accepted by Telegram.
+    """
+    file_ids = [await asyncio.to_thread(file_id_cache.get, key) for key in cache_keys]
+    if not all(file_ids):
+        return False
+    try:
+        if len(file_ids) == 1:
+            await message.reply_photo(photo=file_ids[0], caption=caption)
+        else:
+            await message.reply_media_group(media=_photo_media(file_ids, caption))
+        return True
+    except BadRequest as e:
+        print(f"Cached photo file_ids for {cache_keys[0]}... rejected: {e}")
+        for key in cache_keys:
+            await asyncio.to_thread(file_id_cache.invalidate, key)
+        return False
+
+
+async def upload_photos(message: Message, cache_keys: List[str], photos: List[bytes], caption: str = None) -> None:
+    """Upload images as a photo or an album and remember their file_ids."""
+    if len(photos) == 1:
+        sent = [await message.reply_photo(photo=photos[0], caption=caption)]
+    else:
+        sent = await message.reply_media_group(media=_photo_media(photos, caption))
+    for key, msg in zip(cache_keys, sent):
+        if msg.photo:
+            # Largest size; its id resends the photo with all sizes
+            photo = msg.photo[-1]
+            await asyncio.to_thread(file_id_cache.put, key, photo.file_id, photo.file_unique_id, photo.file_size)
@@ -3,16 +3,21 @@ Books Handler
 Handles book browsing and PDF downloads.
 Uses Supabase when configured, SQLite otherwise.
 """
+import asyncio
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
+from telegram.error import TelegramError
 from pathlib import Path
+from typing import Dict, List, Tuple
 import sys
 sys.path.append('../..')
 from bot.translations import get_text
 try:
     from database.supabase_client import (
         get_all_books, get_books_by_grade, get_book_by_id,
-        track_user_action, track_download, get_user_lang
+        get_catalog_books, get_catalog_version,
+        track_user_action, track_download, get_user_lang,
+        get_theme_artifact
     )
     # Import theme functions
     from database.supabase_client import get_themes_by_book, get_theme_by_id
@@ -23,10 +28,98 @@ except ImportError:
     def track_user_action(*args, **kwargs): pass
     def track_download(*args, **kwargs): pass
     def get_user_lang(uid): return 'uz' # Default to Uzbek if Supabase client not available
-
-from services.pdf_processor import PDFProcessor, create_bilingual_theme_pdf
+    def get_catalog_books(): return get_all_books()
+    def get_catalog_version(): return 0
+    def get_theme_artifact(theme_id, language): return None
+
+from services.theme_pdf_cache import get_theme_pdf, get_compressed_theme_pdf, get_bundle_pdf, get_bilingual_pdf
+from services.pdf_processor import merge_ranges, theme_pages
+from services.pdf_compressor import TELEGRAM_TARGET_BYTES
+from services.pdf_splitter import get_book_parts
+from services.theme_previews import get_theme_previews, preview_pages
+from services.single_flight import SingleFlight
+from services.book_cache import fetch_book, get_cached_book, cached_book_sha256, source_hash
+from services.heavy_hitters import record_theme, record_book
+from database.file_id_cache import file_id_cache, book_key, book_part_key, theme_key, preview_key, bundle_key, bilingual_key
+from bot.delivery import (
+    send_cached_document, upload_document,
+    send_cached_document_group, upload_document_group,
+    send_cached_photos, upload_photos
+)
 from config import OUTPUT_DIR
 
+# Coalesces concurrent extractions of the same (source hash, start, end)
+theme_extractions = SingleFlight("theme_extractions")
+
+# Coalesces concurrent splits of the same book file
+book_splits = SingleFlight("book_splits")
+
+# Telegram only fetches documents sent by URL up to this size
+TELEGRAM_URL_DOCUMENT_LIMIT = 20 * 1024 * 1024
+
+# Most themes offered in the bundle picker (Telegram allows 100 buttons)
+BUNDLE_MAX_THEMES = 90
+
+
+def _part_captions(caption: str, ranges: List[Tuple[int, int]], user_lang: str) -> List[str]:
+    return [
+        get_text("book_part_caption", user_lang, caption=caption, index=i, count=len(ranges),
+                 start_page=start + 1, end_page=end + 1)
+        for i, (start, end) in enumerate(ranges, 1)
+    ]
+
+
+async def send_cached_book_parts(message, book_id: int, lang: str, caption: str, user_lang: str) -> bool:
+    """Resend a book that was split into parts before, by file_id."""
+    parts = await asyncio.to_thread(file_id_cache.get_book_parts, book_id, lang)
+    if not parts:
+        return False
+    return await send_cached_document_group(
+        message, [key for key, *_ in parts], [file_id for *_, file_id in parts],
+        _part_captions(caption, [(start, end) for _, start, end, _ in parts], user_lang)
+    )
+
+
+async def send_book_in_parts(message, book_id: int, lang: str, pdf_path, title: str,
+                             caption: str, user_lang: str) -> None:
+    """Split a book over the upload limit into page-range parts and send them as a media group."""
+    splitting_msg = await message.reply_text(get_text("splitting_book", user_lang))
+    try:
+        source = await asyncio.to_thread(source_hash, pdf_path)
+        parts = await book_splits.do(source, lambda: get_book_parts(str(pdf_path), source))
+    finally:
+        await splitting_msg.delete()
+
+    # Parts of an earlier split (a replaced file or another part size) must not mix with these
+    await asyncio.to_thread(file_id_cache.invalidate_book_parts, book_id, lang)
+    ranges = [(start, end) for start, end, _ in parts]
+    await upload_document_group(
+        message,
+        [book_part_key(book_id, lang, i, len(parts), start, end) for i, (start, end) in enumerate(ranges, 1)],
+        [path for *_, path in parts],
+        [f"{title} ({start + 1}-{end + 1}).pdf" for start, end in ranges],
+        _part_captions(caption, ranges, user_lang),
+        read_timeout=300,
+        write_timeout=300
+    )
+
+
+async def download_book_for_extraction(message, pdf_url: str, user_lang: str):
+    """Local path of a book from storage, downloading it (with a notice) if needed; None on failure."""
+    loading_msg = None
+    if not get_cached_book(pdf_url):
+        print(f"[PDF DEBUG] Downloading book PDF from URL for extraction: {pdf_url}")
+        loading_msg = await message.reply_text(get_text("downloading_book_for_extraction", user_lang))
+    
+    try:
+        return str(await fetch_book(pdf_url))
+    except Exception as e:
+        await message.reply_text(get_text("book_download_failed", user_lang, error_message=str(e)))
+        return None
+    finally:
+        if loading_msg:
+            await loading_msg.delete()
+
 
 async def books_command(update: Update, context: ContextTypes.DEFAULT_TYPE, from_callback: bool = False) -> None:
     """Handle /books command - show language selection first."""
@@ -84,6 +177,59 @@ async def handle_language_selection(update: Update, context: ContextTypes.DEFAUL
     await browse_books(update, context)
 
 
+# Grade-range buttons shown by browse_books()
+GRADE_RANGES = ("1-4", "5-9", "10-11")
+
+# Prebuilt grade menus: (grade_range, lang) -> (books, keyboard markup).
+# Rebuilt from the catalog cache whenever its version changes.
+_grade_menus: Dict[Tuple[str, str], Tuple[List[dict], InlineKeyboardMarkup]] = {}
+_grade_menus_version = None
+
+
+def _parse_grade_range(grade_range_str: str) -> List[int]:
+    """Parse a grade range such as "5-9" into [5, 6, 7, 8, 9]."""
+    if '-' in grade_range_str:
+        start_grade, end_grade = map(int, grade_range_str.split('-'))
+        return list(range(start_grade, end_grade + 1))
+    return [int(grade_range_str)]
+
+
+def _build_grade_menu(grade_range_str: str, lang: str, catalog: List[dict]) -> Tuple[List[dict], InlineKeyboardMarkup]:
+    """Build the book list and keyboard for one grade range and language."""
+    grades = set(_parse_grade_range(grade_range_str))
+    books = [book for book in catalog if book.get('grade') in grades]
+
+    keyboard = []
+    for book in books:
+        title = book.get('title_uz') if lang == 'uz' else book.get('title_ru')
+        title = title or book.get('title_uz') or book.get('title_ru')
+        title = title[:35] + '...' if len(title) > 35 else title
+        keyboard.append([InlineKeyboardButton(f"📖 {title}", callback_data=f"book_{book.get('id')}")])
+    
+    keyboard.append([InlineKeyboardButton(get_text('back', lang), callback_data="browse_books")])
+    return books, InlineKeyboardMarkup(keyboard)
+
+
+def get_grade_menu(grade_range_str: str, lang: str) -> Tuple[List[dict], InlineKeyboardMarkup]:
+    """Get the prebuilt menu for a grade range, rebuilding all menus on catalog change."""
+    global _grade_menus_version
+
+    version = get_catalog_version()
+    if version != _grade_menus_version:
+        catalog = get_catalog_books()
+        _grade_menus.clear()
+        for grade_range in GRADE_RANGES:
+            for menu_lang in ('uz', 'ru'):
+                _grade_menus[(grade_range, menu_lang)] = _build_grade_menu(grade_range, menu_lang, catalog)
+        _grade_menus_version = version
+
+    key = (grade_range_str, lang)
+    if key not in _grade_menus:
+        # Single-grade ranges from the book "back" button are built on first use
+        _grade_menus[key] = _build_grade_menu(grade_range_str, lang, get_catalog_books())
+    return _grade_menus[key]
+
+
 async def handle_grade_selection(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle grade selection."""
     query = update.callback_query
@@ -97,16 +243,9 @@ async def handle_grade_selection(update: Update, context: ContextTypes.DEFAULT_T
     lang = get_user_lang(user_id)
     
     grade_range_str = callback_data.replace('grade_', '')
-    
-    # Parse grade range (e.g., "1-4", "5-9", "10-11")
-    if '-' in grade_range_str:
-        start_grade, end_grade = map(int, grade_range_str.split('-'))
-        grade_range = list(range(start_grade, end_grade + 1))
-    else:
-        grade_range = [int(grade_range_str)] # Should not happen with current buttons
 
-    # Get books for this grade range
-    books = get_books_by_grade(grade_range)
+    # Get books for this grade range from the prebuilt menus
+    books, reply_markup = get_grade_menu(grade_range_str, lang)
     
     # Track analytics
     track_user_action(
@@ -124,18 +263,9 @@ async def handle_grade_selection(update: Update, context: ContextTypes.DEFAULT_T
         )
         return
 
-    keyboard = []
-    for book in books:
-        title = book.get('title_uz') if lang == 'uz' else book.get('title_ru')
-        title = title or book.get('title_uz') or book.get('title_ru')
-        title = title[:35] + '...' if len(title) > 35 else title
-        keyboard.append([InlineKeyboardButton(f"📖 {title}", callback_data=f"book_{book.get('id')}")])
-    
-    keyboard.append([InlineKeyboardButton(get_text('back', lang), callback_data="browse_books")])
-    
     await query.message.edit_text(
         get_text('select_book', lang, grade=grade_range_str),
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        reply_markup=reply_markup,
         parse_mode='Markdown'
     )
 
@@ -196,6 +326,11 @@ async def handle_book_selection(update: Update, context: ContextTypes.DEFAULT_TY
     if has_alt_pdf:
         keyboard.append([InlineKeyboardButton(get_text('download_full_pdf', alt_lang, lang_upper=alt_lang.upper()), callback_data=f"dl_book_{book['id']}_{alt_lang}")])
 
+    # Several themes in one PDF
+    if themes and (has_pdf or has_alt_pdf):
+        bundle_lang = lang if has_pdf else alt_lang
+        keyboard.append([InlineKeyboardButton(get_text('select_themes', lang), callback_data=f"bundle_{book['id']}_{bundle_lang}")])
+
     keyboard.append([InlineKeyboardButton(get_text('back', lang), callback_data=f"grade_{book.get('grade')}-{book.get('grade')}")]) # Go back to specific grade range
     
     await query.message.edit_text(
@@ -239,6 +374,8 @@ async def handle_book_pdf_download(update: Update, context: ContextTypes.DEFAULT
         telegram_user_id=user_id
     )
     
+    record_book(book_id, language)
+    
     # Try to get PDF URL from Supabase Storage first
     pdf_url = book.get('pdf_path_uz') if language == 'uz' else book.get('pdf_path_ru')
     actual_lang = language
@@ -255,39 +392,44 @@ async def handle_book_pdf_download(update: Update, context: ContextTypes.DEFAULT
         title = book.get('title_uz') if actual_lang == 'uz' else book.get('title_ru')
         title = title or book.get('title_ru') or book.get('title_uz') or book.get('subject')
         lang_emoji = "🇺🇿" if actual_lang == 'uz' else "🇷🇺"
+        caption = get_text("book_pdf_caption", user_lang, lang_emoji=lang_emoji, title=title, grade=book.get('grade'), subject=book.get('subject'))
+        cache_key = book_key(book_id, actual_lang)
+        
+        # Already uploaded once: resend by file_id
+        if await send_cached_document(query.message, cache_key, caption=caption):
+            return
+        if await send_cached_book_parts(query.message, book_id, actual_lang, caption, user_lang):
+            return
         
         # Send loading message
         loading_msg = await query.message.reply_text(get_text("loading_pdf", user_lang))
         
         try:
-            import aiohttp
-            import io
+            # Stream the book from Supabase Storage to the local book cache
+            local_path = await fetch_book(pdf_url, timeout=120)
+            
+            # Delete loading message
+            try:
+                await loading_msg.delete()
+            except:
+                pass
+            
+            # Over the upload limit: send page-range parts instead
+            if local_path.stat().st_size > TELEGRAM_TARGET_BYTES:
+                await send_book_in_parts(query.message, book_id, actual_lang, local_path, title, caption, user_lang)
+                return
             
-            # Download PDF from Supabase Storage
-            async with aiohttp.ClientSession() as session:
-                async with session.get(pdf_url, timeout=aiohttp.ClientTimeout(total=120)) as resp:
-                    if resp.status == 200:
-                        pdf_data = await resp.read()
-                        pdf_file = io.BytesIO(pdf_data)
-                        pdf_file.name = f"{title}.pdf"
-                        
-                        # Delete loading message
-                        try:
-                            await loading_msg.delete()
-                        except:
-                            pass
-                        
-                        # Send the PDF document directly
-                        await query.message.reply_document(
-                            document=pdf_file,
-                            filename=f"{title}.pdf",
-                            caption=get_text("book_pdf_caption", user_lang, lang_emoji=lang_emoji, title=title, grade=book.get('grade'), subject=book.get('subject')),
-                            read_timeout=120,
-                            write_timeout=120
-                        )
-                        return
-                    else:
-                        raise Exception(f"Download failed: {resp.status}")
+            # Send the PDF document from disk
+            with open(local_path, 'rb') as pdf_file:
+                await upload_document(
+                    query.message, cache_key,
+                    document=pdf_file,
+                    filename=f"{title}.pdf",
+                    caption=caption,
+                    read_timeout=120,
+                    write_timeout=120
+                )
+            return
         except Exception as e:
             # Delete loading message
             try:
@@ -322,17 +464,30 @@ async def handle_book_pdf_download(update: Update, context: ContextTypes.DEFAULT
     
     # Send the local PDF file
     try:
-        title = book.title_uz if actual_lang == 'uz' else book.title_ru
-        title = title or book.title_ru or book.title_uz or book.subject
+        title = book.get('title_uz') if actual_lang == 'uz' else book.get('title_ru')
+        title = title or book.get('title_ru') or book.get('title_uz') or book.get('subject')
         lang_emoji = "🇺🇿" if actual_lang == 'uz' else "🇷🇺"
+        caption = get_text("book_pdf_caption", user_lang, lang_emoji=lang_emoji, title=title, grade=book.get('grade'), subject=book.get('subject'))
+        cache_key = book_key(book_id, actual_lang)
         
-        await query.message.reply_document(
-            document=open(pdf_path, 'rb'),
-            filename=f"{title}.pdf",
-            caption=get_text("book_pdf_caption", user_lang, lang_emoji=lang_emoji, title=title, grade=book.get('grade'), subject=book.get('subject')),
-            read_timeout=120,
-            write_timeout=120
-        )
+        if await send_cached_document(query.message, cache_key, caption=caption):
+            return
+        if await send_cached_book_parts(query.message, book_id, actual_lang, caption, user_lang):
+            return
+        
+        if Path(pdf_path).stat().st_size > TELEGRAM_TARGET_BYTES:
+            await send_book_in_parts(query.message, book_id, actual_lang, pdf_path, title, caption, user_lang)
+            return
+        
+        with open(pdf_path, 'rb') as pdf_file:
+            await upload_document(
+                query.message, cache_key,
+                document=pdf_file,
+                filename=f"{title}.pdf",
+                caption=caption,
+                read_timeout=120,
+                write_timeout=120
+            )
     except Exception as e:
         await query.message.reply_text(get_text("pdf_sending_error", user_lang, error_message=str(e)))
 
@@ -396,39 +551,45 @@ async def handle_theme_pdf_download(update: Update, context: ContextTypes.DEFAUL
         emoji = "🇷🇺"
     
     print(f"[PDF DEBUG] PDF path: {pdf_path}")
+    record_theme(theme_id)
+    record_book(book['id'], req_lang)
+    
+    # Generate filename and caption
+    theme_name = (theme.get('name_uz') if req_lang == 'uz' else theme.get('name_ru')) or f"theme_{theme_id}"
+    safe_name = "".join(c for c in theme_name if c.isalnum() or c in (' ', '-', '_'))[:50]
+    output_filename = f"{safe_name}_{req_lang}.pdf"
+    start, end = theme_pages(theme, req_lang)
+    caption = get_text("theme_pdf_caption", user_lang, emoji=emoji, theme_name=safe_name, start_page=start + 1, end_page=end + 1, book_title=(book.get('title_uz') if user_lang == 'uz' else book.get('title_ru')))
+    cache_key = theme_key(theme_id, req_lang, start, end)
+    
+    # Already generated and uploaded once: resend by file_id
+    if await send_cached_document(query.message, cache_key, caption=caption):
+        return
+    
+    # Prebuilt by database/pregenerate_theme_pdfs.py: Telegram fetches it from storage
+    artifact = await asyncio.to_thread(get_theme_artifact, theme_id, req_lang)
+    # Built from another version of the book if its hash differs from our copy's
+    book_sha256 = await asyncio.to_thread(cached_book_sha256, pdf_path) if pdf_path and pdf_path.startswith('http') else None
+    if (artifact and (artifact.get('start_page'), artifact.get('end_page')) == (start, end)
+            and (not book_sha256 or artifact.get('source_sha256') == book_sha256)
+            and (artifact.get('size_bytes') or 0) <= TELEGRAM_URL_DOCUMENT_LIMIT):
+        try:
+            await upload_document(
+                query.message, cache_key,
+                document=artifact['url'],
+                filename=output_filename,
+                caption=caption,
+                read_timeout=120,
+                write_timeout=120
+            )
+            return
+        except TelegramError as e:
+            print(f"[PDF DEBUG] Prebuilt PDF could not be sent, generating: {e}")
     
     # Support for Supabase Storage URLs
-    temp_pdf_path = None
     if pdf_path and pdf_path.startswith('http'):
-        import aiohttp
-        import tempfile
-        
-        print(f"[PDF DEBUG] Downloading book PDF from URL for extraction: {pdf_path}")
-        loading_msg = await query.message.reply_text(get_text("downloading_book_for_extraction", user_lang))
-        
-        try:
-            temp_dir = Path("data/temp_books")
-            temp_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Use filename as unique identifier for caching
-            filename = pdf_path.split('/')[-1]
-            temp_pdf_path = temp_dir / filename
-            
-            if not temp_pdf_path.exists():
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(pdf_path, timeout=aiohttp.ClientTimeout(total=300)) as resp:
-                        if resp.status == 200:
-                            content = await resp.read()
-                            with open(temp_pdf_path, 'wb') as f:
-                                f.write(content)
-                        else:
-                            raise Exception(f"Failed to download book: {resp.status}")
-            
-            pdf_path = str(temp_pdf_path)
-            await loading_msg.delete()
-        except Exception as e:
-            if 'loading_msg' in locals(): await loading_msg.delete()
-            await query.message.reply_text(get_text("book_download_failed", user_lang, error_message=str(e)))
+        pdf_path = await download_book_for_extraction(query.message, pdf_path, user_lang)
+        if not pdf_path:
             return
             
     if not pdf_path or not Path(pdf_path).exists():
@@ -436,51 +597,48 @@ async def handle_theme_pdf_download(update: Update, context: ContextTypes.DEFAUL
         await query.message.reply_text(get_text("pdf_file_missing", user_lang, lang_name=lang_name))
         return
     
-    # Generate filename
-    theme_name = (theme.get('name_uz') if req_lang == 'uz' else theme.get('name_ru')) or f"theme_{theme_id}"
-    safe_name = "".join(c for c in theme_name if c.isalnum() or c in (' ', '-', '_'))[:50]
-    output_filename = f"{safe_name}_{req_lang}.pdf"
-    
-    print(f"[PDF DEBUG] Extracting pages {theme.get('start_page')}-{theme.get('end_page')} to {output_filename}")
+    print(f"[PDF DEBUG] Extracting pages {start}-{end} to {output_filename}")
     
     try:
-        processor = PDFProcessor(pdf_path)
-        if processor.open():
-            output_path = processor.extract_theme_pdf(
-                theme.get('start_page') or 0,
-                theme.get('end_page') or 0,
-                output_filename
-            )
-            processor.close()
+        # Reuse the cached PDF for these pages; concurrent misses share one extraction
+        source = await asyncio.to_thread(source_hash, pdf_path)
+        pdf_bytes = await theme_extractions.do(
+            (source, start, end),
+            lambda: get_theme_pdf(pdf_path, source, start, end)
+        )
+        if pdf_bytes:
+            # Check file size (Telegram limit is 50MB, use 45MB to be safe)
+            file_size_mb = len(pdf_bytes) / (1024 * 1024)
+            print(f"[PDF DEBUG] Generated in memory: {file_size_mb:.2f} MB")
             
-            if output_path and output_path.exists():
-                print(f"[PDF DEBUG] Generated: {output_path}")
-                
-                # Check file size (Telegram limit is 50MB, use 45MB to be safe)
-                file_size_mb = output_path.stat().st_size / (1024 * 1024)
-                print(f"[PDF DEBUG] File size: {file_size_mb:.2f} MB")
-                
-                if file_size_mb > 45:
+            if len(pdf_bytes) > TELEGRAM_TARGET_BYTES:
+                # Too large to upload: compress (lossless first, then images) until it fits
+                compress_msg = await query.message.reply_text(get_text("compressing_pdf", user_lang, file_size=f"{file_size_mb:.1f}"))
+                theme_pdf = pdf_bytes
+                try:
+                    pdf_bytes = await theme_extractions.do(
+                        (source, start, end, "compressed"),
+                        lambda: get_compressed_theme_pdf(theme_pdf, source, start, end)
+                    )
+                finally:
+                    await compress_msg.delete()
+                if not pdf_bytes:
                     await query.message.reply_text(get_text("pdf_too_large", user_lang, file_size=f"{file_size_mb:.1f}"))
                     return
-                
-                start_page = (theme.get('start_page') or 0) + 1
-                end_page = (theme.get('end_page') or 0) + 1
-                await query.message.reply_document(
-                    document=open(output_path, 'rb'),
-                    filename=output_filename,
-                    caption=get_text("theme_pdf_caption", user_lang, emoji=emoji, theme_name=safe_name, start_page=start_page, end_page=end_page, book_title=(book.get('title_uz') if user_lang == 'uz' else book.get('title_ru'))),
-                    read_timeout=120,
-                    write_timeout=120
-                )
-                print(f"[PDF DEBUG] Sent successfully!")
-                return
-            else:
-                print(f"[PDF DEBUG] extract_theme_pdf returned: {output_path}")
             
+            await upload_document(
+                query.message, cache_key,
+                document=pdf_bytes,
+                filename=output_filename,
+                caption=caption,
+                read_timeout=120,
+                write_timeout=120
+            )
+            print(f"[PDF DEBUG] Sent successfully!")
+            return
         else:
-            print(f"[PDF DEBUG] processor.open() failed")
-            
+            print(f"[PDF DEBUG] get_theme_pdf returned no data")
+        
         await query.message.reply_text(get_text("failed_to_generate_pdf", user_lang))
     except Exception as e:
         print(f"[PDF DEBUG] Exception: {e}")
@@ -488,6 +646,245 @@ async def handle_theme_pdf_download(update: Update, context: ContextTypes.DEFAUL
             
 
 
+async def handle_bilingual_theme_pdf(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send a theme with its Uzbek and Russian pages side by side (theme_bi_<id>)."""
+    query = update.callback_query
+    user_id = update.effective_user.id
+    user_lang = get_user_lang(user_id)
+    await query.answer(get_text("generating_pdf", user_lang))
+    
+    theme_id = int(query.data.replace('theme_bi_', ''))
+    theme = get_theme_by_id(theme_id)
+    book = get_book_by_id(theme.get('book_id')) if theme else None
+    if not theme or not book:
+        await query.message.reply_text(get_text("theme_not_found", user_lang))
+        return
+    
+    record_theme(theme_id)
+    track_download(
+        book_id=book['id'],
+        download_type="theme_bilingual",
+        language="uz+ru",
+        telegram_user_id=user_id
+    )
+    
+    # Page ranges in each edition, from the precomputed mapping (database/map_theme_pages.py)
+    uz_range, ru_range = theme_pages(theme, 'uz'), theme_pages(theme, 'ru')
+    theme_name = theme.get('name_uz') if user_lang == 'uz' else theme.get('name_ru')
+    theme_name = theme_name or theme.get('name_uz') or theme.get('name_ru') or f"theme_{theme_id}"
+    safe_name = "".join(c for c in theme_name if c.isalnum() or c in (' ', '-', '_'))[:50]
+    caption = get_text(
+        "bilingual_pdf_caption", user_lang, theme_name=safe_name,
+        uz_pages=f"{uz_range[0] + 1}-{uz_range[1] + 1}", ru_pages=f"{ru_range[0] + 1}-{ru_range[1] + 1}",
+        book_title=(book.get('title_uz') if user_lang == 'uz' else book.get('title_ru'))
+    )
+    cache_key = bilingual_key(theme_id, uz_range, ru_range)
+    
+    if await send_cached_document(query.message, cache_key, caption=caption):
+        return
+    
+    paths = {}
+    for lang in ('uz', 'ru'):
+        pdf_path = book.get(f'pdf_path_{lang}')
+        if pdf_path and pdf_path.startswith('http'):
+            pdf_path = await download_book_for_extraction(query.message, pdf_path, user_lang)
+            if not pdf_path:
+                return
+        if not pdf_path or not Path(pdf_path).exists():
+            lang_name = get_text("uzbek_language" if lang == 'uz' else "russian_language", user_lang)
+            await query.message.reply_text(get_text("pdf_file_missing", user_lang, lang_name=lang_name))
+            return
+        paths[lang] = pdf_path
+    
+    try:
+        uz_source = await asyncio.to_thread(source_hash, paths['uz'])
+        ru_source = await asyncio.to_thread(source_hash, paths['ru'])
+        pdf_bytes = await theme_extractions.do(
+            (uz_source, uz_range, ru_source, ru_range),
+            lambda: get_bilingual_pdf(paths['uz'], uz_source, uz_range, paths['ru'], ru_source, ru_range)
+        )
+        if not pdf_bytes:
+            await query.message.reply_text(get_text("failed_to_generate_pdf", user_lang))
+            return
+        if len(pdf_bytes) > TELEGRAM_TARGET_BYTES:
+            await query.message.reply_text(get_text("pdf_too_large", user_lang, file_size=f"{len(pdf_bytes) / (1024 * 1024):.1f}"))
+            return
+        
+        await upload_document(
+            query.message, cache_key,
+            document=pdf_bytes,
+            filename=f"{safe_name}_uz_ru.pdf",
+            caption=caption,
+            read_timeout=120,
+            write_timeout=120
+        )
+    except Exception as e:
+        print(f"[PDF DEBUG] Bilingual PDF failed: {e}")
+        await query.message.reply_text(get_text("error_message", user_lang, error_message=str(e)))
+
+
+async def handle_theme_preview(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send low-resolution images of a theme's first pages."""
+    query = update.callback_query
+    user_lang = get_user_lang(update.effective_user.id)
+    await query.answer()
+    
+    # Parse callback: theme_preview_uz_123 or theme_preview_ru_123
+    req_lang, theme_id = query.data.replace('theme_preview_', '').split('_')
+    theme_id = int(theme_id)
+    
+    theme = get_theme_by_id(theme_id)
+    book = get_book_by_id(theme.get('book_id')) if theme else None
+    if not theme or not book:
+        await query.message.reply_text(get_text("theme_not_found", user_lang))
+        return
+    
+    start, end = theme_pages(theme, req_lang)
+    theme_name = (theme.get('name_uz') if req_lang == 'uz' else theme.get('name_ru')) or theme.get('name_uz') or theme.get('name_ru')
+    caption = get_text("theme_preview_caption", user_lang, theme_name=theme_name, start_page=start + 1, end_page=end + 1)
+    cache_keys = [preview_key(theme_id, req_lang, page) for page in preview_pages(start, end)]
+    
+    if await send_cached_photos(query.message, cache_keys, caption=caption):
+        return
+    
+    pdf_path = book.get(f'pdf_path_{req_lang}')
+    if pdf_path and pdf_path.startswith('http'):
+        pdf_path = await download_book_for_extraction(query.message, pdf_path, user_lang)
+        if not pdf_path:
+            return
+    if not pdf_path or not Path(pdf_path).exists():
+        await query.message.reply_text(get_text("pdf_file_not_found", user_lang))
+        return
+    
+    try:
+        source = await asyncio.to_thread(source_hash, pdf_path)
+        images = await theme_extractions.do(
+            (source, start, end, "preview"),
+            lambda: get_theme_previews(pdf_path, source, start, end)
+        )
+        await upload_photos(query.message, cache_keys, images, caption=caption)
+    except Exception as e:
+        print(f"[PDF DEBUG] Preview failed: {e}")
+        await query.message.reply_text(get_text("error_message", user_lang, error_message=str(e)))
+
+
+def _bundle_keyboard(themes: List[Dict], selected: List[int], book_id: int, lang: str) -> InlineKeyboardMarkup:
+    keyboard = []
+    for theme in themes[:BUNDLE_MAX_THEMES]:
+        name = theme.get('name_uz') if lang == 'uz' else theme.get('name_ru')
+        name = name or theme.get('name_uz') or theme.get('name_ru') or str(theme['id'])
+        name = name[:35] + '...' if len(name) > 35 else name
+        mark = "✅" if theme['id'] in selected else "⬜"
+        keyboard.append([InlineKeyboardButton(f"{mark} {name}", callback_data=f"bundle_t_{theme['id']}")])
+    keyboard.append([InlineKeyboardButton(get_text('bundle_download', lang, count=len(selected)), callback_data="bundle_dl")])
+    keyboard.append([InlineKeyboardButton(get_text('back', lang), callback_data=f"book_{book_id}")])
+    return InlineKeyboardMarkup(keyboard)
+
+
+async def handle_theme_bundle(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Pick several themes of a book (bundle_<book>_<lang>, bundle_t_<theme>) and download them as one PDF (bundle_dl)."""
+    query = update.callback_query
+    user_id = update.effective_user.id
+    user_lang = get_user_lang(user_id)
+    bundle = context.user_data.get('bundle')
+    
+    if query.data == 'bundle_dl':
+        if not bundle or not bundle['themes']:
+            await query.answer(get_text('bundle_empty', user_lang), show_alert=True)
+            return
+        await query.answer(get_text("generating_pdf", user_lang))
+        await send_theme_bundle(query.message, user_id, bundle, user_lang)
+        return
+    
+    if query.data.startswith('bundle_t_'):
+        if not bundle:
+            # Selection was lost (e.g. restart): nothing to toggle
+            await query.answer()
+            return
+        theme_id = int(query.data.replace('bundle_t_', ''))
+        if theme_id in bundle['themes']:
+            bundle['themes'].remove(theme_id)
+        else:
+            bundle['themes'].append(theme_id)
+    else:
+        _, book_id, req_lang = query.data.split('_')
+        bundle = context.user_data['bundle'] = {'book_id': int(book_id), 'lang': req_lang, 'themes': []}
+    
+    await query.answer()
+    themes = get_themes_by_book(bundle['book_id'])
+    await query.message.edit_text(
+        get_text('bundle_select_prompt', user_lang, count=len(bundle['themes'])),
+        reply_markup=_bundle_keyboard(themes, bundle['themes'], bundle['book_id'], user_lang)
+    )
+
+
+async def send_theme_bundle(message, user_id: int, bundle: Dict, user_lang: str) -> None:
+    """Build one PDF from all selected themes of a book and send it."""
+    book = get_book_by_id(bundle['book_id'])
+    if not book:
+        await message.reply_text(get_text("book_not_found", user_lang))
+        return
+    req_lang = bundle['lang']
+    selected = [t for t in get_themes_by_book(book['id']) if t['id'] in bundle['themes']]
+    ranges = merge_ranges([
+        (start, end) for start, end in (theme_pages(t, req_lang) for t in selected) if end >= start
+    ])
+    if not ranges:
+        await message.reply_text(get_text("failed_to_generate_pdf", user_lang))
+        return
+    
+    track_download(
+        book_id=book['id'],
+        download_type="theme_bundle",
+        language=req_lang,
+        telegram_user_id=user_id
+    )
+    
+    title = (book.get('title_uz') if req_lang == 'uz' else book.get('title_ru')) or book.get('title_uz') or book.get('title_ru') or book.get('subject')
+    pages = ", ".join(f"{start + 1}-{end + 1}" for start, end in ranges)
+    caption = get_text("bundle_caption", user_lang, book_title=title, count=len(selected), pages=pages[:300])
+    cache_key = bundle_key(book['id'], req_lang, ranges)
+    
+    if await send_cached_document(message, cache_key, caption=caption):
+        return
+    
+    pdf_path = book.get(f'pdf_path_{req_lang}')
+    if pdf_path and pdf_path.startswith('http'):
+        pdf_path = await download_book_for_extraction(message, pdf_path, user_lang)
+        if not pdf_path:
+            return
+    if not pdf_path or not Path(pdf_path).exists():
+        await message.reply_text(get_text("pdf_file_not_found", user_lang))
+        return
+    
+    try:
+        # All ranges are copied from one open document in a single worker call
+        source = await asyncio.to_thread(source_hash, pdf_path)
+        pdf_bytes = await theme_extractions.do(
+            (source, "bundle", tuple(ranges)),
+            lambda: get_bundle_pdf(pdf_path, source, ranges)
+        )
+        if not pdf_bytes:
+            await message.reply_text(get_text("failed_to_generate_pdf", user_lang))
+            return
+        if len(pdf_bytes) > TELEGRAM_TARGET_BYTES:
+            await message.reply_text(get_text("pdf_too_large", user_lang, file_size=f"{len(pdf_bytes) / (1024 * 1024):.1f}"))
+            return
+        
+        safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_'))[:40]
+        await upload_document(
+            message, cache_key,
+            document=pdf_bytes,
+            filename=f"{safe_title}_{len(selected)}_{req_lang}.pdf",
+            caption=caption,
+            read_timeout=120,
+            write_timeout=120
+        )
+    except Exception as e:
+        print(f"[PDF DEBUG] Bundle failed: {e}")
+        await message.reply_text(get_text("error_message", user_lang, error_message=str(e)))
+
+
 async def handle_themes_list(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show list of themes for a book."""
     query = update.callback_query
@@ -8,6 +8,7 @@ from telegram.ext import ContextTypes
 import sys
 sys.path.append('../..')
 from bot.translations import get_text
+from config import SEARCH_PAGE_SIZE, SEARCH_PAGE_FETCH
 from database.models import (
     get_session, Theme, Book,
     use_supabase
@@ -33,6 +34,7 @@ except ImportError:
 
 # Initialize local search engine as fallback
 from services.search_engine import get_search_engine
+from services.heavy_hitters import record_search, record_theme
 search_engine = get_search_engine()
 
 
@@ -63,10 +65,10 @@ async def perform_search(
         context.user_data['last_search'] = query
         
     # Use Supabase search if available, otherwise use local engine
-    limit = 5
+    limit = SEARCH_PAGE_SIZE
     if SUPABASE_SEARCH and use_supabase():
         # Fetch limit + 1 to check for next page
-        results = sb_search_themes(query, limit=limit + 1, offset=offset)
+        results = sb_search_themes(query, limit=SEARCH_PAGE_FETCH, offset=offset)
         
         # Convert to consistent format
         formatted_results = []
@@ -102,6 +104,8 @@ async def perform_search(
     lang = get_user_lang(user.id)
     
     # Track search analytics (only on first page)
+    if offset == 0:
+        record_search(query)
     if SUPABASE_SEARCH and offset == 0:
         track_search(
             query=query,
@@ -200,6 +204,8 @@ async def handle_theme_selection(update: Update, context: ContextTypes.DEFAULT_T
         await query.edit_message_text(get_text('theme_not_found', lang))
         return
     
+    record_theme(theme_id)
+    
     book = get_book_by_id(theme['book_id'])
     book_id = book['id'] if book else 0
     grade = book['grade'] if book else '?'
@@ -263,6 +269,19 @@ async def handle_theme_selection(update: Update, context: ContextTypes.DEFAULT_T
         
         if theme_rows:
             keyboard.append(theme_rows)
+        
+        # Both editions next to each other
+        if has_uz_pdf and has_ru_pdf:
+            keyboard.append([
+                InlineKeyboardButton(get_text('download_bilingual_pdf', lang), callback_data=f"theme_bi_{theme_id}")
+            ])
+    
+    # Preview of the first pages, in the user's language where available
+    preview_lang = lang if (has_uz_pdf if lang == 'uz' else has_ru_pdf) else ('ru' if has_ru_pdf else 'uz')
+    if has_uz_pdf or has_ru_pdf:
+        keyboard.append([
+            InlineKeyboardButton(get_text('theme_preview', lang), callback_data=f"theme_preview_{preview_lang}_{theme_id}")
+        ])
     
     # Educational resources
     keyboard.append([
@@ -3,6 +3,7 @@ Uzbek School Books Telegram Bot
 SignPaper - Professional Educational Bot
 Main entry point for the bot.
 """
+import asyncio
 import logging
 from telegram import Update, BotCommand
 from telegram.ext import (
@@ -16,8 +17,17 @@ from telegram.ext import (
 )
 import sys
 sys.path.append('..')
-from config import TELEGRAM_BOT_TOKEN
+from config import TELEGRAM_BOT_TOKEN, ENABLE_LOCAL_MIRROR
 from database.models import init_db
+from database.local_mirror import run_sync_loop
+from database.analytics_writer import analytics_writer
+from database.rollups import run_rollup_loop, get_activity_summary
+from database.active_users import active_users, run_sketch_flush_loop
+from database.archive_analytics import run_retention_loop
+from database.file_id_cache import file_id_cache
+from services import metrics
+from services.cache_warmer import run_cache_warmer
+from services.pdf_worker import pdf_workers
 from bot.handlers.search import (
     search_command,
     handle_theme_selection,
@@ -32,6 +42,9 @@ from bot.handlers.books import (
     handle_book_selection,
     handle_book_pdf_download,
     handle_theme_pdf_download,
+    handle_theme_preview,
+    handle_theme_bundle,
+    handle_bilingual_theme_pdf,
     handle_themes_list,
     handle_back_languages,
 )
@@ -60,15 +73,17 @@ try:
     from database.supabase_client import (
         track_user_action, track_download,
         get_user_lang, set_user_lang,
-        get_stats
+        get_stats, get_popular_searches, is_supabase_configured
     )
     ANALYTICS_AVAILABLE = True
 except ImportError:
     ANALYTICS_AVAILABLE = False
+    def is_supabase_configured(): return False
     # Fallback if Supabase client not fully updated
     def get_user_lang(uid): return 'uz'
     def set_user_lang(uid, lang): return False
     def get_stats(): return {}
+    def get_popular_searches(days=7, limit=10): return []
 
 from bot.translations import get_text
 
@@ -219,11 +234,45 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
                             searches=stats.get('total_searches', 0),
                             downloads=stats.get('total_downloads', 0))
         
+        # Last 7 days from the daily rollups (a few hundred rows at most)
+        weekly = await asyncio.to_thread(get_activity_summary, 7)
+        if weekly:
+            response += get_text('stats_weekly', lang,
+                                 searches=weekly.get('search', 0),
+                                 downloads=weekly.get('download', 0),
+                                 views=weekly.get('view_theme', 0))
+        
+        # Top queries of the week (reads only the recent partitions)
+        popular = await asyncio.to_thread(get_popular_searches, 7, 5)
+        if popular:
+            response += get_text('stats_top_queries', lang) + '\n'.join(
+                # User text: strip Markdown control characters
+                f"{i}. {row['query'].translate({ord(c): None for c in '*_`['})} ({row['search_count']})"
+                for i, row in enumerate(popular, 1)
+            )
+        
+        # Distinct active users from the HyperLogLog sketches (~1.6% error)
+        active = await asyncio.to_thread(active_users.get_active_users)
+        response += get_text('stats_active', lang,
+                             dau=active.get('dau', 0),
+                             wau=active.get('wau', 0),
+                             mau=active.get('mau', 0))
+        
         await update.message.reply_text(response, parse_mode='Markdown')
     except Exception as e:
         await update.message.reply_text(f"Error fetching stats: {e}")
 
 
+async def metrics_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /metrics command - show in-process metrics to admins."""
+    lang = get_user_lang(update.effective_user.id)
+    if str(update.effective_user.id) != str(ADMIN_CHAT_ID):
+        await update.message.reply_text(get_text('admin_only', lang))
+        return
+
+    await update.message.reply_text(f"📈 Metrics\n\n{metrics.format_report()}")
+
+
 async def set_bot_commands(application: Application) -> None:
     """Set bot commands for the menu."""
     commands = [
@@ -237,6 +286,35 @@ async def set_bot_commands(application: Application) -> None:
     await application.bot.set_my_commands(commands)
 
 
+async def post_init(application: Application) -> None:
+    """Set bot commands and start background jobs."""
+    await set_bot_commands(application)
+
+    # Warm PDF workers before the first download arrives
+    await pdf_workers.start()
+    
+    tasks = application.bot_data.setdefault("background_tasks", [])
+    if is_supabase_configured():
+        await asyncio.to_thread(file_id_cache.load)
+        tasks.append(asyncio.create_task(analytics_writer.run()))
+        tasks.append(asyncio.create_task(run_rollup_loop()))
+        tasks.append(asyncio.create_task(run_sketch_flush_loop()))
+        tasks.append(asyncio.create_task(run_cache_warmer()))
+        tasks.append(asyncio.create_task(run_retention_loop()))
+        if ENABLE_LOCAL_MIRROR:
+            tasks.append(asyncio.create_task(run_sync_loop()))
+
+
+async def post_shutdown(application: Application) -> None:
+    """Stop background jobs and flush queued analytics."""
+    for task in application.bot_data.get("background_tasks", []):
+        task.cancel()
+    await analytics_writer.stop()
+    pdf_workers.shutdown()
+    if is_supabase_configured():
+        await asyncio.to_thread(active_users.flush)
+
+
 # ═══════════════════════════════════════════════════════════════════════════
 # MAIN APPLICATION
 # ═══════════════════════════════════════════════════════════════════════════
@@ -264,6 +342,7 @@ def main() -> None:
     application.add_handler(CommandHandler("books", books_command))
     application.add_handler(CommandHandler("resources", resources_command))
     application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(CommandHandler("metrics", metrics_command))
     application.add_handler(CommandHandler("feedback", feedback_command))
     application.add_handler(CommandHandler("myid", myid_command))
     application.add_handler(CommandHandler("reply", reply_command))
@@ -301,6 +380,9 @@ def main() -> None:
     application.add_handler(CallbackQueryHandler(handle_book_selection, pattern=r"^book_\d+$"))
     application.add_handler(CallbackQueryHandler(handle_book_pdf_download, pattern=r"^dl_book_"))
     application.add_handler(CallbackQueryHandler(handle_theme_pdf_download, pattern=r"^theme_pdf_"))
+    application.add_handler(CallbackQueryHandler(handle_theme_preview, pattern=r"^theme_preview_(uz|ru)_\d+$"))
+    application.add_handler(CallbackQueryHandler(handle_bilingual_theme_pdf, pattern=r"^theme_bi_\d+$"))
+    application.add_handler(CallbackQueryHandler(handle_theme_bundle, pattern=r"^bundle_(\d+_(uz|ru)|t_\d+|dl)$"))
     application.add_handler(CallbackQueryHandler(handle_themes_list, pattern=r"^themes_\d+$"))
     
     # Search Pagination
@@ -342,8 +424,9 @@ def main() -> None:
     # Text message handler (search)
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, text_search_handler))
     
-    # Set bot commands
-    application.post_init = set_bot_commands
+    # Set bot commands and start background jobs
+    application.post_init = post_init
+    application.post_shutdown = post_shutdown
     
     # Start bot
     print("=" * 50)
@@ -21,6 +21,8 @@ TRANSLATIONS = {
         'preparing_pdf': "⏳ PDF tayyorlanmoqda... Iltimos kuting.",
         'loading_pdf': "⏳ PDF yuklanmoqda...",
         'book_pdf_caption': "{lang_emoji} {title}\n📊 {grade}-sinf\n📁 {subject}",
+        'book_part_caption': "{caption}\n📑 Qism {index}/{count}: sahifalar {start_page} - {end_page}",
+        'splitting_book': "📑 Kitob 50 MB dan katta, qismlarga bo'linmoqda...",
         'open_in_browser': "{lang_emoji} Brauzerda ochish",
         'pdf_download_error_with_link': "❌ PDF yuklashda xatolik: {error_message}...\n\nQuyidagi tugmani bosing:",
         'pdf_file_not_found': "❌ PDF fayl topilmadi.",
@@ -30,10 +32,20 @@ TRANSLATIONS = {
         'book_download_failed': "❌ Kitobni yuklab bo'lmadi: {error_message}",
         'pdf_file_missing': "❌ {lang_name} PDF topilmadi (fayl mavjud emas).",
         'pdf_too_large': "❌ PDF juda katta ({file_size} MB).\nTelegram limiti: 50 MB.",
+        'compressing_pdf': "🗜 PDF katta ({file_size} MB), siqilmoqda...",
         'theme_pdf_caption': "📄 {emoji} {theme_name}\nSahifalar: {start_page} - {end_page}\n📚 {book_title}",
         'failed_to_generate_pdf': "❌ PDF yaratib bo'lmadi.",
         'theme_details': "📁 **Mavzu:** {theme_name}\n📘 **Kitob:** {book_title}\n📄 **Sahifalar:** {start_page} - {end_page}",
         'download_theme_pdf': "📥 Mavzuni yuklab olish",
+        'theme_preview': "👁 Ko'rib chiqish",
+        'download_bilingual_pdf': "🇺🇿🇷🇺 Ikki tilda yonma-yon",
+        'bilingual_pdf_caption': "📄 🇺🇿🇷🇺 {theme_name}\nSahifalar: {uz_pages} (UZ) / {ru_pages} (RU)\n📚 {book_title}",
+        'select_themes': "📦 Bir nechta mavzuni yuklab olish",
+        'bundle_select_prompt': "📦 Bitta PDF faylga kiritiladigan mavzularni tanlang (tanlandi: {count}):",
+        'bundle_download': "📥 Tanlanganlarni yuklab olish ({count})",
+        'bundle_empty': "Kamida bitta mavzuni tanlang",
+        'bundle_caption': "📦 {book_title}\n📑 {count} ta mavzu\nSahifalar: {pages}",
+        'theme_preview_caption': "👁 {theme_name}\nMavzuning dastlabki sahifalari (sahifalar {start_page} - {end_page})",
         'search_usage': "🔍 **Mavzularni qidirish**\n\nFoydalanish: `/search <so'z>`\nMasalan: `/search Pifagor teoremasi`\n\nYoki shunchaki istalgan matnni yozing!",
         'search_prompt': "🔍 **Qidirish uchun biron narsa yozing:**\nMasalan: `matematika` yoki `tarix`",
         'searching': "🔍 Qidirilmoqda...",
@@ -57,6 +69,9 @@ TRANSLATIONS = {
         'refresh_quiz': "🔄 Yangilash",
         'admin_only': "❌ Ushbu buyruq faqat administratorlar uchun.",
         'stats_report': "📊 **SignPaper Statistika**\n\n👤 Foydalanuvchilar: {users}\n🔍 Qidiruvlar: {searches}\n📥 Yuklashlar: {downloads}",
+        'stats_weekly': "\n\n📅 **Oxirgi 7 kun**\n🔍 Qidiruvlar: {searches}\n📥 Yuklashlar: {downloads}\n📑 Mavzu ko'rishlar: {views}",
+        'stats_active': "\n\n👥 **Faol foydalanuvchilar**\nKunlik: {dau}\nHaftalik: {wau}\nOylik: {mau}",
+        'stats_top_queries': "\n\n🔥 **Haftaning top so'rovlari**\n",
         'thank_you_feedback': "Rahmat!",
         'feedback_received': "⭐ **{rating}** ball uchun rahmat! Fikringiz biz uchun muhim.",
         'support_message': "📞 **Qo'llab-quvvatlash**\n\nSavolingiz bo'lsa @SignPaperSupport profilinga yozishingiz mumkin.",
@@ -98,6 +113,8 @@ TRANSLATIONS = {
         'preparing_pdf': "⏳ Подготовка PDF... Пожалуйста, подождите.",
         'loading_pdf': "⏳ Загрузка PDF...",
         'book_pdf_caption': "{lang_emoji} {title}\n📊 {grade}-й класс\n📁 {subject}",
+        'book_part_caption': "{caption}\n📑 Часть {index}/{count}: страницы {start_page} - {end_page}",
+        'splitting_book': "📑 Книга больше 50 MB, делим на части...",
         'open_in_browser': "{lang_emoji} Открыть в браузере",
         'pdf_download_error_with_link': "❌ Ошибка при загрузке PDF: {error_message}...\n\nНажмите кнопку ниже:",
         'pdf_file_not_found': "❌ PDF файл не найден.",
@@ -107,10 +124,20 @@ TRANSLATIONS = {
         'book_download_failed': "❌ Не удалось загрузить книгу: {error_message}",
         'pdf_file_missing': "❌ {lang_name} PDF не найден (файл отсутствует).",
         'pdf_too_large': "❌ PDF слишком большой ({file_size} MB).\nЛимит Телеграм: 50 MB.",
+        'compressing_pdf': "🗜 PDF большой ({file_size} MB), сжимаем...",
         'theme_pdf_caption': "📄 {emoji} {theme_name}\nСтраницы: {start_page} - {end_page}\n📚 {book_title}",
         'failed_to_generate_pdf': "❌ Не удалось создать PDF.",
         'theme_details': "📁 **Тема:** {theme_name}\n📘 **Книга:** {book_title}\n📄 **Страницы:** {start_page} - {end_page}",
         'download_theme_pdf': "📥 Скачать тему",
+        'theme_preview': "👁 Предпросмотр",
+        'download_bilingual_pdf': "🇺🇿🇷🇺 На двух языках рядом",
+        'bilingual_pdf_caption': "📄 🇺🇿🇷🇺 {theme_name}\nСтраницы: {uz_pages} (UZ) / {ru_pages} (RU)\n📚 {book_title}",
+        'select_themes': "📦 Скачать несколько тем",
+        'bundle_select_prompt': "📦 Выберите темы для одного PDF файла (выбрано: {count}):",
+        'bundle_download': "📥 Скачать выбранные ({count})",
+        'bundle_empty': "Выберите хотя бы одну тему",
+        'bundle_caption': "📦 {book_title}\n📑 Тем: {count}\nСтраницы: {pages}",
+        'theme_preview_caption': "👁 {theme_name}\nПервые страницы темы (страницы {start_page} - {end_page})",
         'search_usage': "🔍 **Поиск по темам**\n\nИспользование: `/search <запрос>`\nНапример: `/search Теорема Пифагора`\n\nИли просто напишите любой текст!",
         'search_prompt': "🔍 **Напишите что-нибудь для поиска:**\nНапример: `математика` или `история`",
         'searching': "🔍 Поиск...",
@@ -134,6 +161,9 @@ TRANSLATIONS = {
         'refresh_quiz': "🔄 Обновить",
         'admin_only': "❌ Эта команда доступна только администраторам.",
         'stats_report': "📊 **Статистика SignPaper**\n\n👤 Пользователи: {users}\n🔍 Поиски: {searches}\n📥 Загрузки: {downloads}",
+        'stats_weekly': "\n\n📅 **Последние 7 дней**\n🔍 Поиски: {searches}\n📥 Загрузки: {downloads}\n📑 Просмотры тем: {views}",
+        'stats_active': "\n\n👥 **Активные пользователи**\nЗа день: {dau}\nЗа неделю: {wau}\nЗа месяц: {mau}",
+        'stats_top_queries': "\n\n🔥 **Топ запросов недели**\n",
         'thank_you_feedback': "Спасибо!",
         'feedback_received': "⭐ Спасибо за оценку **{rating}**! Ваше мнение важно для нас.",
         'support_message': "📞 **Поддержка**\n\nЕсли у вас есть вопросы, можете написать в профиль @SignPaperSupport.",
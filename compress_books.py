@@ -1,36 +1,64 @@
 # Compress large PDFs
+#
+# Usage:  python compress_books.py PATH [PATH ...] [--target-mb 45] [--output-dir temp_compressed] [--in-place]
+#
+# PATH may be a PDF or a directory (searched recursively). Each file goes
+# through services/pdf_compressor.py: lossless first, then image
+# downsampling at lower DPI until it fits the target size.
+import argparse
 import os
-import fitz # PyMuPDF
 from pathlib import Path
 
-def compress_pdf(input_path, output_path):
-    print(f"Compressing {input_path}...")
-    try:
-        doc = fitz.open(input_path)
-        # Save with garbage collection and compression
-        doc.save(output_path, garbage=4, deflate=True, clean=True)
-        doc.close()
-        
-        old_size = os.path.getsize(input_path) / (1024 * 1024)
-        new_size = os.path.getsize(output_path) / (1024 * 1024)
-        print(f"  Done: {old_size:.1f}MB -> {new_size:.1f}MB")
-        return new_size
-    except Exception as e:
-        print(f"  Error: {e}")
-        return None
-
-# Target files
-large_files = [
-    r"c:\Users\user\Downloads\Telegram Desktop\books (2)\books\uzbek\Tarix\6-sinf Tarix yangi darslik..pdf",
-    r"c:\Users\user\Downloads\Telegram Desktop\books (2)\books\uzbek\Biologiya\botanika_6_uzb.pdf"
-]
-
-Path("temp_compressed").mkdir(exist_ok=True)
-
-for f in large_files:
-    if os.path.exists(f):
-        out_name = "compressed_" + os.path.basename(f)
-        out_path = os.path.join("temp_compressed", out_name)
-        compress_pdf(f, out_path)
-    else:
-        print(f"File not found: {f}")
+from services.pdf_compressor import compress_pdf, TELEGRAM_TARGET_BYTES
+
+
+def find_pdfs(paths):
+    for p in map(Path, paths):
+        if p.is_dir():
+            yield from sorted(p.rglob("*.pdf"))
+        elif p.exists():
+            yield p
+        else:
+            print(f"File not found: {p}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compress book PDFs to fit Telegram's upload limit")
+    parser.add_argument("paths", nargs="+", help="PDF files or directories")
+    parser.add_argument("--target-mb", type=float, default=TELEGRAM_TARGET_BYTES / (1024 * 1024))
+    parser.add_argument("--output-dir", default="temp_compressed")
+    parser.add_argument("--in-place", action="store_true", help="replace originals that got smaller")
+    parser.add_argument("--all", action="store_true", help="also compress files already under the target")
+    args = parser.parse_args()
+
+    target_bytes = int(args.target_mb * 1024 * 1024)
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(exist_ok=True)
+
+    total_in = total_out = 0
+    for f in find_pdfs(args.paths):
+        if not args.all and f.stat().st_size <= target_bytes:
+            continue
+        out_path = output_dir / ("compressed_" + f.name)
+        print(f"Compressing {f}...")
+        try:
+            result = compress_pdf(f, out_path, target_bytes)
+        except Exception as e:
+            print(f"  Error: {e}")
+            continue
+
+        status = "" if result["fits"] else "  (still over target)"
+        print(f"  Done: {result['input_bytes'] / 1048576:.1f}MB -> {result['output_bytes'] / 1048576:.1f}MB "
+              f"({result['ratio']:.0%}, {result['stage']}, {result['seconds']:.1f}s){status}")
+        total_in += result["input_bytes"]
+        total_out += result["output_bytes"]
+
+        if args.in_place and result["output_bytes"] < result["input_bytes"]:
+            os.replace(out_path, f)
+
+    if total_in:
+        print(f"Total: {total_in / 1048576:.1f}MB -> {total_out / 1048576:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,22 +13,53 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 # Database
 DATABASE_PATH = BASE_DIR / os.getenv("DATABASE_PATH", "data/books.db")
 
+# Local read replica of the Supabase catalog
+MIRROR_DB_PATH = BASE_DIR / os.getenv("MIRROR_DB_PATH", "data/catalog_mirror.db")
+
+# Durable spool for analytics events that could not be written
+SPOOL_DB_PATH = BASE_DIR / os.getenv("SPOOL_DB_PATH", "data/analytics_spool.db")
+
 # Search
 SEARCH_INDEX_PATH = BASE_DIR / os.getenv("SEARCH_INDEX_PATH", "data/search_index")
 
+# Search results per page; one extra row is fetched to detect a next page
+SEARCH_PAGE_SIZE = 5
+SEARCH_PAGE_FETCH = SEARCH_PAGE_SIZE + 1
+
 # Books
 BOOKS_DIR = BASE_DIR / os.getenv("BOOKS_DIR", "books")
 
+# Archived analytics partitions (gzip JSONL)
+ARCHIVE_DIR = BASE_DIR / os.getenv("ARCHIVE_DIR", "data/archive")
+
 # Output
 OUTPUT_DIR = BASE_DIR / os.getenv("OUTPUT_DIR", "data/generated")
 
+# Local copies of book PDFs downloaded from storage
+BOOK_CACHE_DIR = BASE_DIR / os.getenv("BOOK_CACHE_DIR", "data/temp_books")
+
+# Generated theme PDFs, keyed by (source hash, start, end)
+THEME_PDF_CACHE_DIR = OUTPUT_DIR / "themes"
+
+# Page-range parts of books too large to send as one document
+BOOK_PARTS_DIR = OUTPUT_DIR / "parts"
+
+# Low-resolution page previews of themes
+THEME_PREVIEW_DIR = OUTPUT_DIR / "previews"
+
 # Features
 ENABLE_SEMANTIC_SEARCH = os.getenv("ENABLE_SEMANTIC_SEARCH", "false").lower() == "true"
+ENABLE_LOCAL_MIRROR = os.getenv("ENABLE_LOCAL_MIRROR", "true").lower() == "true"
 
 # Ensure directories exist
 DATABASE_PATH.parent.mkdir(parents=True, exist_ok=True)
+MIRROR_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 SEARCH_INDEX_PATH.mkdir(parents=True, exist_ok=True)
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+BOOK_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+THEME_PDF_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+BOOK_PARTS_DIR.mkdir(parents=True, exist_ok=True)
+THEME_PREVIEW_DIR.mkdir(parents=True, exist_ok=True)
 BOOKS_DIR.mkdir(parents=True, exist_ok=True)
 (BOOKS_DIR / "uzbek").mkdir(exist_ok=True)
 (BOOKS_DIR / "russian").mkdir(exist_ok=True)
@@ -0,0 +1,181 @@
+"""
+Active Users
+Distinct-user counting with HyperLogLog sketches. Every analytics event
+feeds an in-process sketch for its Tashkent day and month; dirty sketches
+are periodically merged into the user_sketches table (one small base64
+blob per period). DAU/WAU/MAU come from merging daily sketches, so they
+cost the same no matter how large the raw event tables grow.
+"""
+import asyncio
+import os
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterable, List
+import sys
+sys.path.append('..')
+from services import metrics
+from services.hyperloglog import HyperLogLog
+from database.rollups import today
+
+# Seconds between sketch flushes to Supabase
+SKETCH_FLUSH_INTERVAL = int(os.getenv("SKETCH_FLUSH_INTERVAL", "60"))
+
+# Seconds an active-user estimate is reused before it is recomputed
+ACTIVE_USERS_CACHE_TTL = int(os.getenv("ACTIVE_USERS_CACHE_TTL", "60"))
+
+
+def day_key(day: date) -> str:
+    return day.isoformat()
+
+
+def month_key(day: date) -> str:
+    return day.strftime("%Y-%m")
+
+
+class ActiveUserSketches:
+    """Per-day and per-month HyperLogLog sketches of active user ids."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local: Dict[str, HyperLogLog] = {}
+        self._dirty: set = set()
+        self._cache: Dict[str, int] = {}
+        self._cache_time = 0.0
+        metrics.register_gauge("active_user_sketches_dirty", lambda: len(self._dirty))
+
+    def add(self, telegram_user_id) -> None:
+        """Record that a user was active now."""
+        if telegram_user_id is None:
+            return
+        day = today()
+        with self._lock:
+            for key in (day_key(day), month_key(day)):
+                sketch = self._local.get(key)
+                if sketch is None:
+                    sketch = self._local[key] = HyperLogLog()
+                sketch.add(telegram_user_id)
+                self._dirty.add(key)
+
+    def _fetch_remote(self, keys: Iterable[str]) -> Dict[str, HyperLogLog]:
+        from database.supabase_client import get_supabase
+        from database.resilience import supabase_breaker
+
+        keys = list(keys)
+        if not keys:
+            return {}
+        response = supabase_breaker.call(
+            lambda: get_supabase().table("user_sketches").select("period, registers").in_("period", keys).execute()
+        )
+        return {row["period"]: HyperLogLog.from_base64(row["registers"]) for row in response.data or []}
+
+    def flush(self) -> bool:
+        """Merge dirty local sketches into the stored ones."""
+        from database.supabase_client import get_supabase
+        from database.resilience import supabase_breaker
+
+        with self._lock:
+            keys = list(self._dirty)
+            snapshot = {key: bytes(self._local[key].registers) for key in keys}
+        local = {key: HyperLogLog(registers=registers) for key, registers in snapshot.items()}
+        if not keys:
+            return True
+
+        try:
+            remote = self._fetch_remote(keys)
+            rows = []
+            for key, sketch in local.items():
+                if key in remote:
+                    sketch.merge(remote[key])
+                rows.append({"period": key, "registers": sketch.to_base64()})
+            supabase_breaker.call(
+                lambda: get_supabase().table("user_sketches").upsert(rows, on_conflict="period").execute()
+            )
+        except Exception as e:
+            metrics.inc("active_user_flush_errors_total")
+            print(f"Error flushing active-user sketches: {e}")
+            return False
+
+        # Merging is idempotent, so events added meanwhile are simply re-sent next time
+        current = {day_key(today()), month_key(today())}
+        with self._lock:
+            for key in keys:
+                if self._local[key].registers == snapshot[key]:
+                    self._dirty.discard(key)
+            for key in list(self._local):
+                if key not in current and key not in self._dirty:
+                    del self._local[key]
+        metrics.inc("active_user_flushes_total")
+        return True
+
+    def _merged(self, keys: List[str]) -> HyperLogLog:
+        merged = HyperLogLog()
+        try:
+            for sketch in self._fetch_remote(keys).values():
+                merged.merge(sketch)
+        except Exception as e:
+            print(f"Error reading active-user sketches: {e}")
+        with self._lock:
+            for key in keys:
+                if key in self._local:
+                    merged.merge(self._local[key])
+        return merged
+
+    def count_days(self, days: int) -> int:
+        """Distinct users over the last `days` Tashkent days (including today)."""
+        end = today()
+        return self._merged([day_key(end - timedelta(days=i)) for i in range(days)]).count()
+
+    def count_month(self, month: str = None) -> int:
+        """Distinct users in a calendar month ('YYYY-MM', default current)."""
+        return self._merged([month or month_key(today())]).count()
+
+    def get_active_users(self) -> Dict[str, int]:
+        """DAU / WAU / MAU (rolling 1, 7 and 30 days), cached briefly."""
+        if self._cache and time.time() - self._cache_time < ACTIVE_USERS_CACHE_TTL:
+            return self._cache
+
+        end = today()
+        keys = [day_key(end - timedelta(days=i)) for i in range(30)]
+        sketches: Dict[str, HyperLogLog] = {}
+        try:
+            sketches = self._fetch_remote(keys)
+        except Exception as e:
+            print(f"Error reading active-user sketches: {e}")
+        with self._lock:
+            for key in keys:
+                if key in self._local:
+                    sketch = HyperLogLog(registers=self._local[key].registers)
+                    if key in sketches:
+                        sketch.merge(sketches[key])
+                    sketches[key] = sketch
+
+        result = {}
+        merged = HyperLogLog()
+        for i, key in enumerate(keys, start=1):
+            if key in sketches:
+                merged.merge(sketches[key])
+            if i == 1:
+                result["dau"] = merged.count()
+            elif i == 7:
+                result["wau"] = merged.count()
+        result["mau"] = merged.count()
+
+        self._cache = result
+        self._cache_time = time.time()
+        return result
+
+
+# Singleton instance
+active_users = ActiveUserSketches()
+
+
+async def run_sketch_flush_loop(interval: int = SKETCH_FLUSH_INTERVAL) -> None:
+    """Background task: persist dirty sketches periodically."""
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(active_users.flush)
+
+
+if __name__ == "__main__":
+    print(active_users.get_active_users())
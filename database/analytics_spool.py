@@ -0,0 +1,89 @@
+"""
+Analytics Spool
+Durable local append-only store for analytics events that could not be
+written to Supabase. Events are replayed in bulk once the backend
+recovers; each carries a client-generated event_id so replay is idempotent.
+"""
+import json
+import sqlite3
+import threading
+import time
+from typing import List, Tuple
+import sys
+sys.path.append('..')
+from config import SPOOL_DB_PATH
+from services import metrics
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_id TEXT UNIQUE NOT NULL,
+    table_name TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    spooled_at REAL NOT NULL
+);
+"""
+
+
+class AnalyticsSpool:
+    """SQLite (WAL) spool of (table, row) analytics events."""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or SPOOL_DB_PATH
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: fsync at checkpoints, not on every append batch
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+        metrics.register_gauge("analytics_spool_rows", self.size)
+        metrics.register_gauge("analytics_spool_oldest_age_seconds", self.oldest_age_seconds)
+
+    def append(self, events: List[Tuple[str, dict]]) -> None:
+        """Append events in one transaction (duplicates by event_id are ignored)."""
+        if not events:
+            return
+        now = time.time()
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO events (event_id, table_name, payload, spooled_at) VALUES (?, ?, ?, ?)",
+                [(row["event_id"], table, json.dumps(row, ensure_ascii=False), now) for table, row in events]
+            )
+            self.conn.commit()
+        metrics.inc("analytics_spooled_total", len(events))
+
+    def peek(self, limit: int) -> List[Tuple[int, str, dict]]:
+        """Get the oldest events as (seq, table, row) without removing them."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT seq, table_name, payload FROM events ORDER BY seq LIMIT ?", (limit,)
+            ).fetchall()
+        return [(seq, table, json.loads(payload)) for seq, table, payload in rows]
+
+    def remove(self, seqs: List[int]) -> None:
+        """Delete replayed events."""
+        with self._lock:
+            self.conn.executemany("DELETE FROM events WHERE seq = ?", [(seq,) for seq in seqs])
+            self.conn.commit()
+
+    def size(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def oldest_age_seconds(self) -> float:
+        with self._lock:
+            oldest = self.conn.execute("SELECT MIN(spooled_at) FROM events").fetchone()[0]
+        return time.time() - oldest if oldest else 0.0
+
+
+# Singleton instance
+_spool = None
+
+
+def get_spool() -> AnalyticsSpool:
+    """Get the global analytics spool instance."""
+    global _spool
+    if _spool is None:
+        _spool = AnalyticsSpool()
+    return _spool
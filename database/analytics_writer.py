@@ -0,0 +1,182 @@
+"""
+Analytics Writer
+Batches analytics events in memory and writes them to Supabase with
+multi-row inserts from a background task, so handlers never wait on an
+analytics round trip. Batches that cannot be written, and queue overflow,
+go to the durable local spool and are replayed once Supabase recovers.
+"""
+import asyncio
+import os
+import threading
+from collections import deque, defaultdict
+from typing import Deque, Dict, List, Optional, Tuple
+import sys
+sys.path.append('..')
+from services import metrics
+from database.analytics_spool import get_spool
+
+# Flush when this many events are queued, or every FLUSH_INTERVAL seconds
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "100"))
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "5"))
+# Upper bound on queued events; the oldest spill to the spool beyond this
+ANALYTICS_QUEUE_LIMIT = int(os.getenv("ANALYTICS_QUEUE_LIMIT", "10000"))
+
+Event = Tuple[str, dict]
+
+
+class AnalyticsWriter:
+    """Bounded in-memory queue of (table, row) events with batched flushing."""
+
+    def __init__(
+        self,
+        batch_size: int = ANALYTICS_BATCH_SIZE,
+        flush_interval: float = ANALYTICS_FLUSH_INTERVAL,
+        queue_limit: int = ANALYTICS_QUEUE_LIMIT
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_limit = queue_limit
+        self._queue: Deque[Event] = deque()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self.running = False
+        metrics.register_gauge("analytics_queue_depth", lambda: len(self._queue))
+
+    def enqueue(self, table: str, row: dict) -> bool:
+        """Queue one event. Never blocks on the network."""
+        overflow: List[Event] = []
+        with self._lock:
+            if len(self._queue) >= self.queue_limit:
+                # Spill a whole batch at once to keep spool writes rare
+                count = min(self.batch_size, len(self._queue))
+                overflow = [self._queue.popleft() for _ in range(count)]
+            self._queue.append((table, row))
+            size = len(self._queue)
+        metrics.inc("analytics_enqueued_total")
+        if overflow:
+            metrics.inc("analytics_overflow_total", len(overflow))
+            self._spool(overflow)
+
+        if size >= self.batch_size and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        return True
+
+    def _drain(self, max_items: int) -> List[Event]:
+        with self._lock:
+            count = min(max_items, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _spool(self, events: List[Event]) -> None:
+        """Persist events to the local spool; drop them only if that fails too."""
+        try:
+            get_spool().append(events)
+        except Exception as e:
+            metrics.inc("analytics_dropped_total", len(events))
+            print(f"Error spooling {len(events)} analytics events: {e}")
+
+    def _insert(self, events: List[Event]) -> None:
+        """Upsert a batch, one multi-row request per table. Raises on failure."""
+        from database.supabase_client import get_supabase
+        from database.resilience import supabase_breaker
+
+        by_table: Dict[str, List[dict]] = defaultdict(list)
+        for table, row in events:
+            by_table[table].append(row)
+
+        client = get_supabase()
+        for table, rows in by_table.items():
+            with metrics.timer("analytics_flush_seconds"):
+                # event_id makes retries and spool replays idempotent; the unique
+                # key (add_analytics_event_ids.sql) includes created_at because
+                # the tables are partitioned on it
+                supabase_breaker.call(
+                    lambda: client.table(table).upsert(
+                        rows, on_conflict="event_id,created_at", ignore_duplicates=True
+                    ).execute()
+                )
+
+    def write_batch(self, events: List[Event]) -> bool:
+        """Write a batch; on failure the whole batch goes to the spool."""
+        try:
+            self._insert(events)
+        except Exception as e:
+            metrics.inc("analytics_flush_errors_total")
+            print(f"Error flushing {len(events)} analytics events: {e}")
+            self._spool(events)
+            return False
+        metrics.inc("analytics_flushed_total", len(events))
+        return True
+
+    def flush_once(self) -> bool:
+        """Write up to one batch of queued events."""
+        events = self._drain(self.batch_size)
+        if not events:
+            return True
+        return self.write_batch(events)
+
+    def replay_spool(self) -> int:
+        """Replay spooled events oldest-first in batches. Returns events replayed."""
+        spool = get_spool()
+        replayed = 0
+        while True:
+            entries = spool.peek(self.batch_size)
+            if not entries:
+                break
+            try:
+                self._insert([(table, row) for _, table, row in entries])
+            except Exception as e:
+                print(f"Analytics spool replay paused: {e}")
+                break
+            spool.remove([seq for seq, _, _ in entries])
+            replayed += len(entries)
+        if replayed:
+            metrics.inc("analytics_replayed_total", replayed)
+        return replayed
+
+    def flush_all(self) -> None:
+        """Write everything queued; if the backend fails, spool the rest."""
+        while self._queue:
+            if not self.flush_once():
+                self._spool(self._drain(len(self._queue)))
+                break
+
+    async def run(self) -> None:
+        """Background task: flush on size or time trigger."""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self.running = True
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                healthy = True
+                while self._queue:
+                    if not await asyncio.to_thread(self.flush_once):
+                        healthy = False
+                        break
+                if healthy and spool_has_events():
+                    await asyncio.to_thread(self.replay_spool)
+        finally:
+            self.running = False
+            self._loop = None
+
+    async def stop(self) -> None:
+        """Flush remaining events on shutdown."""
+        self.running = False
+        await asyncio.to_thread(self.flush_all)
+
+
+def spool_has_events() -> bool:
+    """Cheap check used by the flush loop before attempting a replay."""
+    try:
+        return get_spool().size() > 0
+    except Exception:
+        return False
+
+
+# Singleton instance
+analytics_writer = AnalyticsWriter()
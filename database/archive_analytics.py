@@ -0,0 +1,167 @@
+"""
+Analytics Archival
+Retention job for the monthly analytics partitions. Partitions older than
+ANALYTICS_RETENTION_MONTHS are exported to gzip-compressed JSONL files
+(data/archive/<table>/<YYYY-MM>.<run time>.jsonl.gz) and then dropped. A
+partition is only dropped after its archive is complete and the daily
+rollups have consumed it, so reports keep their history. Late events for
+a month that was already archived wait in the default partition and are
+archived from there into a file of their own; earlier archives of the
+month are never overwritten.
+
+Run once:  python database/archive_analytics.py
+"""
+import asyncio
+import gzip
+import json
+import os
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, Tuple
+import sys
+sys.path.append('..')
+from config import ARCHIVE_DIR
+from services import metrics
+from database.rollups import refresh_rollups
+
+# Months of raw analytics kept online (in addition to the current month)
+ANALYTICS_RETENTION_MONTHS = int(os.getenv("ANALYTICS_RETENTION_MONTHS", "6"))
+
+# Seconds between retention runs
+ARCHIVE_INTERVAL = int(os.getenv("ARCHIVE_INTERVAL", "86400"))
+
+ARCHIVE_PAGE_SIZE = 1000
+
+
+def _month_bounds(month_start: date):
+    """UTC [start, end) of a month, matching the partition bounds."""
+    start = datetime(month_start.year, month_start.month, 1, tzinfo=timezone.utc)
+    if month_start.month == 12:
+        end = datetime(month_start.year + 1, 1, 1, tzinfo=timezone.utc)
+    else:
+        end = datetime(month_start.year, month_start.month + 1, 1, tzinfo=timezone.utc)
+    return start, end
+
+
+def ensure_partitions(months_ahead: int = 2, keep_months: int = ANALYTICS_RETENTION_MONTHS) -> bool:
+    """
+    Create partitions for the current and upcoming months, and move rows
+    out of the default partitions into monthly partitions of their own
+    (only for months within retention).
+    """
+    from database.supabase_client import get_supabase
+
+    try:
+        get_supabase().rpc("ensure_analytics_partitions", {
+            "p_months_ahead": months_ahead,
+            "p_keep_months": keep_months,
+        }).execute()
+        return True
+    except Exception as e:
+        print(f"Error creating analytics partitions: {e}")
+        return False
+
+
+def archive_path(table: str, month_start: date, run_at: datetime) -> Path:
+    """Archive file for one month of a table, unique to this retention run."""
+    return ARCHIVE_DIR / table / f"{month_start:%Y-%m}.{run_at:%Y%m%dT%H%M%SZ}.jsonl.gz"
+
+
+def archive_partition(table: str, month_start: date, target: Path) -> Tuple[int, Path]:
+    """
+    Export one month of a table to a gzip JSONL file next to target;
+    returns the row count and the temporary path, which the caller moves
+    to target once the month has been dropped.
+    """
+    from database.supabase_client import get_supabase
+
+    start, end = _month_bounds(month_start)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(target.name + ".part")
+
+    client = get_supabase()
+    count = 0
+    last_id = 0
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        while True:
+            # The created_at range prunes the scan to this month's partition
+            # (or to the default partition for late rows)
+            response = client.table(table).select("*") \
+                .gte("created_at", start.isoformat()) \
+                .lt("created_at", end.isoformat()) \
+                .gt("id", last_id) \
+                .order("id") \
+                .limit(ARCHIVE_PAGE_SIZE) \
+                .execute()
+            rows = response.data or []
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += len(rows)
+            if len(rows) < ARCHIVE_PAGE_SIZE:
+                break
+            last_id = rows[-1]["id"]
+
+    return count, tmp_path
+
+
+def run_retention(keep_months: int = ANALYTICS_RETENTION_MONTHS) -> Dict[str, Any]:
+    """Archive and drop every expired partition."""
+    from database.supabase_client import get_supabase
+
+    summary = {"archived": 0, "rows": 0, "failed": 0}
+
+    # Rollups must have consumed a partition before it can be dropped
+    if not refresh_rollups():
+        print("Skipping retention: rollup refresh failed")
+        return summary
+
+    client = get_supabase()
+    try:
+        expired = client.rpc("list_expired_analytics_partitions", {"p_keep_months": keep_months}).execute().data or []
+    except Exception as e:
+        print(f"Error listing analytics partitions: {e}")
+        return summary
+
+    run_at = datetime.now(timezone.utc)
+    for part in expired:
+        table = part["table_name"]
+        month_start = date.fromisoformat(part["month_start"])
+        target = archive_path(table, month_start, run_at)
+        try:
+            with metrics.timer("analytics_archive_seconds"):
+                rows, tmp_path = archive_partition(table, month_start, target)
+                client.rpc("drop_analytics_partition", {
+                    "p_table": table,
+                    "p_month": month_start.isoformat(),
+                    "p_archived_rows": rows,
+                }).execute()
+            # Kept under its temporary name until the rows are gone, so a
+            # refused drop leaves no archive behind to be duplicated next run
+            os.replace(tmp_path, target)
+            summary["archived"] += 1
+            summary["rows"] += rows
+            metrics.inc("analytics_partitions_archived_total")
+            print(f"Archived {part['partition_name']} ({month_start:%Y-%m}): {rows} rows")
+        except Exception as e:
+            partial = target.with_name(target.name + ".part")
+            if partial.exists():
+                partial.unlink()
+            summary["failed"] += 1
+            metrics.inc("analytics_archive_errors_total")
+            print(f"Error archiving {part['partition_name']} ({month_start:%Y-%m}): {e}")
+
+    return summary
+
+
+async def run_retention_loop(interval: int = ARCHIVE_INTERVAL) -> None:
+    """Background task: keep partitions ahead of time and archive old ones."""
+    while True:
+        await asyncio.to_thread(ensure_partitions)
+        await asyncio.to_thread(run_retention)
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    ensure_partitions()
+    result = run_retention()
+    print(f"✅ Archived {result['archived']} partitions ({result['rows']} rows), {result['failed']} failed")
@@ -0,0 +1,157 @@
+"""
+Telegram file_id Cache
+Maps content keys (a book PDF, a theme page range, a preview image) to
+the file_id Telegram returned when the file was first uploaded. Backed by
+the telegram_file_cache table and held in memory; lookups never hit the
+network.
+"""
+import threading
+from typing import Dict, List, Optional, Tuple
+import sys
+sys.path.append('..')
+from services import metrics
+from services.disk_cache import hash_key
+
+# Rows per request when loading; PostgREST caps responses at 1000 rows
+LOAD_PAGE_SIZE = 1000
+
+
+def book_key(book_id: int, lang: str) -> str:
+    return f"book:{book_id}:{lang}"
+
+
+def theme_key(theme_id: int, lang: str, start_page: int, end_page: int) -> str:
+    return f"theme:{theme_id}:{lang}:{start_page}-{end_page}"
+
+
+def bundle_key(book_id: int, lang: str, ranges) -> str:
+    # The range list is hashed: up to BUNDLE_MAX_THEMES ranges would overflow cache_key VARCHAR(100)
+    pages = ",".join(f"{start}-{end}" for start, end in ranges)
+    return f"bundle:{book_id}:{lang}:{hash_key(pages)[:16]}"
+
+
+def bilingual_key(theme_id: int, uz_range, ru_range) -> str:
+    return f"bilingual:{theme_id}:{uz_range[0]}-{uz_range[1]}:{ru_range[0]}-{ru_range[1]}"
+
+
+def preview_key(theme_id: int, lang: str, page: int) -> str:
+    return f"preview:{theme_id}:{lang}:{page}"
+
+
+def book_part_key(book_id: int, lang: str, index: int, count: int, start_page: int, end_page: int) -> str:
+    return f"{book_key(book_id, lang)}:part:{index}/{count}:{start_page}-{end_page}"
+
+
+class FileIdCache:
+    """In-memory file_id map, loaded lazily from Supabase and written through."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, str] = {}
+        self._loaded = False
+        metrics.register_gauge("file_id_cache_entries", lambda: len(self._entries))
+
+    def load(self) -> None:
+        """Load all cached ids, LOAD_PAGE_SIZE rows per request."""
+        from database.supabase_client import get_supabase, is_supabase_configured
+
+        if not is_supabase_configured():
+            self._loaded = True
+            return
+        try:
+            offset = 0
+            while True:
+                rows = get_supabase().table("telegram_file_cache").select(
+                    "cache_key, file_id"
+                ).order("cache_key").range(offset, offset + LOAD_PAGE_SIZE - 1).execute().data or []
+                with self._lock:
+                    for row in rows:
+                        self._entries.setdefault(row["cache_key"], row["file_id"])
+                if len(rows) < LOAD_PAGE_SIZE:
+                    break
+                offset += LOAD_PAGE_SIZE
+            self._loaded = True
+        except Exception as e:
+            # Retried on the next lookup
+            print(f"Error loading file_id cache: {e}")
+
+    def get(self, key: str) -> Optional[str]:
+        if not self._loaded:
+            self.load()
+        file_id = self._entries.get(key)
+        metrics.inc("file_id_cache_hits_total" if file_id else "file_id_cache_misses_total")
+        return file_id
+
+    def get_book_parts(self, book_id: int, lang: str) -> Optional[List[Tuple[str, int, int, str]]]:
+        """
+        Cached parts of a split book as (key, start page, end page, file_id)
+        in page order, or None unless every part of one split is cached.
+        """
+        if not self._loaded:
+            self.load()
+        prefix = f"{book_key(book_id, lang)}:part:"
+        with self._lock:
+            found = [(k, v) for k, v in self._entries.items() if k.startswith(prefix)]
+        parts = {}
+        counts = set()
+        for key, file_id in found:
+            position, pages = key[len(prefix):].split(":")
+            index, count = map(int, position.split("/"))
+            start_page, end_page = map(int, pages.split("-"))
+            parts[index] = (key, start_page, end_page, file_id)
+            counts.add(count)
+        if len(counts) != 1 or sorted(parts) != list(range(1, counts.pop() + 1)):
+            metrics.inc("file_id_cache_misses_total")
+            return None
+        metrics.inc("file_id_cache_hits_total")
+        return [parts[i] for i in sorted(parts)]
+
+    def put(self, key: str, file_id: str, file_unique_id: str = None, file_size: int = None) -> None:
+        from database.supabase_client import get_supabase, is_supabase_configured
+
+        with self._lock:
+            self._entries[key] = file_id
+        if not is_supabase_configured():
+            return
+        try:
+            get_supabase().table("telegram_file_cache").upsert({
+                "cache_key": key,
+                "file_id": file_id,
+                "file_unique_id": file_unique_id,
+                "file_size": file_size,
+            }, on_conflict="cache_key").execute()
+        except Exception as e:
+            print(f"Error saving file_id for {key}: {e}")
+
+    def invalidate_book_parts(self, book_id: int, lang: str) -> None:
+        """Drop the part ids of every earlier split of a book before it is split again."""
+        from database.supabase_client import get_supabase, is_supabase_configured
+
+        prefix = f"{book_key(book_id, lang)}:part:"
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+        metrics.inc("file_id_cache_invalidations_total")
+        if not is_supabase_configured():
+            return
+        try:
+            get_supabase().table("telegram_file_cache").delete().like("cache_key", f"{prefix}%").execute()
+        except Exception as e:
+            print(f"Error removing part file_ids for {prefix}: {e}")
+
+    def invalidate(self, key: str) -> None:
+        from database.supabase_client import get_supabase, is_supabase_configured
+
+        with self._lock:
+            self._entries.pop(key, None)
+        metrics.inc("file_id_cache_invalidations_total")
+        if not is_supabase_configured():
+            return
+        try:
+            get_supabase().table("telegram_file_cache").delete().eq("cache_key", key).execute()
+        except Exception as e:
+            print(f"Error removing file_id for {key}: {e}")
+
+
+# Singleton instance
+file_id_cache = FileIdCache()
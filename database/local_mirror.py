@@ -0,0 +1,395 @@
+"""
+Local Catalog Mirror
+SQLite read replica of the Supabase catalog (books, themes, resources).
+
+Rows are synced incrementally by (updated_at, id) using the updated_at
+columns and triggers in Supabase. Once the first sync has completed all
+catalog reads are served locally; writes (analytics, settings) still go
+to Supabase.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Dict, Any, Set
+import sys
+sys.path.append('..')
+from config import MIRROR_DB_PATH, ENABLE_LOCAL_MIRROR
+from services import metrics
+from database.resilience import supabase_breaker, CircuitOpenError
+
+MIRROR_TABLES = ("books", "themes", "resources")
+
+# Seconds between incremental syncs, and between full id reconciliations
+# (which pick up rows hard-deleted in Supabase)
+MIRROR_SYNC_INTERVAL = int(os.getenv("MIRROR_SYNC_INTERVAL", "60"))
+MIRROR_RECONCILE_INTERVAL = int(os.getenv("MIRROR_RECONCILE_INTERVAL", "3600"))
+SYNC_PAGE_SIZE = 500
+
+# Columns copied out of the JSON row so they can be indexed and filtered
+_INDEXED_COLUMNS = {
+    "books": ("grade", "subject", "is_active"),
+    "themes": ("book_id", "order_index", "is_active"),
+    "resources": ("theme_id", "is_active"),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    grade INTEGER,
+    subject TEXT,
+    is_active INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_books_grade ON books(grade, subject);
+
+CREATE TABLE IF NOT EXISTS themes (
+    id INTEGER PRIMARY KEY,
+    book_id INTEGER,
+    order_index INTEGER,
+    is_active INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_themes_book ON themes(book_id, order_index);
+
+CREATE TABLE IF NOT EXISTS resources (
+    id INTEGER PRIMARY KEY,
+    theme_id INTEGER,
+    is_active INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_resources_theme ON resources(theme_id);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    table_name TEXT PRIMARY KEY,
+    watermark TEXT,
+    watermark_id INTEGER,
+    last_sync_at REAL,
+    last_reconcile_at REAL
+);
+"""
+
+
+def _lower(value: Optional[str]) -> str:
+    """Unicode-aware lower() for SQLite (the builtin only folds ASCII)."""
+    return value.lower() if value else ""
+
+
+class CatalogMirror:
+    """Local SQLite copy of the catalog tables with incremental sync."""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or MIRROR_DB_PATH
+        self._lock = threading.Lock()
+        self._ready = False
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.create_function("pylower", 1, _lower, deterministic=True)
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+
+    # ───────────────────────────────────────────────────────────────────
+    # SYNC
+    # ───────────────────────────────────────────────────────────────────
+
+    def _get_state(self, table: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT * FROM sync_state WHERE table_name = ?", (table,)
+            ).fetchone()
+        return dict(row) if row else {}
+
+    def _upsert_rows(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        columns = _INDEXED_COLUMNS[table]
+        sql = (
+            f"INSERT OR REPLACE INTO {table} (id, {', '.join(columns)}, data) "
+            f"VALUES (?, {', '.join('?' for _ in columns)}, ?)"
+        )
+        self.conn.executemany(sql, [
+            (row["id"], *(row.get(column) for column in columns), json.dumps(row, ensure_ascii=False))
+            for row in rows
+        ])
+
+    def sync_table(self, client, table: str) -> int:
+        """Pull rows changed since the stored watermark. Returns rows synced."""
+        with self._lock:
+            self.conn.execute("INSERT OR IGNORE INTO sync_state (table_name) VALUES (?)", (table,))
+            self.conn.commit()
+        state = self._get_state(table)
+        watermark = state.get("watermark")
+        watermark_id = state.get("watermark_id") or 0
+        synced = 0
+
+        while True:
+            # NULL updated_at sorts last and cannot be a keyset position;
+            # those rows are pulled by _sync_unstamped instead
+            query = client.table(table).select("*").not_.is_("updated_at", "null")
+            if watermark:
+                # Keyset pagination on (updated_at, id): bulk updates share
+                # one NOW() timestamp, so updated_at alone is not unique.
+                query = query.or_(
+                    f'updated_at.gt."{watermark}",'
+                    f'and(updated_at.eq."{watermark}",id.gt.{watermark_id})'
+                )
+            response = query.order("updated_at").order("id").limit(SYNC_PAGE_SIZE).execute()
+            rows = response.data or []
+            if not rows:
+                break
+
+            last_stamp = rows[-1].get("updated_at")
+            if not last_stamp:
+                # Never replace a real watermark with NULL (or loop on page one)
+                raise ValueError(f"{table} row {rows[-1]['id']} has no updated_at despite the filter")
+            with self._lock:
+                self._upsert_rows(table, rows)
+                watermark = last_stamp
+                watermark_id = rows[-1]["id"]
+                self.conn.execute(
+                    "INSERT INTO sync_state (table_name, watermark, watermark_id) VALUES (?, ?, ?) "
+                    "ON CONFLICT(table_name) DO UPDATE SET watermark = excluded.watermark, "
+                    "watermark_id = excluded.watermark_id",
+                    (table, watermark, watermark_id)
+                )
+                self.conn.commit()
+            synced += len(rows)
+
+            if len(rows) < SYNC_PAGE_SIZE:
+                break
+
+        return synced + self._sync_unstamped(client, table)
+
+    def _sync_unstamped(self, client, table: str) -> int:
+        """Pull rows whose updated_at is NULL (the migration backfills them; this catches stragglers)."""
+        synced = 0
+        last_id = 0
+        while True:
+            response = client.table(table).select("*").is_("updated_at", "null") \
+                .gt("id", last_id).order("id").limit(SYNC_PAGE_SIZE).execute()
+            rows = response.data or []
+            if rows:
+                with self._lock:
+                    self._upsert_rows(table, rows)
+                    self.conn.commit()
+                synced += len(rows)
+                last_id = rows[-1]["id"]
+            if len(rows) < SYNC_PAGE_SIZE:
+                return synced
+
+    def reconcile_table(self, client, table: str) -> int:
+        """Delete local rows that no longer exist in Supabase. Returns rows removed."""
+        remote_ids: Set[int] = set()
+        offset = 0
+        while True:
+            response = client.table(table).select("id").order("id").range(
+                offset, offset + SYNC_PAGE_SIZE - 1
+            ).execute()
+            rows = response.data or []
+            remote_ids.update(row["id"] for row in rows)
+            if len(rows) < SYNC_PAGE_SIZE:
+                break
+            offset += SYNC_PAGE_SIZE
+
+        with self._lock:
+            local_ids = {row[0] for row in self.conn.execute(f"SELECT id FROM {table}")}
+            stale = local_ids - remote_ids
+            if stale:
+                self.conn.executemany(f"DELETE FROM {table} WHERE id = ?", [(i,) for i in stale])
+            self.conn.execute(
+                "UPDATE sync_state SET last_reconcile_at = ? WHERE table_name = ?",
+                (time.time(), table)
+            )
+            self.conn.commit()
+        return len(stale)
+
+    def sync(self) -> bool:
+        """Run one incremental sync of all mirrored tables."""
+        from database.supabase_client import get_supabase
+
+        try:
+            supabase_breaker.call(self._sync_all, get_supabase())
+            return True
+        except CircuitOpenError:
+            return False
+        except Exception as e:
+            metrics.inc("catalog_sync_errors_total")
+            print(f"Catalog mirror sync error: {e}")
+            return False
+
+    def _sync_all(self, client) -> None:
+        """Sync every mirrored table, reconciling ids when due."""
+        for table in MIRROR_TABLES:
+            synced = self.sync_table(client, table)
+            metrics.inc("catalog_sync_rows_total", synced)
+
+            state = self._get_state(table)
+            if time.time() - (state.get("last_reconcile_at") or 0) > MIRROR_RECONCILE_INTERVAL:
+                removed = self.reconcile_table(client, table)
+                metrics.inc("catalog_sync_deleted_total", removed)
+
+            with self._lock:
+                self.conn.execute(
+                    "UPDATE sync_state SET last_sync_at = ? WHERE table_name = ?",
+                    (time.time(), table)
+                )
+                self.conn.commit()
+
+    def is_ready(self) -> bool:
+        """True once every mirrored table has completed at least one sync."""
+        if not self._ready:
+            with self._lock:
+                count = self.conn.execute(
+                    "SELECT COUNT(*) FROM sync_state WHERE last_sync_at IS NOT NULL"
+                ).fetchone()[0]
+            self._ready = count == len(MIRROR_TABLES)
+        return self._ready
+
+    def sync_lag_seconds(self) -> float:
+        """Seconds since the least recently synced table was synced."""
+        with self._lock:
+            oldest = self.conn.execute("SELECT MIN(last_sync_at) FROM sync_state").fetchone()[0]
+        return time.time() - oldest if oldest else -1.0
+
+    # ───────────────────────────────────────────────────────────────────
+    # READS
+    # ───────────────────────────────────────────────────────────────────
+
+    def _select(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def _select_one(self, sql: str, params: tuple = ()) -> Optional[Dict[str, Any]]:
+        rows = self._select(sql, params)
+        return rows[0] if rows else None
+
+    def get_all_books(self, active_only: bool = True) -> List[Dict[str, Any]]:
+        where = "WHERE is_active = 1" if active_only else ""
+        return self._select(f"SELECT data FROM books {where} ORDER BY grade, subject")
+
+    def get_books_by_grades(self, grades: List[int], active_only: bool = True, language: Optional[str] = None) -> List[Dict[str, Any]]:
+        placeholders = ", ".join("?" for _ in grades)
+        sql = f"SELECT data FROM books WHERE grade IN ({placeholders})"
+        if active_only:
+            sql += " AND is_active = 1"
+        if language in ('uz', 'ru'):
+            sql += f" AND json_extract(data, '$.title_{language}') IS NOT NULL"
+        return self._select(sql + " ORDER BY grade, subject", tuple(grades))
+
+    def get_book(self, book_id: int) -> Optional[Dict[str, Any]]:
+        return self._select_one("SELECT data FROM books WHERE id = ?", (book_id,))
+
+    def get_themes_by_book(self, book_id: int, active_only: bool = True) -> List[Dict[str, Any]]:
+        sql = "SELECT data FROM themes WHERE book_id = ?"
+        if active_only:
+            sql += " AND is_active = 1"
+        return self._select(sql + " ORDER BY order_index", (book_id,))
+
+    def get_theme(self, theme_id: int) -> Optional[Dict[str, Any]]:
+        return self._select_one("SELECT data FROM themes WHERE id = ?", (theme_id,))
+
+    def get_theme_with_book(self, theme_id: int) -> Optional[Dict[str, Any]]:
+        theme = self.get_theme(theme_id)
+        if theme:
+            theme["books"] = self.get_book(theme.get("book_id"))
+        return theme
+
+    def count_themes_by_book(self, book_id: int) -> int:
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM themes WHERE book_id = ? AND is_active = 1", (book_id,)
+            ).fetchone()[0]
+
+    def get_resources_by_theme(self, theme_id: int) -> List[Dict[str, Any]]:
+        return self._select(
+            "SELECT data FROM resources WHERE theme_id = ? AND is_active = 1", (theme_id,)
+        )
+
+    def search_theme_names(
+        self,
+        query: str,
+        limit: int = 10,
+        offset: int = 0,
+        grade: Optional[int] = None,
+        subject: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Search active themes by name; rows match the shape of the remote search."""
+        pattern = f"%{_lower(query.strip())}%"
+        sql = """
+            SELECT t.data AS theme, b.data AS book
+            FROM themes t JOIN books b ON b.id = t.book_id
+            WHERE t.is_active = 1
+              AND (pylower(json_extract(t.data, '$.name_uz')) LIKE ?
+                   OR pylower(json_extract(t.data, '$.name_ru')) LIKE ?)
+        """
+        params: list = [pattern, pattern]
+        if grade:
+            sql += " AND b.grade = ?"
+            params.append(grade)
+        if subject:
+            sql += " AND pylower(b.subject) LIKE ?"
+            params.append(f"%{_lower(subject)}%")
+        sql += " ORDER BY t.id LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+
+        with self._lock:
+            rows = self.conn.execute(sql, tuple(params)).fetchall()
+
+        results = []
+        for row in rows:
+            theme = json.loads(row["theme"])
+            book = json.loads(row["book"])
+            results.append({
+                "theme_id": theme["id"],
+                "book_id": theme["book_id"],
+                "name_uz": theme.get("name_uz") or "",
+                "name_ru": theme.get("name_ru") or "",
+                "subject": book.get("subject"),
+                "grade": book.get("grade"),
+                "book_title_uz": book.get("title_uz"),
+                "book_title_ru": book.get("title_ru"),
+                "start_page": theme.get("start_page"),
+                "end_page": theme.get("end_page"),
+                "relevance_score": 1000,
+                "snippet": ""
+            })
+        return results
+
+
+# Singleton instance (created when the sync loop starts)
+_mirror: Optional[CatalogMirror] = None
+
+
+def get_mirror() -> CatalogMirror:
+    """Get the global catalog mirror instance."""
+    global _mirror
+    if _mirror is None:
+        _mirror = CatalogMirror()
+        metrics.register_gauge("catalog_sync_lag_seconds", _mirror.sync_lag_seconds)
+    return _mirror
+
+
+def get_ready_mirror() -> Optional[CatalogMirror]:
+    """Get the mirror if it is enabled and has completed a sync, else None."""
+    if not ENABLE_LOCAL_MIRROR or _mirror is None:
+        return None
+    return _mirror if _mirror.is_ready() else None
+
+
+async def run_sync_loop(interval: int = MIRROR_SYNC_INTERVAL) -> None:
+    """Background task: keep the mirror in sync with Supabase."""
+    mirror = get_mirror()
+    while True:
+        await asyncio.to_thread(mirror.sync)
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    mirror = get_mirror()
+    if mirror.sync():
+        print(f"✅ Catalog mirror synced to {mirror.db_path}")
+    else:
+        print("❌ Catalog mirror sync failed")
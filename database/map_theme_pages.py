@@ -0,0 +1,119 @@
+"""
+Map Theme Pages Across Editions
+Theme page ranges are recorded for one edition of a book (Uzbek where the
+book has one); the Russian edition is often paginated differently. This
+script opens both editions of every bilingual book and stores each theme's
+Russian page range in themes.start_page_ru / end_page_ru:
+
+  toc    both editions have outlines of the same length: the theme's
+         outline entry in the Uzbek edition gives the Russian entry at the
+         same position
+  ratio  otherwise the page is scaled by the editions' page counts
+
+A theme's end is mapped through the page that follows it, which usually
+starts the next section.
+
+Usage:  python database/map_theme_pages.py [--book ID] [--dry-run]
+"""
+import argparse
+import tempfile
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import sys
+sys.path.append('..')
+
+import fitz  # PyMuPDF
+
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+
+def _local_copy(source: str, tmp_dir: str, name: str) -> Path:
+    if not source.startswith('http'):
+        return Path(source)
+    target = Path(tmp_dir) / name
+    with urllib.request.urlopen(source, timeout=300) as resp, open(target, 'wb') as f:
+        while True:
+            chunk = resp.read(DOWNLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            f.write(chunk)
+    return target
+
+
+def _outline_pages(doc: "fitz.Document") -> List[int]:
+    """0-indexed target page of every outline entry, in outline order."""
+    return [entry[2] - 1 for entry in doc.get_toc(simple=True)]
+
+
+def map_book(uz_doc: "fitz.Document", ru_doc: "fitz.Document",
+             themes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Russian page range and mapping method for each theme."""
+    uz_outline, ru_outline = _outline_pages(uz_doc), _outline_pages(ru_doc)
+    use_toc = bool(uz_outline) and len(uz_outline) == len(ru_outline)
+    scale = (len(ru_doc) - 1) / max(len(uz_doc) - 1, 1)
+    last_page = len(ru_doc) - 1
+
+    def map_page(page: int) -> Tuple[int, str]:
+        if use_toc and page in uz_outline:
+            mapped = ru_outline[uz_outline.index(page)]
+            if 0 <= mapped <= last_page:
+                return mapped, 'toc'
+        return min(max(round(page * scale), 0), last_page), 'ratio'
+
+    mapping = []
+    for theme in themes:
+        start, method = map_page(theme.get('start_page') or 0)
+        # The page after the theme usually starts the next section: map that boundary
+        after = (theme.get('end_page') or 0) + 1
+        end = map_page(after)[0] - 1 if after < len(uz_doc) else last_page
+        mapping.append({"id": theme['id'], "start_page_ru": start, "end_page_ru": max(end, start), "page_map_method": method})
+    return mapping
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Map theme page ranges to the Russian edition of each book")
+    parser.add_argument("--book", type=int, help="only this book id")
+    parser.add_argument("--dry-run", action="store_true", help="print the mapping without saving it")
+    args = parser.parse_args()
+
+    from database.supabase_client import get_supabase, get_all_books, get_themes_by_book
+
+    client = get_supabase()
+    books = [
+        b for b in get_all_books()
+        if b.get('pdf_path_uz') and b.get('pdf_path_ru') and (args.book is None or b['id'] == args.book)
+    ]
+    print(f"📚 {len(books)} books with both editions")
+
+    for book in books:
+        themes = get_themes_by_book(book['id'])
+        if not themes:
+            continue
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                uz_path = _local_copy(book['pdf_path_uz'], tmp_dir, "uz.pdf")
+                ru_path = _local_copy(book['pdf_path_ru'], tmp_dir, "ru.pdf")
+                with fitz.open(uz_path) as uz_doc, fitz.open(ru_path) as ru_doc:
+                    mapping = map_book(uz_doc, ru_doc, themes)
+        except Exception as e:
+            print(f"❌ Book {book['id']}: {e}")
+            continue
+
+        by_toc = sum(1 for row in mapping if row['page_map_method'] == 'toc')
+        print(f"✅ Book {book['id']}: {len(mapping)} themes ({by_toc} by outline, {len(mapping) - by_toc} by page ratio)")
+        if args.dry_run:
+            for theme, row in zip(themes, mapping):
+                print(f"   {theme['id']}: {theme.get('start_page')}-{theme.get('end_page')} -> "
+                      f"{row['start_page_ru']}-{row['end_page_ru']} ({row['page_map_method']})")
+            continue
+        for row in mapping:
+            client.table("themes").update({
+                "start_page_ru": row["start_page_ru"],
+                "end_page_ru": row["end_page_ru"],
+                "page_map_method": row["page_map_method"],
+            }).eq("id", row["id"]).execute()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+-- Migration: Client-generated event ids for analytics tables
+-- The bot assigns every analytics event a UUID before it is queued or
+-- spooled locally, so replaying a batch after a failure is idempotent
+-- (INSERT ... ON CONFLICT (event_id, created_at) DO NOTHING).
+--
+-- The unique key includes created_at (set by the bot along with the id)
+-- so the writer's conflict target stays the same once
+-- partition_analytics_tables.sql partitions the tables on created_at,
+-- where every unique key must include the partition key.
+
+ALTER TABLE user_analytics ADD COLUMN IF NOT EXISTS event_id UUID;
+ALTER TABLE search_analytics ADD COLUMN IF NOT EXISTS event_id UUID;
+ALTER TABLE downloads ADD COLUMN IF NOT EXISTS event_id UUID;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_user_analytics_event_id ON user_analytics(event_id, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_search_analytics_event_id ON search_analytics(event_id, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_downloads_event_id ON downloads(event_id, created_at);
@@ -0,0 +1,132 @@
+-- Migration: Daily analytics rollups with incremental refresh
+-- Admin reports read these small tables instead of scanning raw events.
+-- refresh_analytics_rollups() only processes rows inserted since the stored
+-- watermark, so each run costs O(new events). Days use Tashkent time.
+--
+-- The watermark is a server-side insert time, not an id: concurrent writers
+-- (the batch writer, spool replay, direct writes) can commit a lower id
+-- after a higher one is already visible, and created_at is set by the
+-- client (replayed events keep theirs). Each run stops five minutes
+-- before now, so every transaction that could still add rows below the new
+-- watermark has finished.
+
+-- Server-side insert time of every event (the rollup watermark)
+ALTER TABLE user_analytics ADD COLUMN IF NOT EXISTS inserted_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+ALTER TABLE search_analytics ADD COLUMN IF NOT EXISTS inserted_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+ALTER TABLE downloads ADD COLUMN IF NOT EXISTS inserted_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+CREATE INDEX IF NOT EXISTS idx_user_analytics_inserted ON user_analytics USING BRIN (inserted_at);
+CREATE INDEX IF NOT EXISTS idx_search_analytics_inserted ON search_analytics USING BRIN (inserted_at);
+CREATE INDEX IF NOT EXISTS idx_downloads_inserted ON downloads USING BRIN (inserted_at);
+
+CREATE TABLE IF NOT EXISTS analytics_daily_actions (
+    day DATE NOT NULL,
+    action_type VARCHAR(50) NOT NULL,   -- user_analytics.action_type, plus 'search' and 'download'
+    language VARCHAR(10) NOT NULL DEFAULT '',
+    event_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, action_type, language)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_daily_themes (
+    day DATE NOT NULL,
+    theme_id INTEGER NOT NULL,
+    views BIGINT NOT NULL DEFAULT 0,
+    downloads BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, theme_id)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_watermarks (
+    source VARCHAR(50) PRIMARY KEY,
+    rolled_up_to TIMESTAMPTZ NOT NULL DEFAULT '-infinity',  -- rows with inserted_at <= this are counted
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+INSERT INTO rollup_watermarks (source) VALUES
+    ('user_analytics'), ('search_analytics'), ('downloads')
+ON CONFLICT DO NOTHING;
+
+ALTER TABLE analytics_daily_actions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE analytics_daily_themes ENABLE ROW LEVEL SECURITY;
+ALTER TABLE rollup_watermarks ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Public can read daily actions" ON analytics_daily_actions
+    FOR SELECT USING (true);
+
+CREATE POLICY "Public can read daily themes" ON analytics_daily_themes
+    FOR SELECT USING (true);
+
+CREATE OR REPLACE FUNCTION refresh_analytics_rollups()
+RETURNS JSON AS $$
+DECLARE
+    -- Inserts are single short statements: anything inserted before this has committed
+    horizon TIMESTAMPTZ := NOW() - INTERVAL '5 minutes';
+    ua_from TIMESTAMPTZ; sa_from TIMESTAMPTZ; dl_from TIMESTAMPTZ;
+    ua_rows BIGINT; sa_rows BIGINT; dl_rows BIGINT;
+BEGIN
+    -- Serialize concurrent refreshes
+    PERFORM pg_advisory_xact_lock(hashtext('refresh_analytics_rollups'));
+
+    SELECT rolled_up_to INTO ua_from FROM rollup_watermarks WHERE source = 'user_analytics';
+    SELECT rolled_up_to INTO sa_from FROM rollup_watermarks WHERE source = 'search_analytics';
+    SELECT rolled_up_to INTO dl_from FROM rollup_watermarks WHERE source = 'downloads';
+
+    SELECT COUNT(*) INTO ua_rows FROM user_analytics WHERE inserted_at > ua_from AND inserted_at <= horizon;
+    SELECT COUNT(*) INTO sa_rows FROM search_analytics WHERE inserted_at > sa_from AND inserted_at <= horizon;
+    SELECT COUNT(*) INTO dl_rows FROM downloads WHERE inserted_at > dl_from AND inserted_at <= horizon;
+
+    -- Actions per day x action_type x language
+    INSERT INTO analytics_daily_actions (day, action_type, language, event_count)
+    SELECT (created_at AT TIME ZONE 'Asia/Tashkent')::date, action_type,
+           COALESCE(action_data->>'language', ''), COUNT(*)
+    FROM user_analytics
+    WHERE inserted_at > ua_from AND inserted_at <= horizon
+    GROUP BY 1, 2, 3
+    ON CONFLICT (day, action_type, language)
+    DO UPDATE SET event_count = analytics_daily_actions.event_count + EXCLUDED.event_count;
+
+    INSERT INTO analytics_daily_actions (day, action_type, language, event_count)
+    SELECT (created_at AT TIME ZONE 'Asia/Tashkent')::date, 'search',
+           COALESCE(language_detected, ''), COUNT(*)
+    FROM search_analytics
+    WHERE inserted_at > sa_from AND inserted_at <= horizon
+    GROUP BY 1, 3
+    ON CONFLICT (day, action_type, language)
+    DO UPDATE SET event_count = analytics_daily_actions.event_count + EXCLUDED.event_count;
+
+    INSERT INTO analytics_daily_actions (day, action_type, language, event_count)
+    SELECT (created_at AT TIME ZONE 'Asia/Tashkent')::date, 'download',
+           COALESCE(language, ''), COUNT(*)
+    FROM downloads
+    WHERE inserted_at > dl_from AND inserted_at <= horizon
+    GROUP BY 1, 3
+    ON CONFLICT (day, action_type, language)
+    DO UPDATE SET event_count = analytics_daily_actions.event_count + EXCLUDED.event_count;
+
+    -- Theme views and downloads per day x theme
+    INSERT INTO analytics_daily_themes (day, theme_id, views)
+    SELECT (created_at AT TIME ZONE 'Asia/Tashkent')::date, (action_data->>'theme_id')::INTEGER, COUNT(*)
+    FROM user_analytics
+    WHERE inserted_at > ua_from AND inserted_at <= horizon
+      AND action_type = 'view_theme' AND action_data ? 'theme_id'
+    GROUP BY 1, 2
+    ON CONFLICT (day, theme_id)
+    DO UPDATE SET views = analytics_daily_themes.views + EXCLUDED.views;
+
+    INSERT INTO analytics_daily_themes (day, theme_id, downloads)
+    SELECT (created_at AT TIME ZONE 'Asia/Tashkent')::date, theme_id, COUNT(*)
+    FROM downloads
+    WHERE inserted_at > dl_from AND inserted_at <= horizon AND theme_id IS NOT NULL
+    GROUP BY 1, 2
+    ON CONFLICT (day, theme_id)
+    DO UPDATE SET downloads = analytics_daily_themes.downloads + EXCLUDED.downloads;
+
+    UPDATE rollup_watermarks SET rolled_up_to = horizon, updated_at = NOW()
+    WHERE source IN ('user_analytics', 'search_analytics', 'downloads');
+
+    RETURN json_build_object(
+        'user_analytics', ua_rows,
+        'search_analytics', sa_rows,
+        'downloads', dl_rows
+    );
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
@@ -0,0 +1,22 @@
+-- Migration: Prepare catalog tables for incremental mirroring
+-- The bot keeps a local SQLite mirror of books, themes and resources and
+-- pulls rows changed since its last (updated_at, id) watermark.
+
+-- resources had no updated_at column; backfill it from created_at
+ALTER TABLE resources ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+UPDATE resources SET updated_at = COALESCE(created_at, NOW()) WHERE updated_at IS NULL;
+
+-- A NULL updated_at has no keyset position; stamp any such rows
+UPDATE books SET updated_at = COALESCE(created_at, NOW()) WHERE updated_at IS NULL;
+UPDATE themes SET updated_at = COALESCE(created_at, NOW()) WHERE updated_at IS NULL;
+
+DROP TRIGGER IF EXISTS update_resources_updated_at ON resources;
+CREATE TRIGGER update_resources_updated_at
+    BEFORE UPDATE ON resources
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- Keyset indexes for the sync queries (ORDER BY updated_at, id)
+CREATE INDEX IF NOT EXISTS idx_books_updated_at ON books(updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_themes_updated_at ON themes(updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_resources_updated_at ON resources(updated_at, id);
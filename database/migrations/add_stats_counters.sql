@@ -0,0 +1,108 @@
+-- Migration: Add incrementally maintained stats counters
+-- Keeps analytics totals up to date on insert so /stats is a single
+-- constant-time RPC instead of COUNT(*) scans over unbounded tables.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS stats_counters (
+    name VARCHAR(50) PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- One row per distinct Telegram user ever seen in user_analytics
+CREATE TABLE IF NOT EXISTS known_users (
+    telegram_user_id BIGINT PRIMARY KEY,
+    first_seen_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Service role / SECURITY DEFINER functions only
+ALTER TABLE stats_counters ENABLE ROW LEVEL SECURITY;
+ALTER TABLE known_users ENABLE ROW LEVEL SECURITY;
+
+-- Statement-level triggers: one counter update per INSERT statement,
+-- so multi-row analytics inserts cost a single UPDATE. They run as the
+-- function owner (SECURITY DEFINER): the bot inserts with the anon key,
+-- which the RLS above keeps out of stats_counters and known_users.
+CREATE OR REPLACE FUNCTION bump_stats_counter()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE stats_counters
+    SET value = value + (SELECT COUNT(*) FROM new_rows),
+        updated_at = NOW()
+    WHERE name = TG_ARGV[0];
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION register_known_users()
+RETURNS TRIGGER AS $$
+DECLARE
+    inserted BIGINT;
+BEGIN
+    WITH ins AS (
+        INSERT INTO known_users (telegram_user_id)
+        SELECT DISTINCT telegram_user_id FROM new_rows
+        ON CONFLICT DO NOTHING
+        RETURNING 1
+    )
+    SELECT COUNT(*) INTO inserted FROM ins;
+
+    IF inserted > 0 THEN
+        UPDATE stats_counters
+        SET value = value + inserted, updated_at = NOW()
+        WHERE name = 'total_users';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS count_search_analytics ON search_analytics;
+CREATE TRIGGER count_search_analytics
+    AFTER INSERT ON search_analytics
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_stats_counter('total_searches');
+
+DROP TRIGGER IF EXISTS count_downloads ON downloads;
+CREATE TRIGGER count_downloads
+    AFTER INSERT ON downloads
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_stats_counter('total_downloads');
+
+DROP TRIGGER IF EXISTS count_known_users ON user_analytics;
+CREATE TRIGGER count_known_users
+    AFTER INSERT ON user_analytics
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION register_known_users();
+
+-- Backfill from existing rows (inside the same transaction as the triggers)
+INSERT INTO known_users (telegram_user_id, first_seen_at)
+SELECT telegram_user_id, MIN(created_at)
+FROM user_analytics
+GROUP BY telegram_user_id
+ON CONFLICT DO NOTHING;
+
+INSERT INTO stats_counters (name, value) VALUES
+    ('total_users', (SELECT COUNT(*) FROM known_users)),
+    ('total_searches', (SELECT COUNT(*) FROM search_analytics)),
+    ('total_downloads', (SELECT COUNT(*) FROM downloads))
+ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value, updated_at = NOW();
+
+-- Single round trip for /stats. Catalog tables are small and indexed on
+-- is_active; analytics totals come from the counters above.
+CREATE OR REPLACE FUNCTION get_stats_overview()
+RETURNS JSON AS $$
+    SELECT json_build_object(
+        'books', (SELECT COUNT(*) FROM books WHERE is_active = true),
+        'themes', (SELECT COUNT(*) FROM themes WHERE is_active = true),
+        'resources', (SELECT COUNT(*) FROM resources WHERE is_active = true),
+        'total_users', COALESCE((SELECT value FROM stats_counters WHERE name = 'total_users'), 0),
+        'total_searches', COALESCE((SELECT value FROM stats_counters WHERE name = 'total_searches'), 0),
+        'total_downloads', COALESCE((SELECT value FROM stats_counters WHERE name = 'total_downloads'), 0)
+    );
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public;
+
+COMMIT;
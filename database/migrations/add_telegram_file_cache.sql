@@ -0,0 +1,26 @@
+-- Migration: Telegram file_id cache
+-- After a PDF is uploaded once, Telegram returns a reusable file_id. The bot
+-- stores it here (loaded into memory at startup) and sends by id on every
+-- later request: one API call, no download or upload.
+-- cache_key: 'book:<book_id>:<lang>' or 'theme:<theme_id>:<lang>:<start>-<end>'
+-- (bundles store a hash of their page ranges: 'bundle:<book_id>:<lang>:<hash>')
+
+CREATE TABLE IF NOT EXISTS telegram_file_cache (
+    cache_key VARCHAR(100) PRIMARY KEY,
+    file_id TEXT NOT NULL,
+    file_unique_id TEXT,
+    file_size BIGINT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+ALTER TABLE telegram_file_cache ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Service access to file cache" ON telegram_file_cache
+    FOR ALL USING (true) WITH CHECK (true);
+
+DROP TRIGGER IF EXISTS update_telegram_file_cache_updated_at ON telegram_file_cache;
+CREATE TRIGGER update_telegram_file_cache_updated_at
+    BEFORE UPDATE ON telegram_file_cache
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
@@ -0,0 +1,10 @@
+-- Migration: Cross-language page mapping for themes
+-- start_page/end_page are page numbers in the edition the themes were
+-- extracted from (Uzbek where the book has one). When the Russian edition
+-- is paginated differently, database/map_theme_pages.py stores the same
+-- theme's pages in that edition here; NULL means the page numbers are the
+-- same in both editions. Used for Russian theme PDFs and bilingual PDFs.
+
+ALTER TABLE themes ADD COLUMN IF NOT EXISTS start_page_ru INTEGER;
+ALTER TABLE themes ADD COLUMN IF NOT EXISTS end_page_ru INTEGER;
+ALTER TABLE themes ADD COLUMN IF NOT EXISTS page_map_method VARCHAR(20);  -- 'toc' or 'ratio'
@@ -0,0 +1,30 @@
+-- Migration: Prebuilt theme PDF manifest
+-- database/pregenerate_theme_pdfs.py extracts every theme's page range
+-- from its book, uploads it to storage and records it here. The bot sends
+-- the prebuilt file when the row still matches the theme's page range.
+-- source_sha256 lets reruns skip themes whose book and pages are unchanged.
+
+CREATE TABLE IF NOT EXISTS theme_pdf_artifacts (
+    theme_id INTEGER NOT NULL REFERENCES themes(id) ON DELETE CASCADE,
+    language VARCHAR(10) NOT NULL,             -- 'uz' or 'ru'
+    start_page INTEGER NOT NULL,
+    end_page INTEGER NOT NULL,
+    source_sha256 VARCHAR(64) NOT NULL,        -- sha256 of the book PDF
+    storage_path TEXT NOT NULL,
+    url TEXT NOT NULL,
+    size_bytes BIGINT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (theme_id, language)
+);
+
+ALTER TABLE theme_pdf_artifacts ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Public can read theme artifacts" ON theme_pdf_artifacts
+    FOR SELECT USING (true);
+
+DROP TRIGGER IF EXISTS update_theme_pdf_artifacts_updated_at ON theme_pdf_artifacts;
+CREATE TRIGGER update_theme_pdf_artifacts_updated_at
+    BEFORE UPDATE ON theme_pdf_artifacts
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
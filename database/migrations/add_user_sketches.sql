@@ -0,0 +1,21 @@
+-- Migration: HyperLogLog sketches of active users
+-- One row per Tashkent day ('YYYY-MM-DD') or month ('YYYY-MM'). registers is
+-- base64 of one precision byte followed by 2^p one-byte registers (~5.5KB at
+-- p=12). The bot merges its in-process sketches into these rows (register-wise
+-- max), so re-sending a sketch never double counts. DAU/WAU/MAU are computed
+-- by merging the daily rows; raw analytics tables are never scanned.
+
+CREATE TABLE IF NOT EXISTS user_sketches (
+    period VARCHAR(10) PRIMARY KEY,
+    registers TEXT NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+ALTER TABLE user_sketches ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Public can read user sketches" ON user_sketches
+    FOR SELECT USING (true);
+
+-- The bot upserts merged sketches with the anon key
+CREATE POLICY "Bot can write user sketches" ON user_sketches
+    FOR ALL USING (true) WITH CHECK (true);
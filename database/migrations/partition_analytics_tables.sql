@@ -0,0 +1,375 @@
+-- Migration: Monthly range partitions for analytics tables
+-- user_analytics, search_analytics and downloads become partitioned by
+-- created_at (one partition per UTC month, plus a default partition as a
+-- safety net whose rows ensure_analytics_partitions moves into monthly
+-- partitions). Inserts only touch the current month's small indexes, time
+-- bounded queries prune to the partitions they need, and retention is a
+-- cheap DROP of a whole partition after database/archive_analytics.py has
+-- archived it to a compressed file.
+--
+-- Requires add_stats_counters.sql, add_analytics_event_ids.sql and
+-- add_analytics_rollups.sql. Ids keep their existing sequences and rows
+-- keep their inserted_at, so the rollup watermarks stay valid. The unique
+-- key on event_id must include the partition key: the bot upserts with
+-- on_conflict "event_id,created_at" (created_at is assigned client-side,
+-- so retries carry the same value).
+
+BEGIN;
+
+-- ───────────────────────────────────────────────────────────────────────────
+-- Partition management
+-- ───────────────────────────────────────────────────────────────────────────
+
+CREATE OR REPLACE FUNCTION analytics_partition_name(p_table TEXT, p_month DATE)
+RETURNS TEXT AS $$
+    SELECT p_table || '_y' || to_char(p_month, 'YYYY') || 'm' || to_char(p_month, 'MM');
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Rows that landed in the default partition for the month are moved into
+-- the new partition (Postgres refuses to create a partition whose range
+-- the default partition already holds rows for)
+CREATE OR REPLACE FUNCTION create_analytics_partition(p_table TEXT, p_month DATE)
+RETURNS TEXT AS $$
+DECLARE
+    month_start DATE := date_trunc('month', p_month)::DATE;
+    part TEXT := analytics_partition_name(p_table, month_start);
+    default_part TEXT := p_table || '_default';
+    lower_bound TIMESTAMPTZ := month_start::TIMESTAMP AT TIME ZONE 'UTC';
+    upper_bound TIMESTAMPTZ := (month_start + INTERVAL '1 month')::TIMESTAMP AT TIME ZONE 'UTC';
+    has_default_rows BOOLEAN := FALSE;
+BEGIN
+    IF p_table NOT IN ('user_analytics', 'search_analytics', 'downloads') THEN
+        RAISE EXCEPTION 'Not an analytics table: %', p_table;
+    END IF;
+    IF to_regclass(part) IS NOT NULL THEN
+        RETURN part;
+    END IF;
+
+    IF to_regclass(default_part) IS NOT NULL THEN
+        EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE created_at >= %L AND created_at < %L)',
+                       default_part, lower_bound, upper_bound)
+            INTO has_default_rows;
+    END IF;
+
+    IF NOT has_default_rows THEN
+        EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                       part, p_table, lower_bound, upper_bound);
+        RETURN part;
+    END IF;
+
+    -- Inserting into the partition directly skips the parent's counter
+    -- triggers: these rows were counted when they first arrived
+    EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', p_table, default_part);
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                   part, p_table, lower_bound, upper_bound);
+    EXECUTE format('INSERT INTO %I SELECT * FROM %I WHERE created_at >= %L AND created_at < %L',
+                   part, default_part, lower_bound, upper_bound);
+    EXECUTE format('DELETE FROM %I WHERE created_at >= %L AND created_at < %L',
+                   default_part, lower_bound, upper_bound);
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I DEFAULT', p_table, default_part);
+    RETURN part;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- First month still kept online; older months are archived and dropped
+CREATE OR REPLACE FUNCTION analytics_retention_cutoff(p_keep_months INTEGER)
+RETURNS DATE AS $$
+    SELECT (date_trunc('month', NOW() AT TIME ZONE 'UTC') - make_interval(months => p_keep_months))::DATE;
+$$ LANGUAGE sql STABLE;
+
+-- Create partitions for the current month and the next p_months_ahead
+-- months, and for every month within retention that has rows in a default
+-- partition (so those rows get their own partition). Late rows for months
+-- past retention stay in the default partition: retention archives them
+-- from there instead of recreating a partition that was already archived.
+CREATE OR REPLACE FUNCTION ensure_analytics_partitions(p_months_ahead INTEGER DEFAULT 2, p_keep_months INTEGER DEFAULT 6)
+RETURNS VOID AS $$
+DECLARE
+    cutoff DATE := analytics_retention_cutoff(p_keep_months);
+    t TEXT;
+    i INTEGER;
+    m DATE;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['user_analytics', 'search_analytics', 'downloads'] LOOP
+        FOR i IN 0..p_months_ahead LOOP
+            PERFORM create_analytics_partition(t, (date_trunc('month', NOW() AT TIME ZONE 'UTC') + make_interval(months => i))::DATE);
+        END LOOP;
+        IF to_regclass(t || '_default') IS NOT NULL THEN
+            FOR m IN EXECUTE format(
+                'SELECT DISTINCT date_trunc(''month'', created_at AT TIME ZONE ''UTC'')::DATE FROM %I WHERE created_at >= %L',
+                t || '_default', cutoff::TIMESTAMP AT TIME ZONE 'UTC'
+            ) LOOP
+                PERFORM create_analytics_partition(t, m);
+            END LOOP;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Months past retention: monthly partitions, and months whose rows sit in
+-- a default partition (partition_name is then the default partition)
+CREATE OR REPLACE FUNCTION list_expired_analytics_partitions(p_keep_months INTEGER)
+RETURNS TABLE (table_name TEXT, partition_name TEXT, month_start DATE) AS $$
+DECLARE
+    cutoff DATE := analytics_retention_cutoff(p_keep_months);
+    t TEXT;
+BEGIN
+    RETURN QUERY
+    SELECT parent.relname::TEXT, child.relname::TEXT,
+           to_date(right(child.relname, 8), '"y"YYYY"m"MM')
+    FROM pg_inherits
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE parent.relname IN ('user_analytics', 'search_analytics', 'downloads')
+      AND child.relname ~ 'y\d{4}m\d{2}$'
+      AND to_date(right(child.relname, 8), '"y"YYYY"m"MM') < cutoff;
+
+    FOREACH t IN ARRAY ARRAY['user_analytics', 'search_analytics', 'downloads'] LOOP
+        IF to_regclass(t || '_default') IS NOT NULL THEN
+            RETURN QUERY EXECUTE format(
+                'SELECT %L::TEXT, %L::TEXT, date_trunc(''month'', created_at AT TIME ZONE ''UTC'')::DATE
+                 FROM %I WHERE created_at < %L GROUP BY 3',
+                t, t || '_default', t || '_default', cutoff::TIMESTAMP AT TIME ZONE 'UTC'
+            );
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql STABLE SECURITY DEFINER SET search_path = public;
+
+-- Drop an archived month: the whole monthly partition, or that month's
+-- rows in the default partition when the partition is already gone.
+-- Refuses unless the archive row count matches and the daily rollups have
+-- already consumed every row. Inserts into the month are blocked while it
+-- is checked, so no row arrives between the count and the drop.
+CREATE OR REPLACE FUNCTION drop_analytics_partition(p_table TEXT, p_month DATE, p_archived_rows BIGINT)
+RETURNS BIGINT AS $$
+DECLARE
+    month_start DATE := date_trunc('month', p_month)::DATE;
+    part TEXT := analytics_partition_name(p_table, month_start);
+    from_default BOOLEAN;
+    month_filter TEXT := '';
+    row_count BIGINT;
+    last_inserted TIMESTAMPTZ;
+    watermark TIMESTAMPTZ;
+BEGIN
+    IF p_table NOT IN ('user_analytics', 'search_analytics', 'downloads') THEN
+        RAISE EXCEPTION 'Not an analytics table: %', p_table;
+    END IF;
+    IF month_start >= date_trunc('month', NOW() AT TIME ZONE 'UTC')::DATE THEN
+        RAISE EXCEPTION 'Refusing to drop the current or a future partition: %', part;
+    END IF;
+
+    from_default := to_regclass(part) IS NULL;
+    IF from_default THEN
+        part := p_table || '_default';
+        month_filter := format(' WHERE created_at >= %L AND created_at < %L',
+                               month_start::TIMESTAMP AT TIME ZONE 'UTC',
+                               (month_start + INTERVAL '1 month')::TIMESTAMP AT TIME ZONE 'UTC');
+    END IF;
+
+    EXECUTE format('LOCK TABLE %I IN SHARE ROW EXCLUSIVE MODE', part);
+    EXECUTE format('SELECT COUNT(*), MAX(inserted_at) FROM %I', part) || month_filter INTO row_count, last_inserted;
+    IF row_count <> p_archived_rows THEN
+        RAISE EXCEPTION 'Partition % has % rows but % were archived', part, row_count, p_archived_rows;
+    END IF;
+
+    SELECT rolled_up_to INTO watermark FROM rollup_watermarks WHERE source = p_table;
+    IF last_inserted IS NOT NULL AND last_inserted > COALESCE(watermark, '-infinity') THEN
+        RAISE EXCEPTION 'Partition % has rows not yet rolled up', part;
+    END IF;
+
+    IF from_default THEN
+        EXECUTE format('DELETE FROM %I', part) || month_filter;
+    ELSE
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', p_table, part);
+        EXECUTE format('DROP TABLE %I', part);
+    END IF;
+    RETURN row_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Top search queries over the last p_days days (prunes to those partitions)
+CREATE OR REPLACE FUNCTION get_popular_searches(p_days INTEGER DEFAULT 7, p_limit INTEGER DEFAULT 10)
+RETURNS TABLE (query TEXT, search_count BIGINT) AS $$
+    SELECT lower(query), COUNT(*)
+    FROM search_analytics
+    WHERE created_at >= NOW() - make_interval(days => p_days)
+    GROUP BY 1
+    ORDER BY 2 DESC
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+-- ───────────────────────────────────────────────────────────────────────────
+-- Rebuild the tables as partitioned tables
+-- ───────────────────────────────────────────────────────────────────────────
+
+-- Views depend on the old tables; recreated below
+DROP VIEW IF EXISTS stats_overview;
+DROP VIEW IF EXISTS popular_searches;
+
+ALTER TABLE user_analytics RENAME TO user_analytics_legacy;
+ALTER TABLE search_analytics RENAME TO search_analytics_legacy;
+ALTER TABLE downloads RENAME TO downloads_legacy;
+
+-- Keep the id sequences (and therefore the rollup watermarks)
+ALTER SEQUENCE user_analytics_id_seq OWNED BY NONE;
+ALTER SEQUENCE search_analytics_id_seq OWNED BY NONE;
+ALTER SEQUENCE downloads_id_seq OWNED BY NONE;
+
+CREATE TABLE user_analytics (
+    id BIGINT NOT NULL DEFAULT nextval('user_analytics_id_seq'),
+    event_id UUID,
+    telegram_user_id BIGINT NOT NULL,
+    telegram_username VARCHAR(255),
+    first_name VARCHAR(255),
+    action_type VARCHAR(50) NOT NULL,
+    action_data JSONB,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    inserted_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    CONSTRAINT user_analytics_part_pkey PRIMARY KEY (id, created_at),
+    CONSTRAINT user_analytics_part_event_key UNIQUE (event_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE search_analytics (
+    id BIGINT NOT NULL DEFAULT nextval('search_analytics_id_seq'),
+    event_id UUID,
+    telegram_user_id BIGINT,
+    query TEXT NOT NULL,
+    language_detected VARCHAR(10),
+    results_count INTEGER DEFAULT 0,
+    clicked_theme_id INTEGER REFERENCES themes(id),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    inserted_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    CONSTRAINT search_analytics_part_pkey PRIMARY KEY (id, created_at),
+    CONSTRAINT search_analytics_part_event_key UNIQUE (event_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE downloads (
+    id BIGINT NOT NULL DEFAULT nextval('downloads_id_seq'),
+    event_id UUID,
+    telegram_user_id BIGINT,
+    book_id INTEGER REFERENCES books(id),
+    theme_id INTEGER REFERENCES themes(id),
+    download_type VARCHAR(20) NOT NULL,
+    language VARCHAR(10),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    inserted_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    CONSTRAINT downloads_part_pkey PRIMARY KEY (id, created_at),
+    CONSTRAINT downloads_part_event_key UNIQUE (event_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE user_analytics_id_seq OWNED BY user_analytics.id;
+ALTER SEQUENCE search_analytics_id_seq OWNED BY search_analytics.id;
+ALTER SEQUENCE downloads_id_seq OWNED BY downloads.id;
+
+-- BRIN indexes on the time columns; the per-column B-trees of the old
+-- tables are recreated on the parents (one per partition) for per-user
+-- lookups and action/book/query filters
+CREATE INDEX idx_user_analytics_part_created ON user_analytics USING BRIN (created_at);
+CREATE INDEX idx_search_analytics_part_created ON search_analytics USING BRIN (created_at);
+CREATE INDEX idx_downloads_part_created ON downloads USING BRIN (created_at);
+CREATE INDEX idx_user_analytics_part_inserted ON user_analytics USING BRIN (inserted_at);
+CREATE INDEX idx_search_analytics_part_inserted ON search_analytics USING BRIN (inserted_at);
+CREATE INDEX idx_downloads_part_inserted ON downloads USING BRIN (inserted_at);
+CREATE INDEX idx_user_analytics_part_user_id ON user_analytics (telegram_user_id);
+CREATE INDEX idx_user_analytics_part_action ON user_analytics (action_type);
+CREATE INDEX idx_search_analytics_part_query ON search_analytics (query);
+CREATE INDEX idx_downloads_part_book_id ON downloads (book_id);
+CREATE INDEX idx_downloads_part_user ON downloads (telegram_user_id);
+
+CREATE TABLE user_analytics_default PARTITION OF user_analytics DEFAULT;
+CREATE TABLE search_analytics_default PARTITION OF search_analytics DEFAULT;
+CREATE TABLE downloads_default PARTITION OF downloads DEFAULT;
+
+-- Partitions for every month with legacy data, then the months ahead
+DO $$
+DECLARE
+    t TEXT;
+    first_month DATE;
+    m DATE;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['user_analytics', 'search_analytics', 'downloads'] LOOP
+        EXECUTE format('SELECT date_trunc(''month'', MIN(created_at) AT TIME ZONE ''UTC'')::DATE FROM %I', t || '_legacy')
+            INTO first_month;
+        m := first_month;
+        WHILE m IS NOT NULL AND m < date_trunc('month', NOW() AT TIME ZONE 'UTC')::DATE LOOP
+            PERFORM create_analytics_partition(t, m);
+            m := (m + INTERVAL '1 month')::DATE;
+        END LOOP;
+    END LOOP;
+END $$;
+SELECT ensure_analytics_partitions(2);
+
+-- Copy rows. The counter triggers are created afterwards, so the totals
+-- in stats_counters are not counted twice.
+INSERT INTO user_analytics (id, event_id, telegram_user_id, telegram_username, first_name, action_type, action_data, created_at, inserted_at)
+SELECT id, event_id, telegram_user_id, telegram_username, first_name, action_type, action_data, COALESCE(created_at, NOW()), inserted_at
+FROM user_analytics_legacy;
+
+INSERT INTO search_analytics (id, event_id, telegram_user_id, query, language_detected, results_count, clicked_theme_id, created_at, inserted_at)
+SELECT id, event_id, telegram_user_id, query, language_detected, results_count, clicked_theme_id, COALESCE(created_at, NOW()), inserted_at
+FROM search_analytics_legacy;
+
+INSERT INTO downloads (id, event_id, telegram_user_id, book_id, theme_id, download_type, language, created_at, inserted_at)
+SELECT id, event_id, telegram_user_id, book_id, theme_id, download_type, language, COALESCE(created_at, NOW()), inserted_at
+FROM downloads_legacy;
+
+DROP TABLE user_analytics_legacy;
+DROP TABLE search_analytics_legacy;
+DROP TABLE downloads_legacy;
+
+-- Statement-level counter triggers (transition tables are supported on the
+-- partitioned parent)
+CREATE TRIGGER count_search_analytics
+    AFTER INSERT ON search_analytics
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_stats_counter('total_searches');
+
+CREATE TRIGGER count_downloads
+    AFTER INSERT ON downloads
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_stats_counter('total_downloads');
+
+CREATE TRIGGER count_known_users
+    AFTER INSERT ON user_analytics
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION register_known_users();
+
+ALTER TABLE user_analytics ENABLE ROW LEVEL SECURITY;
+ALTER TABLE search_analytics ENABLE ROW LEVEL SECURITY;
+ALTER TABLE downloads ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow insert user_analytics" ON user_analytics
+    FOR INSERT WITH CHECK (true);
+
+CREATE POLICY "Allow insert search_analytics" ON search_analytics
+    FOR INSERT WITH CHECK (true);
+
+CREATE POLICY "Allow insert downloads" ON downloads
+    FOR INSERT WITH CHECK (true);
+
+-- Views: totals from the counters, popular searches bounded by time
+CREATE OR REPLACE VIEW stats_overview AS
+SELECT
+    (SELECT COUNT(*) FROM books WHERE is_active = true) AS total_books,
+    (SELECT COUNT(*) FROM themes WHERE is_active = true) AS total_themes,
+    (SELECT COUNT(*) FROM resources WHERE is_active = true) AS total_resources,
+    COALESCE((SELECT value FROM stats_counters WHERE name = 'total_users'), 0) AS total_users,
+    COALESCE((SELECT value FROM stats_counters WHERE name = 'total_downloads'), 0) AS total_downloads,
+    COALESCE((SELECT value FROM stats_counters WHERE name = 'total_searches'), 0) AS total_searches;
+
+CREATE OR REPLACE VIEW popular_searches AS
+SELECT
+    query,
+    COUNT(*) as search_count,
+    AVG(results_count) as avg_results
+FROM search_analytics
+WHERE created_at > NOW() - INTERVAL '30 days'
+GROUP BY query
+ORDER BY search_count DESC
+LIMIT 50;
+
+COMMIT;
@@ -1,6 +1,6 @@
 """
 Database Models
-Supports both Supabase (cloud) and SQLite (local fallback).
+Supports both Supabase (cloud, mirrored locally for reads) and SQLite (local fallback).
 """
 from sqlalchemy import Column, Integer, String, Text, ForeignKey, create_engine
 from sqlalchemy.orm import relationship, declarative_base, sessionmaker
@@ -129,7 +129,11 @@ async def get_async_session():
 
 # ═══════════════════════════════════════════════════════════════════════════
 # UNIFIED DATA ACCESS FUNCTIONS
-# These functions use Supabase when configured, SQLite otherwise
+# With Supabase configured: read local, write remote. Catalog reads go
+# through supabase_client, which serves them from the synced local mirror
+# (database/local_mirror.py) and only falls back to Supabase until the
+# first sync completes. Analytics and settings writes go to Supabase.
+# Without Supabase, the SQLAlchemy SQLite models below are used.
 # ═══════════════════════════════════════════════════════════════════════════
 
 def use_supabase() -> bool:
@@ -0,0 +1,249 @@
+"""
+Pre-generate Theme PDFs
+Walks every active book, opens each source PDF once, extracts every theme's
+page range as an optimized PDF, uploads it to Supabase Storage and records
+it in the theme_pdf_artifacts manifest. The bot then sends the prebuilt
+file instead of downloading the book and extracting on demand.
+
+Books are processed in parallel worker processes. Reruns are resumable:
+themes whose manifest row matches the book's content hash and page range
+are skipped, and books whose themes are all present are not downloaded
+again unless --recheck is given.
+
+Theme PDFs are saved with garbage collection, deduplication, stream
+compression and font subsetting. --report builds nothing and prints, per
+book, the bytes of each theme saved with default options vs. optimized.
+
+Usage:  python database/pregenerate_theme_pdfs.py [--workers 4] [--recheck] [--force] [--book ID] [--report]
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import sys
+sys.path.append('..')
+
+# spawn: workers must not inherit the parent's Supabase client and its open connections
+MP_CONTEXT = multiprocessing.get_context("spawn")
+
+# Storage bucket and prefix for prebuilt theme PDFs
+THEME_PDF_BUCKET = os.getenv("THEME_PDF_BUCKET", "books")
+THEME_PDF_PREFIX = "themes"
+
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+LANGUAGES = ("uz", "ru")
+
+
+def _download(url: str, target: Path) -> str:
+    """Stream a book to target; returns its sha256."""
+    digest = hashlib.sha256()
+    with urllib.request.urlopen(url, timeout=300) as resp, open(target, 'wb') as f:
+        while True:
+            chunk = resp.read(DOWNLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            f.write(chunk)
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def report_book(book_id: int, language: str, source: str, themes: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Worker: default vs. optimized bytes of every theme of one book language."""
+    from services.document_pool import document_pool
+    from services.pdf_processor import theme_pages, theme_size_report
+
+    summary = {"themes": 0, "plain_bytes": 0, "output_bytes": 0}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if source.startswith('http'):
+            pdf_path = Path(tmp_dir) / "book.pdf"
+            _download(source, pdf_path)
+        else:
+            pdf_path = Path(source)
+        for theme in themes:
+            start, end = theme_pages(theme, language)
+            if end < start:
+                continue
+            try:
+                report = theme_size_report(str(pdf_path), start, end)
+            except Exception as e:
+                print(f"  theme {theme['id']} ({language}): {e}")
+                continue
+            summary["themes"] += 1
+            summary["plain_bytes"] += report["plain_bytes"]
+            summary["output_bytes"] += report["output_bytes"]
+        # The downloaded copy is deleted with tmp_dir
+        document_pool.clear()
+    return summary
+
+
+def process_book(book_id: int, language: str, source: str, themes: List[Dict[str, Any]],
+                 manifest: Dict[int, Tuple[str, int, int]], force: bool) -> Dict[str, int]:
+    """Worker: build and upload every changed theme PDF of one book language."""
+    import fitz
+    from database.supabase_client import get_supabase
+    from services.pdf_processor import OUTPUT_SAVE_OPTIONS, subset_fonts, theme_pages
+
+    summary = {"built": 0, "skipped": 0, "failed": 0}
+    client = get_supabase()
+    storage = client.storage.from_(THEME_PDF_BUCKET)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if source.startswith('http'):
+            pdf_path = Path(tmp_dir) / "book.pdf"
+            sha = _download(source, pdf_path)
+        else:
+            pdf_path = Path(source)
+            sha = _file_sha256(pdf_path)
+
+        with fitz.open(pdf_path) as doc:
+            for theme in themes:
+                start, end = theme_pages(theme, language)
+                if end < start or start >= len(doc):
+                    summary["skipped"] += 1
+                    continue
+                if not force and manifest.get(theme['id']) == (sha, start, end):
+                    summary["skipped"] += 1
+                    continue
+                try:
+                    with fitz.open() as theme_doc:
+                        theme_doc.insert_pdf(doc, from_page=start, to_page=min(end, len(doc) - 1))
+                        subset_fonts(theme_doc)
+                        data = theme_doc.tobytes(**OUTPUT_SAVE_OPTIONS)
+
+                    storage_path = f"{THEME_PDF_PREFIX}/{book_id}/{language}/{theme['id']}.pdf"
+                    storage.upload(
+                        storage_path, data,
+                        file_options={"content-type": "application/pdf", "upsert": "true"}
+                    )
+                    client.table("theme_pdf_artifacts").upsert({
+                        "theme_id": theme['id'],
+                        "language": language,
+                        "start_page": start,
+                        "end_page": end,
+                        "source_sha256": sha,
+                        "storage_path": storage_path,
+                        "url": storage.get_public_url(storage_path),
+                        "size_bytes": len(data),
+                    }, on_conflict="theme_id,language").execute()
+                    summary["built"] += 1
+                except Exception as e:
+                    print(f"  theme {theme['id']} ({language}): {e}")
+                    summary["failed"] += 1
+    return summary
+
+
+def _load_manifest(client) -> Dict[Tuple[int, str], Tuple[str, int, int]]:
+    manifest = {}
+    offset = 0
+    while True:
+        rows = client.table("theme_pdf_artifacts").select(
+            "theme_id, language, source_sha256, start_page, end_page"
+        ).order("theme_id").range(offset, offset + 999).execute().data or []
+        for row in rows:
+            manifest[(row["theme_id"], row["language"])] = (row["source_sha256"], row["start_page"], row["end_page"])
+        if len(rows) < 1000:
+            return manifest
+        offset += 1000
+
+
+def report(jobs: List[tuple], workers: int) -> None:
+    plain_total = output_total = 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=MP_CONTEXT) as pool:
+        futures = {pool.submit(report_book, *job): job for job in jobs}
+        for future in as_completed(futures):
+            book_id, language = futures[future][:2]
+            try:
+                summary = future.result()
+            except Exception as e:
+                print(f"❌ Book {book_id} ({language}): {e}")
+                continue
+            plain_total += summary["plain_bytes"]
+            output_total += summary["output_bytes"]
+            ratio = summary["output_bytes"] / summary["plain_bytes"] if summary["plain_bytes"] else 1.0
+            print(f"Book {book_id} ({language}): {summary['themes']} themes, "
+                  f"{summary['plain_bytes'] / 1048576:.1f}MB -> {summary['output_bytes'] / 1048576:.1f}MB ({ratio:.0%})")
+    if plain_total:
+        print(f"Total: {plain_total / 1048576:.1f}MB -> {output_total / 1048576:.1f}MB "
+              f"({output_total / plain_total:.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate theme PDFs into storage")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--recheck", action="store_true", help="download books even if all their themes are built")
+    parser.add_argument("--force", action="store_true", help="rebuild every theme")
+    parser.add_argument("--book", type=int, help="only this book id")
+    parser.add_argument("--report", action="store_true", help="only compare default vs. optimized theme sizes")
+    args = parser.parse_args()
+
+    from database.supabase_client import get_supabase, get_all_books, get_themes_by_book
+    from services.pdf_processor import theme_pages
+
+    client = get_supabase()
+    manifest = _load_manifest(client)
+    books = [b for b in get_all_books() if args.book is None or b['id'] == args.book]
+
+    jobs = []
+    for book in books:
+        themes = get_themes_by_book(book['id'])
+        for language in LANGUAGES:
+            source = book.get(f'pdf_path_{language}')
+            if not source or not themes:
+                continue
+            book_manifest = {
+                t['id']: manifest[(t['id'], language)] for t in themes if (t['id'], language) in manifest
+            }
+            up_to_date = all(
+                t['id'] in book_manifest
+                and book_manifest[t['id']][1:] == theme_pages(t, language)
+                for t in themes
+            )
+            if args.report:
+                jobs.append((book['id'], language, source, themes))
+                continue
+            if up_to_date and not (args.recheck or args.force):
+                continue
+            jobs.append((book['id'], language, source, themes, book_manifest, args.force))
+
+    if args.report:
+        report(jobs, args.workers)
+        return
+
+    print(f"📚 {len(books)} books, {len(jobs)} book PDFs to process with {args.workers} workers")
+    started = time.time()
+    totals = {"built": 0, "skipped": 0, "failed": 0}
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=MP_CONTEXT) as pool:
+        futures = {pool.submit(process_book, *job): job for job in jobs}
+        for future in as_completed(futures):
+            book_id, language = futures[future][:2]
+            try:
+                summary = future.result()
+            except Exception as e:
+                print(f"❌ Book {book_id} ({language}): {e}")
+                totals["failed"] += 1
+                continue
+            for key in totals:
+                totals[key] += summary[key]
+            print(f"✅ Book {book_id} ({language}): {summary['built']} built, {summary['skipped']} unchanged")
+
+    print(f"Done in {time.time() - started:.0f}s: {totals['built']} built, "
+          f"{totals['skipped']} unchanged, {totals['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Resilience Layer
+Circuit breaker and stale-while-revalidate caching for Supabase reads.
+
+When Supabase is slow or down, reads that were fetched recently are served
+from cache while a background refresh runs, and after repeated failures
+the circuit opens so requests fail fast instead of waiting for timeouts.
+"""
+import copy
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import sys
+sys.path.append('..')
+from services import metrics
+
+# Consecutive failures before the circuit opens, and seconds it stays open
+# before a single trial request is let through
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+# Cached rows are fresh for READ_FRESH_TTL seconds, then served stale (with
+# a background refresh) for up to READ_STALE_TTL seconds
+READ_FRESH_TTL = float(os.getenv("READ_FRESH_TTL", "30"))
+READ_STALE_TTL = float(os.getenv("READ_STALE_TTL", "3600"))
+READ_CACHE_SIZE = int(os.getenv("READ_CACHE_SIZE", "5000"))
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open."""
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; half-opens after a cooldown."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    # Numeric values for the state gauge
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        metrics.register_gauge(f"{name}_circuit_state", lambda: self._STATE_VALUES[self.state])
+
+    def allow(self) -> bool:
+        """Check whether a call may proceed."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                # Let exactly one trial request through
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.state = self.CLOSED
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    metrics.inc(f"{self.name}_circuit_opened_total")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Call `fn` through the breaker."""
+        if not self.allow():
+            metrics.inc(f"{self.name}_fast_failures_total")
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+# Shared breaker for all Supabase calls
+supabase_breaker = CircuitBreaker("supabase")
+
+# Background revalidation of stale entries
+_revalidate_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="revalidate")
+
+
+def _make_key(name: str, args: tuple, kwargs: dict) -> tuple:
+    def freeze(value):
+        if isinstance(value, (list, tuple, set)):
+            return tuple(freeze(v) for v in value)
+        return value
+    return (name, freeze(args), tuple(sorted((k, freeze(v)) for k, v in kwargs.items())))
+
+
+def resilient_read(default: Any = None, fresh_ttl: float = READ_FRESH_TTL, stale_ttl: float = READ_STALE_TTL):
+    """
+    Decorate a read function with caching, stale-while-revalidate and the
+    Supabase circuit breaker. The wrapped function should raise on errors;
+    if nothing is cached the wrapper returns a copy of `default`.
+    """
+    def decorator(fn: Callable) -> Callable:
+        cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        in_flight = set()
+        lock = threading.Lock()
+
+        def store(key, value):
+            with lock:
+                cache[key] = (value, time.monotonic())
+                cache.move_to_end(key)
+                while len(cache) > READ_CACHE_SIZE:
+                    cache.popitem(last=False)
+
+        def revalidate(key, args, kwargs):
+            try:
+                store(key, supabase_breaker.call(fn, *args, **kwargs))
+                metrics.inc("supabase_revalidations_total")
+            except Exception as e:
+                print(f"Background refresh of {fn.__name__} failed: {e}")
+            finally:
+                with lock:
+                    in_flight.discard(key)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = _make_key(fn.__name__, args, kwargs)
+            with lock:
+                entry = cache.get(key)
+                if entry:
+                    cache.move_to_end(key)
+
+            if entry:
+                value, fetched_at = entry
+                age = time.monotonic() - fetched_at
+                if age < fresh_ttl:
+                    return value
+                if age < stale_ttl:
+                    with lock:
+                        schedule = key not in in_flight
+                        in_flight.add(key)
+                    if schedule:
+                        _revalidate_executor.submit(revalidate, key, args, kwargs)
+                    metrics.inc("supabase_stale_served_total")
+                    return value
+
+            try:
+                value = supabase_breaker.call(fn, *args, **kwargs)
+            except Exception as e:
+                if entry:
+                    # Stale-if-error: an old answer beats "not found"
+                    metrics.inc("supabase_stale_served_total")
+                    return entry[0]
+                if not isinstance(e, CircuitOpenError):
+                    print(f"Error in {fn.__name__}: {e}")
+                return copy.copy(default)
+
+            store(key, value)
+            return value
+
+        def cache_clear() -> None:
+            with lock:
+                cache.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
@@ -0,0 +1,99 @@
+"""
+Analytics Rollups
+Incremental refresh and reads of the daily rollup tables
+(analytics_daily_actions, analytics_daily_themes).
+"""
+import asyncio
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Any
+import sys
+sys.path.append('..')
+from services import metrics
+
+# Seconds between rollup refreshes
+ROLLUP_REFRESH_INTERVAL = int(os.getenv("ROLLUP_REFRESH_INTERVAL", "300"))
+
+# Rollup days are Tashkent calendar days (UTC+5, no DST)
+TASHKENT_TZ = timezone(timedelta(hours=5))
+
+
+def today() -> date:
+    """Current date in Tashkent."""
+    return datetime.now(TASHKENT_TZ).date()
+
+
+def refresh_rollups() -> bool:
+    """
+    Fold analytics rows inserted since the last watermark into the rollups.
+    Rows from the last few minutes wait for the next refresh, so rows
+    committed out of order are never skipped.
+    """
+    from database.supabase_client import get_supabase
+    from database.resilience import supabase_breaker
+
+    try:
+        with metrics.timer("rollup_refresh_seconds"):
+            supabase_breaker.call(lambda: get_supabase().rpc("refresh_analytics_rollups").execute())
+        return True
+    except Exception as e:
+        metrics.inc("rollup_refresh_errors_total")
+        print(f"Error refreshing analytics rollups: {e}")
+        return False
+
+
+def get_activity_summary(days: int = 7) -> Dict[str, int]:
+    """Event counts per action type over the last `days` days (including today)."""
+    from database.supabase_client import get_supabase
+
+    since = (today() - timedelta(days=days - 1)).isoformat()
+    try:
+        response = get_supabase().table("analytics_daily_actions").select(
+            "action_type, event_count"
+        ).gte("day", since).execute()
+    except Exception as e:
+        print(f"Error reading activity rollups: {e}")
+        return {}
+
+    totals: Dict[str, int] = defaultdict(int)
+    for row in response.data or []:
+        totals[row["action_type"]] += row.get("event_count") or 0
+    return dict(totals)
+
+
+def get_top_themes(days: int = 7, limit: int = 10) -> List[Dict[str, Any]]:
+    """Most viewed/downloaded themes over the last `days` days."""
+    from database.supabase_client import get_supabase
+
+    since = (today() - timedelta(days=days - 1)).isoformat()
+    try:
+        response = get_supabase().table("analytics_daily_themes").select(
+            "theme_id, views, downloads"
+        ).gte("day", since).execute()
+    except Exception as e:
+        print(f"Error reading theme rollups: {e}")
+        return []
+
+    totals: Dict[int, Dict[str, int]] = defaultdict(lambda: {"views": 0, "downloads": 0})
+    for row in response.data or []:
+        totals[row["theme_id"]]["views"] += row.get("views") or 0
+        totals[row["theme_id"]]["downloads"] += row.get("downloads") or 0
+
+    ranked = sorted(totals.items(), key=lambda item: item[1]["views"] + item[1]["downloads"], reverse=True)
+    return [{"theme_id": theme_id, **counts} for theme_id, counts in ranked[:limit]]
+
+
+async def run_rollup_loop(interval: int = ROLLUP_REFRESH_INTERVAL) -> None:
+    """Background task: refresh rollups periodically."""
+    while True:
+        await asyncio.to_thread(refresh_rollups)
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    if refresh_rollups():
+        print("✅ Rollups refreshed")
+        print(get_activity_summary())
+    else:
+        print("❌ Rollup refresh failed")
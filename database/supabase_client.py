@@ -1,12 +1,22 @@
 """
 Supabase Client Service
 Handles all database operations with Supabase.
+Catalog reads are served from the local mirror once it has synced;
+writes always go to Supabase.
 """
 import os
-from typing import List, Optional, Dict, Any
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Dict, Any, Union
 from functools import lru_cache
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 from dotenv import load_dotenv
+from database.local_mirror import get_ready_mirror
+from database.resilience import resilient_read
+from database.analytics_writer import analytics_writer
+from database.active_users import active_users
 
 load_dotenv()
 
@@ -14,6 +24,9 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
 
+# Fail fast instead of hanging handlers on a slow backend (seconds)
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+
 # Global client instance
 _supabase_client: Optional[Client] = None
 
@@ -29,7 +42,10 @@ def get_supabase() -> Client:
         )
     
     if _supabase_client is None:
-        _supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        _supabase_client = create_client(
+            SUPABASE_URL, SUPABASE_KEY,
+            options=ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT)
+        )
     
     return _supabase_client
 
@@ -81,53 +97,74 @@ def set_user_lang(telegram_user_id: int, language: str) -> bool:
 
 def get_all_books(active_only: bool = True) -> List[Dict[str, Any]]:
     """Get all books from database."""
-    try:
-        client = get_supabase()
-        query = client.table("books").select("*")
-        
-        if active_only:
-            query = query.eq("is_active", True)
-        
-        response = query.order("grade").order("subject").execute()
-        return response.data or []
-    except Exception as e:
-        print(f"Error fetching books: {e}")
-        return []
+    mirror = get_ready_mirror()
+    if mirror:
+        return mirror.get_all_books(active_only)
+    return _fetch_all_books(active_only)
 
 
-def get_books_by_grade(grade: int, active_only: bool = True, language: Optional[str] = None) -> List[Dict[str, Any]]:
-    """Get books for a specific grade."""
-    try:
-        client = get_supabase()
-        query = client.table("books").select("*").eq("grade", grade)
-        
-        if active_only:
-            query = query.eq("is_active", True)
-        
-        if language == 'uz':
-            # Filter books that have Uzbek title
-            query = query.not_.is_("title_uz", "null")
-        elif language == 'ru':
-            # Filter books that have Russian title
-            query = query.not_.is_("title_ru", "null")
-        
-        response = query.order("subject").execute()
-        return response.data or []
-    except Exception as e:
-        print(f"Error fetching books by grade: {e}")
-        return []
+@resilient_read(default=[])
+def _fetch_all_books(active_only: bool) -> List[Dict[str, Any]]:
+    client = get_supabase()
+    query = client.table("books").select("*")
+    
+    if active_only:
+        query = query.eq("is_active", True)
+    
+    response = query.order("grade").order("subject").execute()
+    return response.data or []
+
+
+def get_books_by_grade(grade: Union[int, List[int]], active_only: bool = True, language: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Get books for a specific grade (or a list of grades)."""
+    if isinstance(grade, (list, tuple, set)):
+        return get_books_by_grades(list(grade), active_only=active_only, language=language)
+    return get_books_by_grades([grade], active_only=active_only, language=language)
+
+
+def get_books_by_grades(grades: List[int], active_only: bool = True, language: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Get books for a range of grades with a single indexed IN query."""
+    mirror = get_ready_mirror()
+    if mirror:
+        return mirror.get_books_by_grades(grades, active_only, language)
+    return _fetch_books_by_grades(grades, active_only, language)
+
+
+@resilient_read(default=[])
+def _fetch_books_by_grades(grades: List[int], active_only: bool, language: Optional[str]) -> List[Dict[str, Any]]:
+    client = get_supabase()
+    query = client.table("books").select("*").in_("grade", grades)
+    
+    if active_only:
+        query = query.eq("is_active", True)
+    
+    if language == 'uz':
+        # Filter books that have Uzbek title
+        query = query.not_.is_("title_uz", "null")
+    elif language == 'ru':
+        # Filter books that have Russian title
+        query = query.not_.is_("title_ru", "null")
+    
+    response = query.order("grade").order("subject").execute()
+    return response.data or []
 
 
 def get_book_by_id(book_id: int) -> Optional[Dict[str, Any]]:
     """Get a single book by ID."""
-    try:
-        client = get_supabase()
-        response = client.table("books").select("*").eq("id", book_id).limit(1).execute()
-        data = response.data
-        return data[0] if data else None
-    except Exception as e:
-        print(f"Error fetching book {book_id}: {e}")
-        return None
+    if _catalog_books is not None and book_id in _catalog_index:
+        return _catalog_index[book_id]
+    mirror = get_ready_mirror()
+    if mirror:
+        return mirror.get_book(book_id)
+    return _fetch_book_by_id(book_id)
+
+
+@resilient_read(default=None)
+def _fetch_book_by_id(book_id: int) -> Optional[Dict[str, Any]]:
+    client = get_supabase()
+    response = client.table("books").select("*").eq("id", book_id).limit(1).execute()
+    data = response.data
+    return data[0] if data else None
 
 
 def get_books_count() -> int:
@@ -141,50 +178,123 @@ def get_books_count() -> int:
         return 0
 
 
+# ═══════════════════════════════════════════════════════════════════════════
+# CATALOG CACHE
+# The active book catalog is small and changes only on rebuilds, so it is
+# kept in-process and refreshed every CATALOG_CACHE_TTL seconds.
+# ═══════════════════════════════════════════════════════════════════════════
+
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "600"))
+_catalog_books: Optional[List[Dict[str, Any]]] = None
+_catalog_index: Dict[int, Dict[str, Any]] = {}
+_catalog_time = 0.0
+_catalog_version = 0
+
+
+def get_catalog_books() -> List[Dict[str, Any]]:
+    """Get all active books (ordered by grade, subject) from the catalog cache."""
+    global _catalog_books, _catalog_index, _catalog_time, _catalog_version
+
+    now = time.monotonic()
+    if _catalog_books is not None and now - _catalog_time < CATALOG_CACHE_TTL:
+        return _catalog_books
+
+    books = get_all_books()
+    if books:
+        if books != _catalog_books:
+            _catalog_version += 1
+        _catalog_books = books
+        _catalog_index = {book["id"]: book for book in books}
+        _catalog_time = now
+    elif _catalog_books is not None:
+        # On a failed refresh keep serving the previous catalog
+        _catalog_time = now
+    return _catalog_books or []
+
+
+def get_catalog_version() -> int:
+    """Version number that changes whenever the cached catalog changes."""
+    get_catalog_books()
+    return _catalog_version
+
+
+def invalidate_catalog() -> None:
+    """Force the next catalog read to refetch from the database."""
+    global _catalog_time
+    _catalog_time = 0.0
+
+
 # ═══════════════════════════════════════════════════════════════════════════
 # THEMES OPERATIONS
 # ═══════════════════════════════════════════════════════════════════════════
 
 def get_themes_by_book(book_id: int, active_only: bool = True) -> List[Dict[str, Any]]:
     """Get all themes for a book."""
-    try:
-        client = get_supabase()
-        query = client.table("themes").select("*").eq("book_id", book_id)
-        
-        if active_only:
-            query = query.eq("is_active", True)
-        
-        response = query.order("order_index").execute()
-        return response.data or []
-    except Exception as e:
-        print(f"Error fetching themes for book {book_id}: {e}")
-        return []
+    mirror = get_ready_mirror()
+    if mirror:
+        return mirror.get_themes_by_book(book_id, active_only)
+    return _fetch_themes_by_book(book_id, active_only)
+
+
+@resilient_read(default=[])
+def _fetch_themes_by_book(book_id: int, active_only: bool) -> List[Dict[str, Any]]:
+    client = get_supabase()
+    query = client.table("themes").select("*").eq("book_id", book_id)
+    
+    if active_only:
+        query = query.eq("is_active", True)
+    
+    response = query.order("order_index").execute()
+    return response.data or []
 
 
 def get_theme_by_id(theme_id: int) -> Optional[Dict[str, Any]]:
     """Get a single theme by ID."""
-    try:
-        client = get_supabase()
-        response = client.table("themes").select("*").eq("id", theme_id).limit(1).execute()
-        data = response.data
-        return data[0] if data else None
-    except Exception as e:
-        print(f"Error fetching theme {theme_id}: {e}")
-        return None
+    mirror = get_ready_mirror()
+    if mirror:
+        return mirror.get_theme(theme_id)
+    return _fetch_theme_by_id(theme_id)
+
+
+@resilient_read(default=None)
+def _fetch_theme_by_id(theme_id: int) -> Optional[Dict[str, Any]]:
+    client = get_supabase()
+    response = client.table("themes").select("*").eq("id", theme_id).limit(1).execute()
+    data = response.data
+    return data[0] if data else None
 
 
 def get_theme_with_book(theme_id: int) -> Optional[Dict[str, Any]]:
     """Get a theme with its associated book information."""
-    try:
-        client = get_supabase()
-        response = client.table("themes").select(
-            "*, books(*)"
-        ).eq("id", theme_id).limit(1).execute()
-        data = response.data
-        return data[0] if data else None
-    except Exception as e:
-        print(f"Error fetching theme with book {theme_id}: {e}")
-        return None
+    mirror = get_ready_mirror()
+    if mirror:
+        return mirror.get_theme_with_book(theme_id)
+    return _fetch_theme_with_book(theme_id)
+
+
+@resilient_read(default=None)
+def _fetch_theme_with_book(theme_id: int) -> Optional[Dict[str, Any]]:
+    client = get_supabase()
+    response = client.table("themes").select(
+        "*, books(*)"
+    ).eq("id", theme_id).limit(1).execute()
+    data = response.data
+    return data[0] if data else None
+
+
+def get_theme_artifact(theme_id: int, language: str) -> Optional[Dict[str, Any]]:
+    """Get the prebuilt theme PDF (storage URL, page range and source hash), if any."""
+    return _fetch_theme_artifact(theme_id, language)
+
+
+@resilient_read(default=None)
+def _fetch_theme_artifact(theme_id: int, language: str) -> Optional[Dict[str, Any]]:
+    client = get_supabase()
+    response = client.table("theme_pdf_artifacts").select(
+        "start_page, end_page, url, size_bytes, source_sha256"
+    ).eq("theme_id", theme_id).eq("language", language).limit(1).execute()
+    data = response.data
+    return data[0] if data else None
 
 
 def get_themes_count() -> int:
@@ -200,15 +310,19 @@ def get_themes_count() -> int:
 
 def count_themes_by_book(book_id: int) -> int:
     """Count themes for a specific book."""
-    try:
-        client = get_supabase()
-        response = client.table("themes").select(
-            "id", count="exact"
-        ).eq("book_id", book_id).eq("is_active", True).execute()
-        return response.count or 0
-    except Exception as e:
-        print(f"Error counting themes: {e}")
-        return 0
+    mirror = get_ready_mirror()
+    if mirror:
+        return mirror.count_themes_by_book(book_id)
+    return _fetch_themes_count_by_book(book_id)
+
+
+@resilient_read(default=0)
+def _fetch_themes_count_by_book(book_id: int) -> int:
+    client = get_supabase()
+    response = client.table("themes").select(
+        "id", count="exact"
+    ).eq("book_id", book_id).eq("is_active", True).execute()
+    return response.count or 0
 
 
 # ═══════════════════════════════════════════════════════════════════════════
@@ -247,71 +361,81 @@ def _fallback_search(
     subject: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """Search themes by NAME only (not content)."""
-    try:
-        client = get_supabase()
-        query = query.strip()
-        
-        # Search ONLY in theme names (not content)
-        filter_str = f"name_uz.ilike.%{query}%,name_ru.ilike.%{query}%"
-        
-        base_query = client.table("themes").select(
-            "id, book_id, name_uz, name_ru, start_page, end_page, books(subject, grade, title_uz, title_ru)"
-        ).eq("is_active", True)
-        
-        # Add name filter
-        base_query = base_query.or_(filter_str)
-        
-        # Pagination
-        response = base_query.order('id').range(offset, offset + 49).execute()
-        
-        results = []
-        query_lower = query.lower()
-        
-        for theme in response.data or []:
-            book = theme.get("books", {})
-            if not book: continue
-            
-            # Apply filters
-            if grade and book.get("grade") != grade:
-                continue
-            if subject and subject.lower() not in (book.get("subject") or "").lower():
-                continue
-            
-            name_uz = theme.get("name_uz") or ""
-            name_ru = theme.get("name_ru") or ""
-            
-            # Only include if query is in name
-            if query_lower in name_uz.lower() or query_lower in name_ru.lower():
-                results.append({
-                    "theme_id": theme["id"],
-                    "book_id": theme["book_id"],
-                    "name_uz": name_uz,  # Actual theme name
-                    "name_ru": name_ru,  # Actual theme name
-                    "subject": book.get("subject"),
-                    "grade": book.get("grade"),
-                    "book_title_uz": book.get("title_uz"),
-                    "book_title_ru": book.get("title_ru"),
-                    "start_page": theme.get("start_page"),
-                    "end_page": theme.get("end_page"),
-                    "relevance_score": 1000,
-                    "snippet": ""
-                })
-        
-        # Deduplicate
-        seen_ids = set()
-        unique_results = []
-        for r in results:
-            if r["theme_id"] not in seen_ids:
-                seen_ids.add(r["theme_id"])
-                unique_results.append(r)
-        
-        return unique_results[:limit]
-        
+    # Matching is case-insensitive; normalizing shares cached results (and the
+    # cache warmer's hot queries) across spellings
+    query = query.strip().lower()
+    mirror = get_ready_mirror()
+    if mirror:
+        return mirror.search_theme_names(query, limit, offset, grade, subject)
+    return _fetch_name_search(query, limit, offset, grade, subject)
 
-        
-    except Exception as e:
-        print(f"Fallback search error: {e}")
-        return []
+
+@resilient_read(default=[])
+def _fetch_name_search(
+    query: str,
+    limit: int,
+    offset: int,
+    grade: Optional[int],
+    subject: Optional[str]
+) -> List[Dict[str, Any]]:
+    client = get_supabase()
+    query = query.strip()
+
+    # Search ONLY in theme names (not content)
+    filter_str = f"name_uz.ilike.%{query}%,name_ru.ilike.%{query}%"
+
+    base_query = client.table("themes").select(
+        "id, book_id, name_uz, name_ru, start_page, end_page, books(subject, grade, title_uz, title_ru)"
+    ).eq("is_active", True)
+
+    # Add name filter
+    base_query = base_query.or_(filter_str)
+
+    # Pagination
+    response = base_query.order('id').range(offset, offset + 49).execute()
+
+    results = []
+    query_lower = query.lower()
+
+    for theme in response.data or []:
+        book = theme.get("books", {})
+        if not book: continue
+
+        # Apply filters
+        if grade and book.get("grade") != grade:
+            continue
+        if subject and subject.lower() not in (book.get("subject") or "").lower():
+            continue
+
+        name_uz = theme.get("name_uz") or ""
+        name_ru = theme.get("name_ru") or ""
+
+        # Only include if query is in name
+        if query_lower in name_uz.lower() or query_lower in name_ru.lower():
+            results.append({
+                "theme_id": theme["id"],
+                "book_id": theme["book_id"],
+                "name_uz": name_uz,  # Actual theme name
+                "name_ru": name_ru,  # Actual theme name
+                "subject": book.get("subject"),
+                "grade": book.get("grade"),
+                "book_title_uz": book.get("title_uz"),
+                "book_title_ru": book.get("title_ru"),
+                "start_page": theme.get("start_page"),
+                "end_page": theme.get("end_page"),
+                "relevance_score": 1000,
+                "snippet": ""
+            })
+
+    # Deduplicate
+    seen_ids = set()
+    unique_results = []
+    for r in results:
+        if r["theme_id"] not in seen_ids:
+            seen_ids.add(r["theme_id"])
+            unique_results.append(r)
+
+    return unique_results[:limit]
 
 
 def detect_language(text: str) -> str:
@@ -330,15 +454,19 @@ def detect_language(text: str) -> str:
 
 def get_resources_by_theme(theme_id: int) -> List[Dict[str, Any]]:
     """Get all resources for a theme."""
-    try:
-        client = get_supabase()
-        response = client.table("resources").select("*").eq(
-            "theme_id", theme_id
-        ).eq("is_active", True).execute()
-        return response.data or []
-    except Exception as e:
-        print(f"Error fetching resources: {e}")
-        return []
+    mirror = get_ready_mirror()
+    if mirror:
+        return mirror.get_resources_by_theme(theme_id)
+    return _fetch_resources_by_theme(theme_id)
+
+
+@resilient_read(default=[])
+def _fetch_resources_by_theme(theme_id: int) -> List[Dict[str, Any]]:
+    client = get_supabase()
+    response = client.table("resources").select("*").eq(
+        "theme_id", theme_id
+    ).eq("is_active", True).execute()
+    return response.data or []
 
 
 def get_resources_count() -> int:
@@ -356,6 +484,22 @@ def get_resources_count() -> int:
 # ANALYTICS OPERATIONS
 # ═══════════════════════════════════════════════════════════════════════════
 
+def _record_event(table: str, row: Dict[str, Any]) -> bool:
+    """
+    Record an analytics row. While the background writer is running the row
+    is queued and flushed in batches; otherwise (scripts, tests) it is
+    inserted immediately. Rows that cannot be written are spooled locally.
+    """
+    # Client-side id and timestamp keep spool replays idempotent and accurate
+    row["event_id"] = str(uuid.uuid4())
+    row["created_at"] = datetime.now(timezone.utc).isoformat()
+    active_users.add(row.get("telegram_user_id"))
+
+    if analytics_writer.running:
+        return analytics_writer.enqueue(table, row)
+    return analytics_writer.write_batch([(table, row)])
+
+
 def track_user_action(
     telegram_user_id: int,
     action_type: str,
@@ -364,19 +508,13 @@ def track_user_action(
     action_data: Optional[Dict] = None
 ) -> bool:
     """Track user action for analytics."""
-    try:
-        client = get_supabase()
-        client.table("user_analytics").insert({
-            "telegram_user_id": telegram_user_id,
-            "telegram_username": telegram_username,
-            "first_name": first_name,
-            "action_type": action_type,
-            "action_data": action_data or {}
-        }).execute()
-        return True
-    except Exception as e:
-        print(f"Error tracking user action: {e}")
-        return False
+    return _record_event("user_analytics", {
+        "telegram_user_id": telegram_user_id,
+        "telegram_username": telegram_username,
+        "first_name": first_name,
+        "action_type": action_type,
+        "action_data": action_data or {}
+    })
 
 
 def track_search(
@@ -387,19 +525,13 @@ def track_search(
     clicked_theme_id: Optional[int] = None
 ) -> bool:
     """Track search query for analytics."""
-    try:
-        client = get_supabase()
-        client.table("search_analytics").insert({
-            "telegram_user_id": telegram_user_id,
-            "query": query,
-            "language_detected": language_detected or detect_language(query),
-            "results_count": results_count,
-            "clicked_theme_id": clicked_theme_id
-        }).execute()
-        return True
-    except Exception as e:
-        print(f"Error tracking search: {e}")
-        return False
+    return _record_event("search_analytics", {
+        "telegram_user_id": telegram_user_id,
+        "query": query,
+        "language_detected": language_detected or detect_language(query),
+        "results_count": results_count,
+        "clicked_theme_id": clicked_theme_id
+    })
 
 
 def track_download(
@@ -410,19 +542,38 @@ def track_download(
     telegram_user_id: Optional[int] = None
 ) -> bool:
     """Track download for analytics."""
+    return _record_event("downloads", {
+        "telegram_user_id": telegram_user_id,
+        "book_id": book_id,
+        "theme_id": theme_id,
+        "download_type": download_type,
+        "language": language
+    })
+
+
+def _analytics_since(days: int) -> str:
+    """Lower created_at bound for analytics reads, so they prune partitions."""
+    return (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+
+
+def get_popular_searches(days: int = 7, limit: int = 10) -> List[Dict[str, Any]]:
+    """Most frequent search queries over the last `days` days."""
+    client = get_supabase()
     try:
-        client = get_supabase()
-        client.table("downloads").insert({
-            "telegram_user_id": telegram_user_id,
-            "book_id": book_id,
-            "theme_id": theme_id,
-            "download_type": download_type,
-            "language": language
-        }).execute()
-        return True
+        response = client.rpc("get_popular_searches", {"p_days": days, "p_limit": limit}).execute()
+        return response.data or []
     except Exception as e:
-        print(f"Error tracking download: {e}")
-        return False
+        print(f"Popular searches RPC unavailable, querying table: {e}")
+
+    try:
+        response = client.table("search_analytics").select("query") \
+            .gte("created_at", _analytics_since(days)) \
+            .limit(5000).execute()
+        counts = Counter((row.get("query") or "").lower() for row in response.data or [])
+        return [{"query": q, "search_count": n} for q, n in counts.most_common(limit)]
+    except Exception as e:
+        print(f"Error fetching popular searches: {e}")
+        return []
 
 
 def save_feedback(
@@ -473,46 +624,80 @@ def save_support_message(
 # STATISTICS
 # ═══════════════════════════════════════════════════════════════════════════
 
+# Stats are cached in-process; the RPC itself is constant-time
+STATS_CACHE_TTL = int(os.getenv("STATS_CACHE_TTL", "60"))
+_stats_cache: Optional[Dict[str, int]] = None
+_stats_cache_time = 0.0
+
+# Maps stats_overview view columns to get_stats() keys
+_STATS_VIEW_KEYS = {
+    "total_books": "books",
+    "total_themes": "themes",
+    "total_resources": "resources",
+    "total_users": "total_users",
+    "total_searches": "total_searches",
+    "total_downloads": "total_downloads",
+}
+
+
 def get_users_count() -> int:
-    """Get total number of unique users."""
-    try:
-        client = get_supabase()
-        response = client.table("user_analytics").select("telegram_user_id", count="exact").execute()
-        # Note: This is a hack because Supabase select doesn't easily do DISTINCT count via client
-        # For small-medium boards, we can just get all and len(set) or use a RPC
-        # But for now, let's just count rows in user_analytics which represents 'visits'
-        return response.count or 0
-    except:
-        return 0
+    """Get total number of distinct users."""
+    return get_stats().get("total_users", 0)
+
 
 def get_searches_count() -> int:
     """Get total number of searches."""
-    try:
-        client = get_supabase()
-        response = client.table("search_analytics").select("*", count="exact").execute()
-        return response.count or 0
-    except:
-        return 0
+    return get_stats().get("total_searches", 0)
+
 
 def get_downloads_count() -> int:
     """Get total number of downloads."""
+    return get_stats().get("total_downloads", 0)
+
+
+def _fetch_stats() -> Optional[Dict[str, int]]:
+    """
+    Fetch statistics in a single round trip.
+    Prefers the get_stats_overview RPC (counter-backed), then the
+    stats_overview view for databases without the migration applied.
+    """
+    client = get_supabase()
     try:
-        client = get_supabase()
-        response = client.table("downloads").select("*", count="exact").execute()
-        return response.count or 0
-    except:
-        return 0
+        response = client.rpc("get_stats_overview").execute()
+        data = response.data
+        if isinstance(data, list):
+            data = data[0] if data else None
+        if data:
+            return {key: int(data.get(key) or 0) for key in _STATS_VIEW_KEYS.values()}
+    except Exception as e:
+        print(f"Stats RPC unavailable, using stats_overview view: {e}")
+
+    try:
+        response = client.table("stats_overview").select("*").limit(1).execute()
+        if response.data:
+            row = response.data[0]
+            return {key: int(row.get(column) or 0) for column, key in _STATS_VIEW_KEYS.items()}
+    except Exception as e:
+        print(f"Error fetching stats: {e}")
+    return None
+
 
 def get_stats() -> Dict[str, int]:
-    """Get database statistics."""
-    return {
-        "books": get_books_count(),
-        "themes": get_themes_count(),
-        "resources": get_resources_count(),
-        "total_users": get_users_count(),
-        "total_searches": get_searches_count(),
-        "total_downloads": get_downloads_count()
-    }
+    """Get database statistics (cached for STATS_CACHE_TTL seconds)."""
+    global _stats_cache, _stats_cache_time
+
+    now = time.monotonic()
+    if _stats_cache is not None and now - _stats_cache_time < STATS_CACHE_TTL:
+        return _stats_cache
+
+    stats = _fetch_stats()
+    if stats is None:
+        # Keep serving the last known values rather than zeros
+        return _stats_cache or {key: 0 for key in _STATS_VIEW_KEYS.values()}
+
+    _stats_cache = stats
+    _stats_cache_time = now
+    return stats
 
 
 # ═══════════════════════════════════════════════════════════════════════════
@@ -0,0 +1,124 @@
+"""
+Book Cache Service
+Local copies of book PDFs from Supabase Storage, used for uploads and as
+the source for theme extraction. Entries are keyed by a hash of the URL,
+bounded by BOOK_CACHE_MAX_BYTES (least recently used books are evicted)
+and validated against the downloaded size; entries older than
+BOOK_CACHE_REVALIDATE_SECONDS are revalidated with their ETag. Downloads
+are streamed to disk in chunks, so memory use does not depend on book size.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Optional
+import sys
+sys.path.append('..')
+from config import BOOK_CACHE_DIR
+from services import metrics
+from services.disk_cache import DiskCache, hash_key
+from services.single_flight import SingleFlight
+
+# Bytes held in memory per download
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+# Disk budget for cached books (default 2 GB)
+BOOK_CACHE_MAX_BYTES = int(os.getenv("BOOK_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Age after which a cached book is revalidated against storage
+BOOK_CACHE_REVALIDATE_SECONDS = int(os.getenv("BOOK_CACHE_REVALIDATE_SECONDS", "86400"))
+
+book_cache = DiskCache("book_cache", BOOK_CACHE_DIR, BOOK_CACHE_MAX_BYTES, suffix=".pdf")
+_downloads = SingleFlight("book_downloads")
+
+
+def get_cached_book(url: str) -> Optional[Path]:
+    """Local copy of a book if it is cached and intact (no network)."""
+    return book_cache.get(hash_key(url))
+
+
+def cached_book_sha256(url: str) -> Optional[str]:
+    """sha256 of a cached book's content, if it is cached (no network)."""
+    if not get_cached_book(url):
+        return None
+    return (book_cache.read_meta(hash_key(url)) or {}).get("sha256")
+
+
+def source_hash(pdf_path) -> str:
+    """
+    Identity of a book file's content, for keying files derived from it.
+    Cached downloads use the sha256 recorded at download time; other local
+    files use their path, size and modification time.
+    """
+    path = Path(pdf_path)
+    if path.parent == BOOK_CACHE_DIR:
+        meta = book_cache.read_meta(path.stem) or {}
+        if meta.get("sha256"):
+            return meta["sha256"]
+        return hash_key(f"{meta.get('url')}:{meta.get('etag')}:{meta.get('size')}")
+    stat = path.stat()
+    return hash_key(f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}")
+
+
+async def fetch_book(url: str, timeout: int = 300) -> Path:
+    """
+    Return the local copy of a book PDF, downloading it if needed.
+    Concurrent requests for the same URL share a single download.
+    """
+    return await _downloads.do(url, lambda: _fetch_book(url, timeout))
+
+
+async def _fetch_book(url: str, timeout: int) -> Path:
+    import aiohttp
+
+    key = hash_key(url)
+    path = book_cache.get(key)
+    meta = (book_cache.read_meta(key) or {}) if path else {}
+    if path and time.time() - meta.get("stored_at", 0) < BOOK_CACHE_REVALIDATE_SECONDS:
+        return path
+
+    headers = {}
+    if path and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+
+    tmp_path = book_cache.temp_path(key)
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                if resp.status == 304 and path:
+                    book_cache.touch(key)
+                    metrics.inc("book_cache_revalidated_total")
+                    return path
+                if resp.status != 200:
+                    if path:
+                        # Storage unavailable: keep serving the copy we have
+                        return path
+                    raise Exception(f"Failed to download book: {resp.status}")
+
+                # Content-Length is only comparable when the body is not re-encoded
+                expected_size = None if resp.headers.get("Content-Encoding") else resp.content_length
+
+                # Stream to a temp file; commit() renames it into place.
+                # The content hash identifies the source of derived files.
+                digest = hashlib.sha256()
+                with open(tmp_path, 'wb') as f:
+                    async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                        digest.update(chunk)
+                return book_cache.commit(
+                    key, tmp_path,
+                    expected_size=expected_size,
+                    url=url,
+                    etag=resp.headers.get("ETag"),
+                    sha256=digest.hexdigest(),
+                )
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        if path:
+            # Storage unreachable: keep serving the copy we have
+            print(f"Revalidating {url} failed, using cached copy: {e}")
+            return path
+        raise
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
@@ -0,0 +1,65 @@
+"""
+Cache Warmer Service
+Background job that keeps the hottest items warm: re-runs the top search
+queries, reloads the top themes and their books, and makes sure the most
+downloaded book PDFs are in the local book cache. Heavy-hitter counts are
+decayed after every pass so the working set follows recent traffic.
+"""
+import asyncio
+import os
+import sys
+sys.path.append('..')
+from config import SEARCH_PAGE_FETCH
+from services import metrics
+from services.heavy_hitters import hot_queries, hot_themes, hot_books
+from services.book_cache import fetch_book
+
+# Seconds between warming passes
+CACHE_WARM_INTERVAL = int(os.getenv("CACHE_WARM_INTERVAL", "120"))
+
+# How many of each kind of item to warm per pass
+CACHE_WARM_TOP_QUERIES = int(os.getenv("CACHE_WARM_TOP_QUERIES", "20"))
+CACHE_WARM_TOP_THEMES = int(os.getenv("CACHE_WARM_TOP_THEMES", "30"))
+CACHE_WARM_TOP_BOOKS = int(os.getenv("CACHE_WARM_TOP_BOOKS", "5"))
+
+
+async def warm_once() -> int:
+    """Run one warming pass; returns the number of items warmed."""
+    from database.supabase_client import search_themes, get_theme_by_id, get_book_by_id
+
+    warmed = 0
+    with metrics.timer("cache_warm_seconds"):
+        for query, _, _ in hot_queries.top(CACHE_WARM_TOP_QUERIES):
+            await asyncio.to_thread(search_themes, query, limit=SEARCH_PAGE_FETCH, offset=0)
+            warmed += 1
+
+        for theme_id, _, _ in hot_themes.top(CACHE_WARM_TOP_THEMES):
+            theme = await asyncio.to_thread(get_theme_by_id, theme_id)
+            if theme:
+                await asyncio.to_thread(get_book_by_id, theme.get('book_id'))
+            warmed += 1
+
+        for (book_id, language), _, _ in hot_books.top(CACHE_WARM_TOP_BOOKS):
+            book = await asyncio.to_thread(get_book_by_id, book_id)
+            url = book.get(f'pdf_path_{language}') if book else None
+            if url and url.startswith('http'):
+                try:
+                    await fetch_book(url)
+                    warmed += 1
+                except Exception as e:
+                    print(f"Cache warmer could not fetch book {book_id}: {e}")
+
+    for tracker in (hot_queries, hot_themes, hot_books):
+        tracker.decay()
+    metrics.inc("cache_warmed_items_total", warmed)
+    return warmed
+
+
+async def run_cache_warmer(interval: int = CACHE_WARM_INTERVAL) -> None:
+    """Background task: warm caches from the heavy hitters periodically."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await warm_once()
+        except Exception as e:
+            print(f"Cache warming error: {e}")
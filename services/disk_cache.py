@@ -0,0 +1,173 @@
+"""
+Disk Cache Service
+Content-addressed LRU file cache with a byte budget. Entries are stored as
+<key><suffix> plus a <key>.json sidecar (source, size, ETag) written after
+the data file is atomically renamed into place, so an entry without a
+matching sidecar is incomplete and never served. Recency is tracked with
+the data file's mtime.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+import sys
+sys.path.append('..')
+from services import metrics
+
+# Age after which an incomplete or orphaned file is considered abandoned
+STALE_FILE_SECONDS = 3600
+
+
+def hash_key(source: str) -> str:
+    """Stable cache key for a URL or other identifier."""
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:32]
+
+
+class DiskCache:
+    """Bounded, integrity-checked LRU cache of files in one directory."""
+
+    def __init__(self, name: str, root: Path, max_bytes: int, suffix: str = ""):
+        self.name = name
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._cleanup()
+        metrics.register_gauge(f"{name}_bytes", self.total_bytes)
+
+    def _data_path(self, key: str) -> Path:
+        return self.root / f"{key}{self.suffix}"
+
+    def _meta_path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def _cleanup(self) -> None:
+        """Remove leftovers of interrupted writes and files without metadata."""
+        # Only stale files: another process may be writing into this cache right now
+        cutoff = time.time() - STALE_FILE_SECONDS
+        for path in self.root.iterdir():
+            try:
+                if not path.is_file() or path.stat().st_mtime > cutoff:
+                    continue
+            except OSError:
+                continue
+            if path.name.endswith(".part"):
+                path.unlink(missing_ok=True)
+            elif path.suffix == ".json" and not self._data_path(path.stem).exists():
+                path.unlink(missing_ok=True)
+            elif path.suffix != ".json" and not self._meta_path(self._key_of(path)).exists():
+                path.unlink(missing_ok=True)
+
+    def _key_of(self, path: Path) -> str:
+        return path.name[:-len(self.suffix)] if self.suffix else path.name
+
+    def read_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._meta_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key: str) -> Optional[Path]:
+        """Path of a complete entry (marked as recently used), or None."""
+        path = self._data_path(key)
+        meta = self.read_meta(key)
+        if meta is None or not path.exists():
+            metrics.inc(f"{self.name}_misses_total")
+            return None
+        if path.stat().st_size != meta.get("size"):
+            # Truncated or overwritten outside the cache
+            metrics.inc(f"{self.name}_corrupt_total")
+            self.remove(key)
+            metrics.inc(f"{self.name}_misses_total")
+            return None
+        os.utime(path, None)
+        metrics.inc(f"{self.name}_hits_total")
+        return path
+
+    def temp_path(self, key: str) -> Path:
+        """Unique temp file to write a new entry into before commit()."""
+        return self.root / f"{key}.{uuid.uuid4().hex}.part"
+
+    def commit(self, key: str, tmp_path: Path, expected_size: int = None, **meta) -> Path:
+        """Atomically publish a fully written temp file as the entry for key."""
+        size = tmp_path.stat().st_size
+        if expected_size is not None and size != expected_size:
+            tmp_path.unlink(missing_ok=True)
+            metrics.inc(f"{self.name}_corrupt_total")
+            raise IOError(f"Incomplete file: got {size} of {expected_size} bytes")
+
+        path = self._data_path(key)
+        meta_tmp = self.root / f"{key}.{uuid.uuid4().hex}.json.part"
+        with open(meta_tmp, 'w', encoding='utf-8') as f:
+            json.dump({"size": size, "stored_at": time.time(), **meta}, f)
+        with self._lock:
+            os.replace(tmp_path, path)
+            os.replace(meta_tmp, self._meta_path(key))
+        metrics.inc(f"{self.name}_stored_bytes_total", size)
+        self.evict(keep=key)
+        return path
+
+    def store(self, key: str, data: bytes, **meta) -> Path:
+        """Write an in-memory entry (temp file, then commit)."""
+        tmp_path = self.temp_path(key)
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            return self.commit(key, tmp_path, expected_size=len(data), **meta)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def touch(self, key: str) -> None:
+        """Mark an entry as revalidated and recently used."""
+        meta = self.read_meta(key)
+        if meta is None:
+            return
+        meta["stored_at"] = time.time()
+        meta_tmp = self.root / f"{key}.{uuid.uuid4().hex}.json.part"
+        with open(meta_tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(meta_tmp, self._meta_path(key))
+        os.utime(self._data_path(key), None)
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self._meta_path(key).unlink(missing_ok=True)
+            self._data_path(key).unlink(missing_ok=True)
+
+    def _entries(self):
+        entries = []
+        for meta_path in self.root.glob("*.json"):
+            key = meta_path.stem
+            data_path = self._data_path(key)
+            try:
+                stat = data_path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, key))
+        return entries
+
+    def total_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, keep: str = None) -> int:
+        """Remove least recently used entries until the cache fits its budget."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.remove(key)
+            total -= size
+            evicted += 1
+        if evicted:
+            metrics.inc(f"{self.name}_evictions_total", evicted)
+        return evicted
@@ -0,0 +1,97 @@
+"""
+Document Pool
+Keeps recently used source PDFs open so repeated extractions from the same
+book skip reparsing its xref table and page tree. Each PDF worker process
+has its own pool; documents are keyed by (path, mtime) so a replaced file
+is reopened, and least recently used documents are closed once the pool
+exceeds its document count or its byte budget (file size is used as the
+cost estimate).
+
+Hits, misses and evictions are counted per pool; take_stats() hands them
+to the PDF worker pool, which reports them in the bot process's metrics.
+
+Pooled documents are shared: callers may read from them and insert their
+pages elsewhere, but must not modify, save or close them. MuPDF documents
+are not thread-safe, so the pool is meant for single-threaded worker
+processes.
+"""
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Tuple
+
+import fitz  # PyMuPDF
+
+# Per-process limits
+DOC_POOL_MAX_DOCS = int(os.getenv("DOC_POOL_MAX_DOCS", "8"))
+DOC_POOL_MAX_BYTES = int(os.getenv("DOC_POOL_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+class DocumentPool:
+    """LRU cache of open fitz.Document handles."""
+
+    def __init__(self, max_docs: int = DOC_POOL_MAX_DOCS, max_bytes: int = DOC_POOL_MAX_BYTES):
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self._docs: "OrderedDict[str, Tuple[int, int, fitz.Document]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, pdf_path) -> "fitz.Document":
+        """Open document for pdf_path, reused while the file is unchanged."""
+        path = str(Path(pdf_path).resolve())
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._docs.get(path)
+            if entry and entry[0] == stat.st_mtime_ns:
+                self._docs.move_to_end(path)
+                self._stats["hits"] += 1
+                return entry[2]
+            if entry:
+                # File was replaced since it was opened
+                self._docs.pop(path)[2].close()
+
+        doc = fitz.open(path)
+        with self._lock:
+            self._stats["misses"] += 1
+            entry = self._docs.get(path)
+            if entry and entry[0] == stat.st_mtime_ns:
+                # Opened concurrently by another caller
+                doc.close()
+                return entry[2]
+            if entry:
+                entry[2].close()
+            self._docs[path] = (stat.st_mtime_ns, stat.st_size, doc)
+            self._evict(keep=path)
+        return doc
+
+    def _evict(self, keep: str) -> None:
+        total = sum(size for _, size, _ in self._docs.values())
+        for path in list(self._docs):
+            if len(self._docs) <= self.max_docs and total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            _, size, doc = self._docs.pop(path)
+            doc.close()
+            total -= size
+            self._stats["evictions"] += 1
+
+    def take_stats(self) -> Dict[str, int]:
+        """Counters since the previous call, reset to zero."""
+        with self._lock:
+            stats = dict(self._stats)
+            for name in self._stats:
+                self._stats[name] = 0
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            for _, _, doc in self._docs.values():
+                doc.close()
+            self._docs.clear()
+
+
+# Singleton instance (one per process)
+document_pool = DocumentPool()
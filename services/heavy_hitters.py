@@ -0,0 +1,76 @@
+"""
+Heavy Hitters Service
+Space-Saving top-k counters for what is hot right now: search queries,
+viewed themes and downloaded books. Memory is bounded by the capacity;
+any item whose true count exceeds N/capacity is guaranteed to be tracked.
+Counts decay periodically so the ranking follows recent traffic.
+"""
+import threading
+from typing import Dict, Hashable, List, Tuple
+
+
+class SpaceSaving:
+    """Space-Saving stream summary with a fixed number of counters."""
+
+    def __init__(self, name: str, capacity: int = 200):
+        self.name = name
+        self.capacity = capacity
+        self._counts: Dict[Hashable, float] = {}
+        self._errors: Dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+
+    def offer(self, item: Hashable, weight: float = 1) -> None:
+        """Count one occurrence of an item."""
+        if item is None:
+            return
+        with self._lock:
+            if item in self._counts:
+                self._counts[item] += weight
+            elif len(self._counts) < self.capacity:
+                self._counts[item] = weight
+                self._errors[item] = 0
+            else:
+                # Replace the minimum; its count becomes the new item's error bound
+                victim = min(self._counts, key=self._counts.get)
+                floor = self._counts.pop(victim)
+                self._errors.pop(victim, None)
+                self._counts[item] = floor + weight
+                self._errors[item] = floor
+
+    def top(self, k: int = 10) -> List[Tuple[Hashable, float, float]]:
+        """Top-k items as (item, estimated count, max overestimate)."""
+        with self._lock:
+            ranked = sorted(self._counts.items(), key=lambda kv: kv[1], reverse=True)[:k]
+            return [(item, count, self._errors.get(item, 0)) for item, count in ranked]
+
+    def decay(self, factor: float = 0.5, min_count: float = 0.5) -> None:
+        """Scale all counts down and forget items that fall below min_count."""
+        with self._lock:
+            for item in list(self._counts):
+                self._counts[item] *= factor
+                self._errors[item] = self._errors.get(item, 0) * factor
+                if self._counts[item] < min_count:
+                    del self._counts[item]
+                    self._errors.pop(item, None)
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+
+# Global trackers
+hot_queries = SpaceSaving("queries")
+hot_themes = SpaceSaving("themes")
+hot_books = SpaceSaving("books")  # (book_id, language) of downloaded book PDFs
+
+
+def record_search(query: str) -> None:
+    # Case and surrounding spaces do not change the results: count them as one query
+    hot_queries.offer(query.strip().lower())
+
+
+def record_theme(theme_id: int) -> None:
+    hot_themes.offer(theme_id)
+
+
+def record_book(book_id: int, language: str) -> None:
+    hot_books.offer((book_id, language))
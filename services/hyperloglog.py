@@ -0,0 +1,69 @@
+"""
+HyperLogLog Service
+Fixed-size sketch for approximate distinct counting.
+With the default precision (p=12, 4096 registers, 4KB) the standard error
+is about 1.6%; sketches merge by taking the register-wise maximum.
+"""
+import base64
+import hashlib
+import math
+from typing import Iterable
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter with 64-bit hashing."""
+
+    def __init__(self, p: int = 12, registers: bytes = None):
+        if not 4 <= p <= 16:
+            raise ValueError("HyperLogLog precision must be between 4 and 16")
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(registers) if registers else bytearray(self.m)
+        if len(self.registers) != self.m:
+            raise ValueError("Register count does not match precision")
+
+    @staticmethod
+    def _hash(item) -> int:
+        digest = hashlib.blake2b(str(item).encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    def add(self, item) -> None:
+        """Add an item to the sketch."""
+        x = self._hash(item)
+        index = x >> (64 - self.p)
+        rest = x & ((1 << (64 - self.p)) - 1)
+        # Position of the leftmost 1-bit in the remaining 64-p bits
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, items: Iterable) -> None:
+        for item in items:
+            self.add(item)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Merge another sketch into this one (in place)."""
+        if other.p != self.p:
+            raise ValueError("Cannot merge sketches with different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        """Estimate the number of distinct items added."""
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_base64(self) -> str:
+        """Serialize as base64 text: one precision byte followed by the registers."""
+        return base64.b64encode(bytes([self.p]) + bytes(self.registers)).decode("ascii")
+
+    @classmethod
+    def from_base64(cls, data: str) -> "HyperLogLog":
+        raw = base64.b64decode(data)
+        return cls(p=raw[0], registers=raw[1:])
@@ -0,0 +1,87 @@
+"""
+Metrics Service
+Lightweight in-process counters, gauges and timings.
+Exposed to admins through the /metrics command.
+"""
+import threading
+import time
+from typing import Callable, Dict
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, float] = {}
+_gauge_callbacks: Dict[str, Callable[[], float]] = {}
+_timings: Dict[str, Dict[str, float]] = {}
+
+
+def inc(name: str, value: float = 1) -> None:
+    """Increment a counter."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name: str, value: float) -> None:
+    """Set a gauge to an absolute value."""
+    with _lock:
+        _gauges[name] = value
+
+
+def register_gauge(name: str, callback: Callable[[], float]) -> None:
+    """Register a gauge whose value is computed when metrics are read."""
+    with _lock:
+        _gauge_callbacks[name] = callback
+
+
+def observe(name: str, value: float) -> None:
+    """Record a timing or size observation (count, total and max are kept)."""
+    with _lock:
+        timing = _timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+        timing["count"] += 1
+        timing["total"] += value
+        timing["max"] = max(timing["max"], value)
+
+
+class timer:
+    """Context manager that observes the elapsed seconds under `name`."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def snapshot() -> Dict[str, float]:
+    """Get a flat snapshot of all metrics."""
+    with _lock:
+        result = dict(_counters)
+        result.update(_gauges)
+        callbacks = dict(_gauge_callbacks)
+        for name, timing in _timings.items():
+            result[f"{name}_count"] = timing["count"]
+            result[f"{name}_avg"] = timing["total"] / timing["count"] if timing["count"] else 0.0
+            result[f"{name}_max"] = timing["max"]
+
+    for name, callback in callbacks.items():
+        try:
+            result[name] = callback()
+        except Exception as e:
+            print(f"Error reading gauge {name}: {e}")
+    return result
+
+
+def format_report() -> str:
+    """Format all metrics as a plain-text report."""
+    lines = []
+    for name, value in sorted(snapshot().items()):
+        if isinstance(value, float) and not value.is_integer():
+            lines.append(f"{name}: {value:.3f}")
+        else:
+            lines.append(f"{name}: {int(value)}")
+    return "\n".join(lines) if lines else "No metrics recorded yet."
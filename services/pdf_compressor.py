@@ -0,0 +1,99 @@
+"""
+PDF Compressor Service
+Shrinks a PDF to a target size in progressively lossier stages:
+  1. lossless: object garbage collection, stream deflate, font subsetting
+  2. images re-encoded as JPEG and downsampled to 150, 110, 80 and 60 DPI
+Stops at the first stage that fits. Used by compress_books.py at ingestion
+time and by the bot (through the PDF worker pool) when a generated PDF is
+over Telegram's upload limit.
+"""
+import time
+from pathlib import Path
+from typing import Any, Dict, Sequence
+import sys
+sys.path.append('..')
+from services.pdf_processor import save_output
+
+import fitz  # PyMuPDF
+
+# Telegram's bot upload limit is 50MB; stay below it
+TELEGRAM_TARGET_BYTES = 45 * 1024 * 1024
+
+# (DPI, JPEG quality) for the lossy stages, mildest first
+IMAGE_STAGES = ((150, 80), (110, 75), (80, 70), (60, 60))
+
+
+def _downsample_images(doc: "fitz.Document", dpi: int, quality: int) -> None:
+    """Re-encode images shown above `dpi` as JPEG at `dpi`."""
+    if hasattr(doc, "rewrite_images"):
+        # PyMuPDF >= 1.24.11 does this natively
+        doc.rewrite_images(dpi_threshold=dpi + 10, dpi_target=dpi, quality=quality)
+        return
+
+    done = set()
+    for page in doc:
+        for image in page.get_images(full=True):
+            xref = image[0]
+            if xref in done:
+                continue
+            done.add(xref)
+            try:
+                rects = page.get_image_rects(xref)
+                if not rects:
+                    continue
+                pix = fitz.Pixmap(doc, xref)
+                shown_inches = max(rects[0].width, 1) / 72
+                scale = dpi / (pix.width / shown_inches)
+                if scale >= 1:
+                    continue
+                if pix.alpha or pix.colorspace is None or pix.colorspace.n not in (1, 3):
+                    pix = fitz.Pixmap(fitz.csRGB, pix, 0)
+                pix = fitz.Pixmap(pix, max(1, int(pix.width * scale)), max(1, int(pix.height * scale)), None)
+                page.replace_image(xref, stream=pix.tobytes("jpeg", jpg_quality=quality))
+            except Exception as e:
+                print(f"Skipping image {xref}: {e}")
+
+
+def _open(input_pdf) -> "fitz.Document":
+    if isinstance(input_pdf, (bytes, bytearray)):
+        return fitz.open(stream=input_pdf, filetype="pdf")
+    return fitz.open(input_pdf)
+
+
+def compress_pdf(input_pdf, output_path, target_bytes: int = TELEGRAM_TARGET_BYTES,
+                 image_stages: Sequence = IMAGE_STAGES) -> Dict[str, Any]:
+    """
+    Compress input_pdf (a path or PDF bytes) into output_path, trying stages
+    until the file fits target_bytes. Returns a summary with input/output
+    sizes, the ratio, the stage used, the elapsed time and whether the
+    target was met. If nothing fits, output_path holds the smallest result.
+    """
+    started = time.perf_counter()
+    output_path = Path(output_path)
+    if isinstance(input_pdf, (bytes, bytearray)):
+        input_bytes = len(input_pdf)
+    else:
+        input_bytes = Path(input_pdf).stat().st_size
+
+    with _open(input_pdf) as doc:
+        save_output(doc, output_path)
+    stage = "lossless"
+
+    if output_path.stat().st_size > target_bytes:
+        for dpi, quality in image_stages:
+            with _open(input_pdf) as doc:
+                _downsample_images(doc, dpi, quality)
+                save_output(doc, output_path)
+            stage = f"images@{dpi}dpi"
+            if output_path.stat().st_size <= target_bytes:
+                break
+
+    output_bytes = output_path.stat().st_size
+    return {
+        "input_bytes": input_bytes,
+        "output_bytes": output_bytes,
+        "ratio": output_bytes / input_bytes if input_bytes else 1.0,
+        "stage": stage,
+        "seconds": time.perf_counter() - started,
+        "fits": output_bytes <= target_bytes,
+    }
@@ -5,12 +5,19 @@ Includes OCR support for scanned PDFs using Tesseract.
 """
 import fitz  # PyMuPDF
 from pathlib import Path
-from typing import Optional, List, Tuple
+from typing import Dict, Optional, List, Tuple
 import re
 import sys
 import io
 sys.path.append('..')
 from config import OUTPUT_DIR
+from services.document_pool import document_pool
+
+# Save options for generated PDFs: drop unused and duplicate objects,
+# compress every stream and pack small objects into object streams
+OUTPUT_SAVE_OPTIONS = dict(
+    garbage=4, clean=True, deflate=True, deflate_images=True, deflate_fonts=True, use_objstms=1
+)
 
 # OCR imports (optional - graceful fallback if not installed)
 try:
@@ -23,6 +30,21 @@ except ImportError:
     print("OCR libraries not available. Install with: pip install pdf2image pytesseract")
 
 
+def subset_fonts(doc: "fitz.Document") -> None:
+    """Reduce embedded fonts to the glyphs the document uses, where supported."""
+    try:
+        doc.subset_fonts()
+    except Exception as e:
+        # Older PyMuPDF needs fontTools; unusual fonts may not be subsettable
+        print(f"Font subsetting skipped: {e}")
+
+
+def save_output(doc: "fitz.Document", output_path) -> None:
+    """Save a generated PDF as small as it can be made losslessly."""
+    subset_fonts(doc)
+    doc.save(str(output_path), **OUTPUT_SAVE_OPTIONS)
+
+
 class PDFProcessor:
     """Processes PDF books - extracts text, themes, and generates new PDFs."""
     
@@ -210,7 +232,7 @@ class PDFProcessor:
             )
             
             output_path = OUTPUT_DIR / output_filename
-            new_doc.save(output_path)
+            save_output(new_doc, output_path)
             new_doc.close()
             
             return output_path
@@ -240,7 +262,7 @@ class PDFProcessor:
                     doc.close()
             
             output_path = OUTPUT_DIR / output_filename
-            merged_doc.save(output_path)
+            save_output(merged_doc, output_path)
             merged_doc.close()
             
             return output_path
@@ -249,6 +271,136 @@ class PDFProcessor:
             return None
 
 
+def extract_theme_pages(pdf_path: str, start_page: int, end_page: int, output_path: Path) -> bool:
+    """Copy a page range (0-indexed, inclusive) of a book into output_path."""
+    try:
+        doc = document_pool.get(pdf_path)
+        with fitz.open() as new_doc:
+            new_doc.insert_pdf(doc, from_page=start_page, to_page=end_page)
+            save_output(new_doc, output_path)
+        return True
+    except Exception as e:
+        print(f"Error extracting theme PDF: {e}")
+        return False
+
+
+def theme_pages(theme: Dict, lang: str) -> Tuple[int, int]:
+    """
+    0-indexed page range of a theme in one language's edition of its book.
+    start_page/end_page are for the edition the themes were extracted from;
+    start_page_ru/end_page_ru (database/map_theme_pages.py) map them to the
+    Russian edition where its pagination differs.
+    """
+    start = theme.get(f'start_page_{lang}')
+    if start is None:
+        return theme.get('start_page') or 0, theme.get('end_page') or 0
+    end = theme.get(f'end_page_{lang}')
+    return start, start if end is None else end
+
+
+def extract_theme_bytes(pdf_path: str, start_page: int, end_page: int) -> Optional[bytes]:
+    """A page range (0-indexed, inclusive) of a book as optimized PDF bytes."""
+    return extract_ranges_bytes(pdf_path, [(start_page, end_page)])
+
+
+def merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Sort page ranges and join overlapping or adjacent ones."""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def extract_ranges_bytes(pdf_path: str, ranges: List[Tuple[int, int]]) -> Optional[bytes]:
+    """Several page ranges of one book, in page order, as one optimized PDF."""
+    try:
+        doc = document_pool.get(pdf_path)
+        with fitz.open() as new_doc:
+            for start_page, end_page in merge_ranges(ranges):
+                new_doc.insert_pdf(doc, from_page=start_page, to_page=end_page)
+            subset_fonts(new_doc)
+            return new_doc.tobytes(**OUTPUT_SAVE_OPTIONS)
+    except Exception as e:
+        print(f"Error extracting theme PDF: {e}")
+        return None
+
+
+def render_page_previews(pdf_path: str, pages: List[int], dpi: int = 60, quality: int = 70) -> List[bytes]:
+    """Low-resolution JPEG renderings of the given pages (0-indexed)."""
+    doc = document_pool.get(pdf_path)
+    previews = []
+    for number in pages:
+        pix = doc[number].get_pixmap(dpi=dpi)
+        previews.append(pix.tobytes("jpeg", jpg_quality=quality))
+    return previews
+
+
+def theme_size_report(pdf_path: str, start_page: int, end_page: int) -> dict:
+    """Bytes of a page range saved with default options vs. save_output()."""
+    doc = document_pool.get(pdf_path)
+    with fitz.open() as new_doc:
+        new_doc.insert_pdf(doc, from_page=start_page, to_page=end_page)
+        plain_bytes = len(new_doc.tobytes())
+        subset_fonts(new_doc)
+        output_bytes = len(new_doc.tobytes(**OUTPUT_SAVE_OPTIONS))
+    return {
+        "pages": end_page - start_page + 1,
+        "plain_bytes": plain_bytes,
+        "output_bytes": output_bytes,
+        "ratio": output_bytes / plain_bytes if plain_bytes else 1.0,
+    }
+
+
+def _page_numbers(doc: "fitz.Document", start_page: int, end_page: int) -> List[int]:
+    return list(range(max(start_page, 0), min(end_page, len(doc) - 1) + 1))
+
+
+def build_bilingual_doc(
+    uz_pdf_path: str,
+    ru_pdf_path: str,
+    uz_start: int,
+    uz_end: int,
+    ru_start: int,
+    ru_end: int,
+    side_by_side: bool = False
+) -> "fitz.Document":
+    """
+    New document with a theme's pages from both editions. Sequential: all
+    Uzbek pages, then all Russian pages. Side by side: each output page
+    shows the i-th Uzbek page on the left and the i-th Russian page on the
+    right (the shorter edition leaves its half blank at the end).
+    """
+    merged_doc = fitz.open()
+    uz_doc = document_pool.get(uz_pdf_path) if Path(uz_pdf_path).exists() else None
+    ru_doc = document_pool.get(ru_pdf_path) if Path(ru_pdf_path).exists() else None
+    
+    if not side_by_side:
+        if uz_doc:
+            merged_doc.insert_pdf(uz_doc, from_page=uz_start, to_page=uz_end)
+        if ru_doc:
+            merged_doc.insert_pdf(ru_doc, from_page=ru_start, to_page=ru_end)
+        return merged_doc
+    
+    uz_pages = _page_numbers(uz_doc, uz_start, uz_end) if uz_doc else []
+    ru_pages = _page_numbers(ru_doc, ru_start, ru_end) if ru_doc else []
+    for i in range(max(len(uz_pages), len(ru_pages))):
+        left = uz_doc[uz_pages[i]].rect if i < len(uz_pages) else None
+        right = ru_doc[ru_pages[i]].rect if i < len(ru_pages) else None
+        left_width = (left or right).width
+        right_width = (right or left).width
+        height = max(r.height for r in (left, right) if r)
+        page = merged_doc.new_page(width=left_width + right_width, height=height)
+        # Pages are placed as form XObjects: text and vector graphics stay sharp
+        if left:
+            page.show_pdf_page(fitz.Rect(0, 0, left_width, height), uz_doc, uz_pages[i])
+        if right:
+            page.show_pdf_page(fitz.Rect(left_width, 0, left_width + right_width, height), ru_doc, ru_pages[i])
+    return merged_doc
+
+
 def create_bilingual_theme_pdf(
     uz_pdf_path: str,
     ru_pdf_path: str,
@@ -256,30 +408,20 @@ def create_bilingual_theme_pdf(
     uz_end: int,
     ru_start: int,
     ru_end: int,
-    output_filename: str
+    output_filename: str,
+    side_by_side: bool = False
 ) -> Optional[Path]:
     """
     Create a bilingual PDF with theme content in both Uzbek and Russian.
     
-    The output will have Uzbek pages first, then Russian pages.
+    The output will have Uzbek pages first, then Russian pages, or the two
+    editions' pages next to each other if side_by_side is set.
     """
     try:
-        merged_doc = fitz.open()
-        
-        # Add Uzbek pages
-        if Path(uz_pdf_path).exists():
-            uz_doc = fitz.open(uz_pdf_path)
-            merged_doc.insert_pdf(uz_doc, from_page=uz_start, to_page=uz_end)
-            uz_doc.close()
-        
-        # Add Russian pages
-        if Path(ru_pdf_path).exists():
-            ru_doc = fitz.open(ru_pdf_path)
-            merged_doc.insert_pdf(ru_doc, from_page=ru_start, to_page=ru_end)
-            ru_doc.close()
+        merged_doc = build_bilingual_doc(uz_pdf_path, ru_pdf_path, uz_start, uz_end, ru_start, ru_end, side_by_side)
         
         output_path = OUTPUT_DIR / output_filename
-        merged_doc.save(output_path)
+        save_output(merged_doc, output_path)
         merged_doc.close()
         
         return output_path
@@ -288,6 +430,25 @@ def create_bilingual_theme_pdf(
         return None
 
 
+def bilingual_theme_bytes(
+    uz_pdf_path: str,
+    ru_pdf_path: str,
+    uz_start: int,
+    uz_end: int,
+    ru_start: int,
+    ru_end: int,
+    side_by_side: bool = True
+) -> Optional[bytes]:
+    """Same as create_bilingual_theme_pdf, returned as optimized PDF bytes."""
+    try:
+        with build_bilingual_doc(uz_pdf_path, ru_pdf_path, uz_start, uz_end, ru_start, ru_end, side_by_side) as merged_doc:
+            subset_fonts(merged_doc)
+            return merged_doc.tobytes(**OUTPUT_SAVE_OPTIONS)
+    except Exception as e:
+        print(f"Error creating bilingual PDF: {e}")
+        return None
+
+
 if __name__ == "__main__":
     # Test with a sample PDF
     import sys
@@ -0,0 +1,134 @@
+"""
+PDF Splitter Service
+Cuts a book that is over Telegram's upload limit into page-range parts that
+each fit PDF_PART_MAX_BYTES. Part boundaries come from cumulative per-page
+size estimates (content streams plus the images and fonts a page uses,
+shared resources counted once per part), so a book is planned with one
+pass over its objects instead of trial saves. A part that still comes out
+too large is halved; a single page that is still too large raises
+PageTooLargeError before any part is sent, so callers can fall back to a
+link. Parts are cached on disk by (source hash, page range).
+"""
+import asyncio
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+import sys
+sys.path.append('..')
+from config import BOOK_PARTS_DIR
+from services.disk_cache import DiskCache, hash_key
+from services.document_pool import document_pool
+from services.pdf_worker import pdf_workers
+
+# Largest part sent as one document
+PDF_PART_MAX_BYTES = int(os.getenv("PDF_PART_MAX_BYTES", str(45 * 1024 * 1024)))
+
+# Disk budget for cached parts (default 2 GB)
+BOOK_PARTS_CACHE_MAX_BYTES = int(os.getenv("BOOK_PARTS_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Plan parts to this fraction of the budget: estimates ignore per-object overhead
+PLAN_HEADROOM = 0.9
+
+# Estimated bytes of page objects and cross-references per page
+PAGE_OVERHEAD_BYTES = 2048
+
+class PageTooLargeError(Exception):
+    """A single page of the book is over the part size limit."""
+
+
+book_parts_cache = DiskCache("book_parts_cache", BOOK_PARTS_DIR, BOOK_PARTS_CACHE_MAX_BYTES, suffix=".pdf")
+
+
+def _stream_size(doc, xref: int, sizes: Dict[int, int]) -> int:
+    if xref not in sizes:
+        try:
+            sizes[xref] = len(doc.xref_stream_raw(xref) or b"")
+        except Exception:
+            sizes[xref] = 0
+    return sizes[xref]
+
+
+def _page_cost(doc, page, sizes: Dict[int, int]) -> Tuple[int, Dict[int, int]]:
+    """(bytes owned by the page, {resource xref: bytes} it shares with others)."""
+    own = PAGE_OVERHEAD_BYTES + sum(_stream_size(doc, xref, sizes) for xref in page.get_contents())
+    resources = {}
+    for image in page.get_images(full=True):
+        for xref in (image[0], image[1]):  # image and its soft mask
+            if xref:
+                resources[xref] = _stream_size(doc, xref, sizes)
+    for font in page.get_fonts(full=True):
+        xref = font[0]
+        if xref and xref not in resources:
+            if xref not in sizes:
+                try:
+                    sizes[xref] = len(doc.extract_font(xref)[3] or b"")
+                except Exception:
+                    sizes[xref] = 0
+            resources[xref] = sizes[xref]
+    return own, resources
+
+
+def plan_parts(pdf_path: str, max_bytes: int = PDF_PART_MAX_BYTES) -> List[Tuple[int, int]]:
+    """Page ranges (0-indexed, inclusive) whose estimated size fits max_bytes."""
+    budget = max_bytes * PLAN_HEADROOM
+    parts = []
+    doc = document_pool.get(pdf_path)
+    sizes: Dict[int, int] = {}
+    start, used, seen = 0, 0, set()
+    for number, page in enumerate(doc):
+        own, resources = _page_cost(doc, page, sizes)
+        cost = own + sum(size for xref, size in resources.items() if xref not in seen)
+        if number > start and used + cost > budget:
+            parts.append((start, number - 1))
+            start, used, seen = number, 0, set()
+            cost = own + sum(resources.values())
+        used += cost
+        seen.update(resources)
+    if len(doc):
+        parts.append((start, len(doc) - 1))
+    return parts
+
+
+def part_key(source: str, start_page: int, end_page: int) -> str:
+    return hash_key(f"{source}:part:{start_page}:{end_page}")
+
+
+async def _build_part(pdf_path: str, source: str, start_page: int, end_page: int,
+                      max_bytes: int) -> List[Tuple[int, int, Path]]:
+    key = part_key(source, start_page, end_page)
+    path = await asyncio.to_thread(book_parts_cache.get, key)
+    if path and path.stat().st_size <= max_bytes:
+        return [(start_page, end_page, path)]
+
+    tmp_path = book_parts_cache.temp_path(key)
+    try:
+        if not await pdf_workers.extract(pdf_path, start_page, end_page, tmp_path):
+            raise IOError(f"Could not extract pages {start_page}-{end_page}")
+        size = tmp_path.stat().st_size
+        if size > max_bytes:
+            if end_page == start_page:
+                raise PageTooLargeError(f"Page {start_page + 1} alone is {size} bytes (limit {max_bytes})")
+            # Underestimated: halve the range
+            middle = (start_page + end_page) // 2
+            return (await _build_part(pdf_path, source, start_page, middle, max_bytes)
+                    + await _build_part(pdf_path, source, middle + 1, end_page, max_bytes))
+        path = await asyncio.to_thread(
+            book_parts_cache.commit, key, tmp_path, source=source, start=start_page, end=end_page
+        )
+        return [(start_page, end_page, path)]
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+async def get_book_parts(pdf_path: str, source: str,
+                         max_bytes: int = PDF_PART_MAX_BYTES) -> List[Tuple[int, int, Path]]:
+    """
+    Cached parts of a book as (start page, end page, path), in page order.
+    Raises PageTooLargeError if some page cannot fit max_bytes on its own;
+    every part is built before this returns, so nothing has been sent yet.
+    """
+    parts = []
+    for start_page, end_page in await pdf_workers.run(plan_parts, str(pdf_path), max_bytes):
+        parts.extend(await _build_part(pdf_path, source, start_page, end_page, max_bytes))
+    return parts
@@ -0,0 +1,162 @@
+"""
+PDF Worker Pool
+Runs PyMuPDF work (page extraction, bundles, bilingual PDFs, compression)
+in a pool of worker processes behind an async API, so opening and copying
+large books never blocks the bot's event loop. Workers are started at bot
+startup and kept warm, each with its own pool of open source documents
+(services/document_pool.py); a crashed pool is replaced transparently.
+Each job returns the worker's document pool counters with its result, so
+they are reported in this process's metrics.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import List, Optional, Tuple
+import sys
+sys.path.append('..')
+from services import metrics
+from services import pdf_processor
+from services import pdf_compressor
+
+# Number of worker processes
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+
+
+def _init_worker() -> None:
+    """Worker initializer: import PyMuPDF and the document pool once per process."""
+    import fitz  # noqa: F401
+    from services import document_pool  # noqa: F401
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _run_job(func, *args):
+    """
+    Run func in the worker; returns its result and the document pool
+    counters since the previous job (a failed job's counts go with the next).
+    """
+    from services.document_pool import document_pool
+
+    result = func(*args)
+    return result, document_pool.take_stats()
+
+
+class PDFWorkerPool:
+    """Process pool with queue-depth, latency and restart metrics."""
+
+    def __init__(self, workers: int = PDF_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        metrics.register_gauge("pdf_worker_queue_depth", lambda: self._pending)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: workers must not inherit the bot's threads and sockets
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+                metrics.inc("pdf_worker_restarts_total")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    async def start(self) -> None:
+        """Spawn the workers now instead of on the first request."""
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(executor, _ping) for _ in range(self.workers)])
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func, *args):
+        """Run a picklable function in a worker; retried once if the pool died."""
+        loop = asyncio.get_running_loop()
+        self._pending += 1
+        start = time.perf_counter()
+        try:
+            for attempt in range(2):
+                executor = self._get_executor()
+                try:
+                    result, pool_stats = await loop.run_in_executor(executor, _run_job, func, *args)
+                    for name, count in pool_stats.items():
+                        if count:
+                            metrics.inc(f"doc_pool_{name}_total", count)
+                    return result
+                except BrokenProcessPool:
+                    self._restart(executor)
+                    if attempt:
+                        raise
+        finally:
+            self._pending -= 1
+            metrics.observe("pdf_worker_task_seconds", time.perf_counter() - start)
+
+    async def extract(self, pdf_path: str, start_page: int, end_page: int, output_path: Path) -> bool:
+        """Copy a page range of a book into output_path."""
+        ok = await self.run(pdf_processor.extract_theme_pages, str(pdf_path), start_page, end_page, output_path)
+        if ok:
+            metrics.observe("theme_pdf_output_bytes", Path(output_path).stat().st_size)
+        return ok
+
+    async def extract_bytes(self, pdf_path: str, start_page: int, end_page: int) -> Optional[bytes]:
+        """A page range of a book as PDF bytes, ready to upload without touching disk."""
+        data = await self.run(pdf_processor.extract_theme_bytes, str(pdf_path), start_page, end_page)
+        if data:
+            metrics.observe("theme_pdf_output_bytes", len(data))
+        return data
+
+    async def extract_ranges_bytes(self, pdf_path: str, ranges: List[Tuple[int, int]]) -> Optional[bytes]:
+        """Several page ranges of a book as one PDF, built from a single open document."""
+        data = await self.run(pdf_processor.extract_ranges_bytes, str(pdf_path), ranges)
+        if data:
+            metrics.observe("bundle_pdf_output_bytes", len(data))
+        return data
+
+    async def previews(self, pdf_path: str, pages: List[int], dpi: int, quality: int) -> List[bytes]:
+        """JPEG thumbnails of book pages."""
+        return await self.run(pdf_processor.render_page_previews, str(pdf_path), pages, dpi, quality)
+
+    async def compress(self, input_pdf, output_path: Path,
+                       target_bytes: int = pdf_compressor.TELEGRAM_TARGET_BYTES) -> dict:
+        """Compress a PDF (path or bytes) toward target_bytes; records timing and size-ratio metrics."""
+        if isinstance(input_pdf, Path):
+            input_pdf = str(input_pdf)
+        result = await self.run(pdf_compressor.compress_pdf, input_pdf, str(output_path), target_bytes)
+        metrics.observe("pdf_compress_seconds", result["seconds"])
+        metrics.observe("pdf_compress_ratio", result["ratio"])
+        metrics.inc(f"pdf_compress_{'fit' if result['fits'] else 'too_large'}_total")
+        return result
+
+    async def bilingual_bytes(self, uz_pdf_path: str, ru_pdf_path: str,
+                              uz_range: Tuple[int, int], ru_range: Tuple[int, int]) -> Optional[bytes]:
+        """Uzbek and Russian pages of a theme side by side, as PDF bytes."""
+        data = await self.run(
+            pdf_processor.bilingual_theme_bytes,
+            str(uz_pdf_path), str(ru_pdf_path), uz_range[0], uz_range[1], ru_range[0], ru_range[1]
+        )
+        if data:
+            metrics.observe("bilingual_pdf_output_bytes", len(data))
+        return data
+
+
+# Singleton instance
+pdf_workers = PDFWorkerPool()
@@ -0,0 +1,32 @@
+"""
+Single-Flight Service
+Coalesces concurrent calls for the same key: the first caller starts the
+work, later callers await the same in-flight task and share its result
+(or its exception). Nothing is cached once the task finishes.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import sys
+sys.path.append('..')
+from services import metrics
+
+
+class SingleFlight:
+    """Per-key deduplication of in-flight async work."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        metrics.register_gauge(f"{name}_inflight", lambda: len(self._inflight))
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run func() once per key at a time and return its result to every caller."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            metrics.inc(f"{self.name}_coalesced_total")
+        # Shield: one caller being cancelled must not cancel the shared work
+        return await asyncio.shield(task)
@@ -0,0 +1,131 @@
+"""
+Theme PDF Cache Service
+Generated theme PDFs stored under a key derived from (source hash, start
+page, end page), so identical requests reuse one file and different books
+never overwrite each other. Misses are built in memory by the PDF worker
+pool and handed to the caller as bytes, then written to the cache off the
+request path; the cache is bounded by THEME_PDF_CACHE_MAX_BYTES. Theme
+PDFs over Telegram's upload limit get a compressed variant cached next to
+them; multi-theme bundles are cached by their sorted page ranges and
+bilingual PDFs by both editions' sources and ranges.
+"""
+import asyncio
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+import sys
+sys.path.append('..')
+from config import THEME_PDF_CACHE_DIR
+from services.disk_cache import DiskCache, hash_key
+from services.pdf_processor import merge_ranges
+from services.pdf_worker import pdf_workers
+
+# Disk budget for generated theme PDFs (default 1 GB)
+THEME_PDF_CACHE_MAX_BYTES = int(os.getenv("THEME_PDF_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+theme_pdf_cache = DiskCache("theme_pdf_cache", THEME_PDF_CACHE_DIR, THEME_PDF_CACHE_MAX_BYTES, suffix=".pdf")
+
+
+def theme_pdf_key(source: str, start_page: int, end_page: int) -> str:
+    return hash_key(f"{source}:{start_page}:{end_page}")
+
+
+def _store(key: str, data: bytes, **meta) -> None:
+    try:
+        theme_pdf_cache.store(key, data, **meta)
+    except Exception as e:
+        print(f"Error caching theme PDF {key}: {e}")
+
+
+def _read(path: Path) -> Optional[bytes]:
+    try:
+        return path.read_bytes()
+    except OSError:
+        # Evicted between lookup and read
+        return None
+
+
+async def get_theme_pdf(pdf_path: str, source: str, start_page: int, end_page: int) -> Optional[bytes]:
+    """
+    Theme PDF bytes for a page range of a book. A miss is built in memory
+    by a PDF worker and returned at once; it is written to the cache in
+    the background.
+    """
+    key = theme_pdf_key(source, start_page, end_page)
+    path = await asyncio.to_thread(theme_pdf_cache.get, key)
+    data = await asyncio.to_thread(_read, path) if path else None
+    if data:
+        return data
+
+    data = await pdf_workers.extract_bytes(pdf_path, start_page, end_page)
+    if data:
+        asyncio.get_running_loop().run_in_executor(
+            None, lambda: _store(key, data, source=source, start=start_page, end=end_page)
+        )
+    return data
+
+
+def bundle_pdf_key(source: str, ranges: List[Tuple[int, int]]) -> str:
+    return hash_key(f"{source}:bundle:" + ",".join(f"{start}-{end}" for start, end in merge_ranges(ranges)))
+
+
+async def get_bundle_pdf(pdf_path: str, source: str, ranges: List[Tuple[int, int]]) -> Optional[bytes]:
+    """PDF bytes of several page ranges of one book, cached by the sorted range set."""
+    key = bundle_pdf_key(source, ranges)
+    path = await asyncio.to_thread(theme_pdf_cache.get, key)
+    data = await asyncio.to_thread(_read, path) if path else None
+    if data:
+        return data
+
+    data = await pdf_workers.extract_ranges_bytes(pdf_path, merge_ranges(ranges))
+    if data:
+        asyncio.get_running_loop().run_in_executor(
+            None, lambda: _store(key, data, source=source, ranges=merge_ranges(ranges))
+        )
+    return data
+
+
+def bilingual_pdf_key(uz_source: str, uz_range: Tuple[int, int], ru_source: str, ru_range: Tuple[int, int]) -> str:
+    return hash_key(f"{uz_source}:{uz_range[0]}:{uz_range[1]}|{ru_source}:{ru_range[0]}:{ru_range[1]}:bilingual")
+
+
+async def get_bilingual_pdf(uz_pdf_path: str, uz_source: str, uz_range: Tuple[int, int],
+                            ru_pdf_path: str, ru_source: str, ru_range: Tuple[int, int]) -> Optional[bytes]:
+    """Side-by-side Uzbek/Russian theme PDF bytes, cached by both sources and page ranges."""
+    key = bilingual_pdf_key(uz_source, uz_range, ru_source, ru_range)
+    path = await asyncio.to_thread(theme_pdf_cache.get, key)
+    data = await asyncio.to_thread(_read, path) if path else None
+    if data:
+        return data
+
+    data = await pdf_workers.bilingual_bytes(uz_pdf_path, ru_pdf_path, uz_range, ru_range)
+    if data:
+        asyncio.get_running_loop().run_in_executor(
+            None, lambda: _store(key, data, source=f"{uz_source}|{ru_source}", uz=uz_range, ru=ru_range)
+        )
+    return data
+
+
+async def get_compressed_theme_pdf(theme_pdf: bytes, source: str, start_page: int, end_page: int) -> Optional[bytes]:
+    """Cached compressed copy of a theme PDF, or None if it cannot be made small enough."""
+    key = theme_pdf_key(f"{source}:compressed", start_page, end_page)
+    path = await asyncio.to_thread(theme_pdf_cache.get, key)
+    data = await asyncio.to_thread(_read, path) if path else None
+    if data:
+        return data
+
+    tmp_path = theme_pdf_cache.temp_path(key)
+    try:
+        result = await pdf_workers.compress(theme_pdf, tmp_path)
+        print(f"Compressed theme PDF {start_page}-{end_page}: {result['input_bytes']} -> "
+              f"{result['output_bytes']} bytes ({result['stage']}, {result['seconds']:.1f}s)")
+        if not result["fits"]:
+            return None
+        path = await asyncio.to_thread(
+            theme_pdf_cache.commit, key, tmp_path, source=source, start=start_page, end=end_page,
+            compressed=result["stage"]
+        )
+        return await asyncio.to_thread(_read, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
@@ -0,0 +1,67 @@
+"""
+Theme Preview Service
+JPEG thumbnails of the first pages of a theme, so users can check a theme
+before downloading its PDF. Pages are rendered at low DPI by the PDF worker
+pool and cached on disk per (source hash, page); the Telegram photo
+file_ids are cached separately (database/file_id_cache.py).
+"""
+import asyncio
+import os
+from typing import List
+import sys
+sys.path.append('..')
+from config import THEME_PREVIEW_DIR
+from services.disk_cache import DiskCache, hash_key
+from services.pdf_worker import pdf_workers
+
+# Pages shown per preview, render resolution and JPEG quality
+PREVIEW_PAGES = int(os.getenv("PREVIEW_PAGES", "2"))
+PREVIEW_DPI = int(os.getenv("PREVIEW_DPI", "60"))
+PREVIEW_QUALITY = 70
+
+# Disk budget for previews (default 200 MB)
+THEME_PREVIEW_CACHE_MAX_BYTES = int(os.getenv("THEME_PREVIEW_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+preview_cache = DiskCache("theme_preview_cache", THEME_PREVIEW_DIR, THEME_PREVIEW_CACHE_MAX_BYTES, suffix=".jpg")
+
+
+def preview_pages(start_page: int, end_page: int) -> List[int]:
+    """Pages (0-indexed) shown in the preview of a theme."""
+    return list(range(start_page, min(end_page, start_page + PREVIEW_PAGES - 1) + 1))
+
+
+def _preview_key(source: str, page: int) -> str:
+    return hash_key(f"{source}:preview:{page}:{PREVIEW_DPI}")
+
+
+def _load(keys: List[str]) -> List:
+    images = []
+    for key in keys:
+        path = preview_cache.get(key)
+        try:
+            images.append(path.read_bytes() if path else None)
+        except OSError:
+            images.append(None)
+    return images
+
+
+def _store(keys: List[str], images: List[bytes], source: str) -> None:
+    for key, image in zip(keys, images):
+        try:
+            preview_cache.store(key, image, source=source)
+        except Exception as e:
+            print(f"Error caching preview {key}: {e}")
+
+
+async def get_theme_previews(pdf_path: str, source: str, start_page: int, end_page: int) -> List[bytes]:
+    """JPEG previews of a theme's first pages; missing pages are rendered in one worker call."""
+    pages = preview_pages(start_page, end_page)
+    keys = [_preview_key(source, page) for page in pages]
+    images = await asyncio.to_thread(_load, keys)
+    missing = [i for i, image in enumerate(images) if image is None]
+    if missing:
+        rendered = await pdf_workers.previews(pdf_path, [pages[i] for i in missing], PREVIEW_DPI, PREVIEW_QUALITY)
+        for i, image in zip(missing, rendered):
+            images[i] = image
+        await asyncio.to_thread(_store, [keys[i] for i in missing], rendered, source)
+    return images
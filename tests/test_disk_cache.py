@@ -0,0 +1,95 @@
+import os
+import time
+
+import pytest
+
+from services import disk_cache
+from services.disk_cache import DiskCache, hash_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiskCache("test_cache", tmp_path, max_bytes=100, suffix=".pdf")
+
+
+def test_hash_key_is_stable_and_short():
+    assert hash_key("https://x/a.pdf") == hash_key("https://x/a.pdf")
+    assert hash_key("https://x/a.pdf") != hash_key("https://x/b.pdf")
+    assert len(hash_key("anything")) == 32
+
+
+def test_store_then_get_returns_the_data_and_metadata(cache):
+    path = cache.store("k", b"hello", url="u")
+    assert cache.get("k") == path
+    assert path.read_bytes() == b"hello"
+    meta = cache.read_meta("k")
+    assert meta["size"] == 5 and meta["url"] == "u"
+
+
+def test_missing_entry_is_a_miss(cache):
+    assert cache.get("absent") is None
+
+
+def test_commit_rejects_an_incomplete_download(cache):
+    tmp = cache.temp_path("k")
+    tmp.write_bytes(b"abc")
+    with pytest.raises(IOError):
+        cache.commit("k", tmp, expected_size=10)
+    assert not tmp.exists()
+    assert cache.get("k") is None
+
+
+def test_entry_without_sidecar_is_never_served(cache, tmp_path):
+    (tmp_path / "k.pdf").write_bytes(b"partial")
+    assert cache.get("k") is None
+
+
+def test_truncated_entry_is_removed(cache):
+    path = cache.store("k", b"0123456789")
+    path.write_bytes(b"01234")
+    assert cache.get("k") is None
+    assert not path.exists()
+    assert cache.read_meta("k") is None
+
+
+def test_least_recently_used_entries_are_evicted_over_budget(cache):
+    old = cache.store("old", b"x" * 40)
+    cache.store("recent", b"x" * 40)
+    now = time.time()
+    os.utime(old, (now - 100, now - 100))
+    cache.get("recent")
+
+    cache.store("new", b"x" * 40)
+    assert cache.get("old") is None
+    assert cache.get("recent") is not None
+    assert cache.get("new") is not None
+    assert cache.total_bytes() <= 100
+
+
+def test_reading_an_entry_protects_it_from_eviction(cache):
+    first = cache.store("first", b"x" * 40)
+    second = cache.store("second", b"x" * 40)
+    now = time.time()
+    os.utime(first, (now - 200, now - 200))
+    os.utime(second, (now - 100, now - 100))
+    cache.get("first")
+
+    cache.store("third", b"x" * 40)
+    assert cache.get("first") is not None
+    assert cache.get("second") is None
+
+
+def test_entry_larger_than_the_budget_is_kept_while_it_is_new(cache):
+    cache.store("big", b"x" * 150)
+    assert cache.get("big") is not None
+
+
+def test_cleanup_removes_only_stale_leftovers(tmp_path):
+    stale = time.time() - disk_cache.STALE_FILE_SECONDS - 10
+    for name in ("old.abc.part", "orphan.json", "nometa.pdf"):
+        (tmp_path / name).write_bytes(b"x")
+        os.utime(tmp_path / name, (stale, stale))
+    (tmp_path / "inflight.abc.part").write_bytes(b"x")
+
+    DiskCache("test_cleanup", tmp_path, max_bytes=100, suffix=".pdf")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["inflight.abc.part"]
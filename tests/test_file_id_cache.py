@@ -0,0 +1,131 @@
+import sys
+import types
+
+import pytest
+
+from database import file_id_cache as fic
+from database.file_id_cache import FileIdCache
+
+
+class FakeTable:
+    """Minimal stand-in for the telegram_file_cache query builder."""
+
+    def __init__(self, rows, requests):
+        self.rows = rows
+        self.requests = requests
+        self.window = None
+
+    def select(self, *_):
+        return self
+
+    def order(self, *_):
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end)
+        self.requests.append(self.window)
+        return self
+
+    def execute(self):
+        start, end = self.window
+        return types.SimpleNamespace(data=self.rows[start:end + 1])
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    """A fake database.supabase_client exposing `rows` of telegram_file_cache."""
+    state = types.SimpleNamespace(configured=True, rows=[], requests=[])
+    module = types.ModuleType("database.supabase_client")
+    module.is_supabase_configured = lambda: state.configured
+    module.get_supabase = lambda: types.SimpleNamespace(
+        table=lambda name: FakeTable(state.rows, state.requests)
+    )
+    monkeypatch.setitem(sys.modules, "database.supabase_client", module)
+    return state
+
+
+def test_keys_fit_the_cache_key_column():
+    ranges = [(i * 10, i * 10 + 9) for i in range(90)]
+    keys = [
+        fic.book_key(123456, "uz"),
+        fic.theme_key(123456, "ru", 1000, 1200),
+        fic.bundle_key(123456, "uz", ranges),
+        fic.bilingual_key(123456, (1000, 1200), (1010, 1215)),
+        fic.preview_key(123456, "uz", 1000),
+        fic.book_part_key(123456, "uz", 12, 12, 1000, 1200),
+    ]
+    assert all(len(key) <= 100 for key in keys)
+
+
+def test_bundle_key_depends_on_the_ranges():
+    assert fic.bundle_key(1, "uz", [(0, 4)]) == fic.bundle_key(1, "uz", [(0, 4)])
+    assert fic.bundle_key(1, "uz", [(0, 4)]) != fic.bundle_key(1, "uz", [(0, 5)])
+
+
+def test_load_pages_past_the_postgrest_row_limit(supabase):
+    supabase.rows = [{"cache_key": f"k{i}", "file_id": f"f{i}"} for i in range(2 * fic.LOAD_PAGE_SIZE + 5)]
+    cache = FileIdCache()
+    assert cache.get("k0") == "f0"
+    assert cache.get(f"k{2 * fic.LOAD_PAGE_SIZE + 4}") == f"f{2 * fic.LOAD_PAGE_SIZE + 4}"
+    assert len(supabase.requests) == 3
+
+
+def test_load_keeps_ids_put_before_it_ran(supabase):
+    supabase.configured = False
+    cache = FileIdCache()
+    cache.put("k0", "new")
+    supabase.configured = True
+    supabase.rows = [{"cache_key": "k0", "file_id": "old"}]
+    cache.load()
+    assert cache.get("k0") == "new"
+
+
+def test_put_get_and_invalidate_without_supabase(supabase):
+    supabase.configured = False
+    cache = FileIdCache()
+    assert cache.get("book:1:uz") is None
+    cache.put("book:1:uz", "file-1")
+    assert cache.get("book:1:uz") == "file-1"
+    cache.invalidate("book:1:uz")
+    assert cache.get("book:1:uz") is None
+
+
+def _put_parts(cache, ranges, count=None, book_id=7, lang="uz"):
+    count = count or len(ranges)
+    for index, (start, end) in enumerate(ranges, 1):
+        cache.put(fic.book_part_key(book_id, lang, index, count, start, end), f"part-{index}")
+
+
+def test_book_parts_come_back_in_page_order(supabase):
+    supabase.configured = False
+    cache = FileIdCache()
+    _put_parts(cache, [(0, 99), (100, 199), (200, 249)])
+    parts = cache.get_book_parts(7, "uz")
+    assert [(start, end, file_id) for _, start, end, file_id in parts] == [
+        (0, 99, "part-1"), (100, 199, "part-2"), (200, 249, "part-3"),
+    ]
+    assert parts[0][0] == fic.book_part_key(7, "uz", 1, 3, 0, 99)
+    assert cache.get_book_parts(7, "ru") is None
+
+
+def test_book_parts_need_every_part_of_one_split(supabase):
+    supabase.configured = False
+    cache = FileIdCache()
+    cache.put(fic.book_part_key(7, "uz", 1, 3, 0, 99), "part-1")
+    cache.put(fic.book_part_key(7, "uz", 3, 3, 200, 249), "part-3")
+    assert cache.get_book_parts(7, "uz") is None
+
+    cache.put(fic.book_part_key(7, "uz", 2, 2, 100, 249), "stale")
+    assert cache.get_book_parts(7, "uz") is None
+
+
+def test_invalidate_book_parts_keeps_the_whole_book(supabase):
+    supabase.configured = False
+    cache = FileIdCache()
+    cache.put(fic.book_key(7, "uz"), "whole")
+    _put_parts(cache, [(0, 99), (100, 199)])
+    _put_parts(cache, [(0, 9)], lang="ru")
+    cache.invalidate_book_parts(7, "uz")
+    assert cache.get_book_parts(7, "uz") is None
+    assert cache.get(fic.book_key(7, "uz")) == "whole"
+    assert cache.get_book_parts(7, "ru") is not None
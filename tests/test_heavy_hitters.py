@@ -0,0 +1,73 @@
+import random
+
+from services import heavy_hitters
+from services.heavy_hitters import SpaceSaving
+
+
+def test_counts_are_exact_below_capacity():
+    tracker = SpaceSaving("test", capacity=10)
+    for item in "aabbbc":
+        tracker.offer(item)
+    assert tracker.top(3) == [("b", 3, 0), ("a", 2, 0), ("c", 1, 0)]
+
+
+def test_memory_is_bounded_by_capacity():
+    tracker = SpaceSaving("test", capacity=5)
+    for i in range(100):
+        tracker.offer(i)
+    assert len(tracker) == 5
+
+
+def test_frequent_items_survive_a_long_tail():
+    tracker = SpaceSaving("test", capacity=20)
+    rng = random.Random(7)
+    stream = ["hot"] * 300 + ["warm"] * 150 + [f"tail-{i}" for i in range(1000)]
+    rng.shuffle(stream)
+    for item in stream:
+        tracker.offer(item)
+    top_items = [item for item, _, _ in tracker.top(2)]
+    assert top_items == ["hot", "warm"]
+
+
+def test_estimates_never_undercount_and_error_bounds_the_overcount():
+    tracker = SpaceSaving("test", capacity=3)
+    stream = list("abcdaaebfa")
+    for item in stream:
+        tracker.offer(item)
+    for item, count, error in tracker.top(3):
+        true_count = stream.count(item)
+        assert true_count <= count <= true_count + error
+
+
+def test_replaced_item_inherits_the_minimum_as_its_error():
+    tracker = SpaceSaving("test", capacity=2)
+    for item in "aab":
+        tracker.offer(item)
+    tracker.offer("c")  # evicts b (count 1)
+    assert dict((item, (count, error)) for item, count, error in tracker.top(2)) == {
+        "a": (2, 0), "c": (2, 1),
+    }
+
+
+def test_none_is_ignored():
+    tracker = SpaceSaving("test")
+    tracker.offer(None)
+    assert len(tracker) == 0
+
+
+def test_decay_halves_counts_and_forgets_rare_items():
+    tracker = SpaceSaving("test")
+    tracker.offer("a", weight=4)
+    tracker.offer("b")
+    tracker.decay()
+    assert tracker.top() == [("a", 2, 0), ("b", 0.5, 0)]
+    tracker.decay()
+    assert tracker.top() == [("a", 1, 0)]
+
+
+def test_record_search_counts_case_and_spacing_variants_together(monkeypatch):
+    tracker = SpaceSaving("queries")
+    monkeypatch.setattr(heavy_hitters, "hot_queries", tracker)
+    for query in ("Algebra", " algebra ", "ALGEBRA"):
+        heavy_hitters.record_search(query)
+    assert tracker.top() == [("algebra", 3, 0)]
@@ -0,0 +1,62 @@
+import pytest
+
+from services.hyperloglog import HyperLogLog
+
+
+def test_empty_sketch_counts_zero():
+    assert HyperLogLog().count() == 0
+
+
+def test_duplicates_are_counted_once():
+    sketch = HyperLogLog()
+    for _ in range(5):
+        sketch.update(range(100))
+    assert sketch.count() == pytest.approx(100, rel=0.05)
+
+
+@pytest.mark.parametrize("n", [1000, 50000])
+def test_estimate_is_within_a_few_standard_errors(n):
+    sketch = HyperLogLog()
+    sketch.update(range(n))
+    # Standard error at p=12 is ~1.6%
+    assert sketch.count() == pytest.approx(n, rel=0.05)
+
+
+def test_merge_counts_the_union():
+    a, b = HyperLogLog(), HyperLogLog()
+    a.update(range(0, 6000))
+    b.update(range(4000, 10000))
+    assert a.merge(b).count() == pytest.approx(10000, rel=0.05)
+
+
+def test_merging_a_sketch_twice_does_not_double_count():
+    a, b = HyperLogLog(), HyperLogLog()
+    a.update(range(3000))
+    b.update(range(3000))
+    once = HyperLogLog().merge(a).count()
+    assert HyperLogLog().merge(a).merge(b).merge(a).count() == once
+
+
+def test_merge_rejects_a_different_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(p=12).merge(HyperLogLog(p=10))
+
+
+def test_base64_round_trip_keeps_registers_and_precision():
+    sketch = HyperLogLog(p=10)
+    sketch.update(f"user-{i}" for i in range(500))
+    restored = HyperLogLog.from_base64(sketch.to_base64())
+    assert restored.p == 10
+    assert restored.registers == sketch.registers
+    assert restored.count() == sketch.count()
+
+
+@pytest.mark.parametrize("p", [3, 17])
+def test_precision_out_of_range_is_rejected(p):
+    with pytest.raises(ValueError):
+        HyperLogLog(p=p)
+
+
+def test_register_count_must_match_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(p=4, registers=bytes(15))
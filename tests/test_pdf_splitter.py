@@ -0,0 +1,118 @@
+import asyncio
+import os
+
+import fitz
+import pytest
+
+from services import pdf_splitter
+from services.disk_cache import DiskCache
+from services.document_pool import document_pool
+from services.pdf_splitter import PageTooLargeError, get_book_parts, plan_parts
+from services.pdf_worker import PDFWorkerPool
+
+IMAGE_BYTES = 60_000
+
+
+def _noise_png(seed: int) -> bytes:
+    """A PNG that does not compress (random pixels), about IMAGE_BYTES big."""
+    side = int((IMAGE_BYTES / 3) ** 0.5)
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, side, side), False)
+    pix.set_rect(pix.irect, (0, 0, 0))
+    samples = bytearray(os.urandom(len(pix.samples)))
+    pix = fitz.Pixmap(fitz.csRGB, side, side, bytes(samples), False)
+    return pix.tobytes("png")
+
+
+def _book(path, pages: int, shared_image: bool = False) -> str:
+    doc = fitz.open()
+    shared_xref = 0
+    for number in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {number + 1}")
+        rect = fitz.Rect(72, 100, 372, 400)
+        if shared_image and shared_xref:
+            page.insert_image(rect, xref=shared_xref)
+        else:
+            shared_xref = page.insert_image(rect, stream=_noise_png(number))
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def fresh_document_pool():
+    document_pool.clear()
+    yield
+    document_pool.clear()
+
+
+def _assert_covers(parts, pages):
+    assert parts[0][0] == 0 and parts[-1][1] == pages - 1
+    for (_, end), (start, _) in zip(parts, parts[1:]):
+        assert start == end + 1
+
+
+def test_small_book_is_one_part(tmp_path):
+    pdf = _book(tmp_path / "small.pdf", 4)
+    assert plan_parts(pdf, max_bytes=10 * 1024 * 1024) == [(0, 3)]
+
+
+def test_parts_cover_every_page_in_order(tmp_path):
+    pdf = _book(tmp_path / "book.pdf", 12)
+    parts = plan_parts(pdf, max_bytes=4 * IMAGE_BYTES)
+    assert len(parts) > 1
+    _assert_covers(parts, 12)
+
+
+def test_every_planned_part_fits_when_extracted(tmp_path):
+    pdf = _book(tmp_path / "book.pdf", 12)
+    max_bytes = 4 * IMAGE_BYTES
+    with fitz.open(pdf) as doc:
+        for start, end in plan_parts(pdf, max_bytes=max_bytes):
+            with fitz.open() as part:
+                part.insert_pdf(doc, from_page=start, to_page=end)
+                assert len(part.tobytes(garbage=4, deflate=True)) <= max_bytes
+
+
+def test_shared_images_are_counted_once_per_part(tmp_path):
+    pdf = _book(tmp_path / "shared.pdf", 12, shared_image=True)
+    assert plan_parts(pdf, max_bytes=4 * IMAGE_BYTES) == [(0, 11)]
+
+
+def test_page_too_large_for_any_part_raises_before_anything_is_returned(tmp_path, monkeypatch):
+    pdf = _book(tmp_path / "book.pdf", 3)
+    monkeypatch.setattr(pdf_splitter, "book_parts_cache",
+                        DiskCache("test_parts", tmp_path / "parts", 10 * 1024 * 1024, suffix=".pdf"))
+    workers = PDFWorkerPool(1)
+    monkeypatch.setattr(pdf_splitter, "pdf_workers", workers)
+
+    async def main():
+        try:
+            return await get_book_parts(pdf, "source", max_bytes=IMAGE_BYTES // 2)
+        finally:
+            workers.shutdown()
+
+    with pytest.raises(PageTooLargeError):
+        asyncio.run(main())
+
+
+def test_parts_are_built_and_cached(tmp_path, monkeypatch):
+    pdf = _book(tmp_path / "book.pdf", 8)
+    monkeypatch.setattr(pdf_splitter, "book_parts_cache",
+                        DiskCache("test_parts_ok", tmp_path / "parts", 10 * 1024 * 1024, suffix=".pdf"))
+    workers = PDFWorkerPool(1)
+    monkeypatch.setattr(pdf_splitter, "pdf_workers", workers)
+    max_bytes = 4 * IMAGE_BYTES
+
+    async def main():
+        try:
+            first = await get_book_parts(pdf, "source", max_bytes=max_bytes)
+            second = await get_book_parts(pdf, "source", max_bytes=max_bytes)
+            return first, second
+        finally:
+            workers.shutdown()
+
+    first, second = asyncio.run(main())
+    assert first == second
+    _assert_covers([(start, end) for start, end, _ in first], 8)
+    assert all(path.stat().st_size <= max_bytes for _, _, path in first)
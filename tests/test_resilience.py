@@ -0,0 +1,98 @@
+import pytest
+
+from database import resilience
+from database.resilience import CircuitBreaker, CircuitOpenError, resilient_read
+
+
+def _fail():
+    raise IOError("down")
+
+
+@pytest.fixture(autouse=True)
+def closed_supabase_breaker():
+    resilience.supabase_breaker.record_success()
+    yield
+    resilience.supabase_breaker.record_success()
+
+
+def test_breaker_opens_after_threshold_consecutive_failures():
+    breaker = CircuitBreaker("test_open", failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        with pytest.raises(IOError):
+            breaker.call(_fail)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    with pytest.raises(IOError):
+        breaker.call(_fail)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "not called")
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker("test_reset", failure_threshold=2, reset_timeout=60)
+    with pytest.raises(IOError):
+        breaker.call(_fail)
+    assert breaker.call(lambda: "ok") == "ok"
+    with pytest.raises(IOError):
+        breaker.call(_fail)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker("test_half_open", failure_threshold=1, reset_timeout=0)
+    with pytest.raises(IOError):
+        breaker.call(_fail)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_reopens_the_circuit():
+    breaker = CircuitBreaker("test_reopen", failure_threshold=5, reset_timeout=0)
+    for _ in range(5):
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_resilient_read_returns_a_copy_of_the_default_on_error():
+    @resilient_read(default=[])
+    def fetch():
+        raise IOError("down")
+
+    result = fetch()
+    assert result == []
+    result.append(1)
+    assert fetch() == []
+
+
+def test_resilient_read_serves_fresh_entries_from_cache():
+    calls = []
+
+    @resilient_read(default=None, fresh_ttl=60)
+    def fetch(x):
+        calls.append(x)
+        return x * 2
+
+    assert fetch(2) == 4
+    assert fetch(2) == 4
+    assert fetch(3) == 6
+    assert calls == [2, 3]
+
+
+def test_resilient_read_serves_the_old_value_when_a_refresh_fails():
+    answers = iter(["first"])
+
+    @resilient_read(default=None, fresh_ttl=0, stale_ttl=0)
+    def fetch():
+        return next(answers)  # StopIteration on the second call
+
+    assert fetch() == "first"
+    assert fetch() == "first"
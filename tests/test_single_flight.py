@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from services.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        flight = SingleFlight("test_share")
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+        return results, flight
+
+    results, flight = asyncio.run(main())
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flight._inflight == {}
+
+
+def test_different_keys_run_separately():
+    calls = []
+
+    async def work(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        return key
+
+    async def main():
+        flight = SingleFlight("test_keys")
+        return await asyncio.gather(flight.do("a", lambda: work("a")), flight.do("b", lambda: work("b")))
+
+    assert asyncio.run(main()) == ["a", "b"]
+    assert sorted(calls) == ["a", "b"]
+
+
+def test_results_are_not_cached_after_completion():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        flight = SingleFlight("test_nocache")
+        return await flight.do("k", work), await flight.do("k", work)
+
+    assert asyncio.run(main()) == (1, 2)
+
+
+def test_every_waiter_sees_the_exception():
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        flight = SingleFlight("test_error")
+        return await asyncio.gather(*(flight.do("k", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_work():
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        flight = SingleFlight("test_cancel")
+        first = asyncio.ensure_future(flight.do("k", work))
+        second = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"